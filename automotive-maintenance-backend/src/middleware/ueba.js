@@ -96,6 +96,33 @@ async function logUEBAEvent(event) {
   }
 }
 
+/**
+ * Log a batch of UEBA events in a single multi-row INSERT.
+ * Unlike logUEBAEvent, errors propagate so the caller can report them.
+ */
+async function logUEBAEvents(events) {
+  if (!events.length) {
+    return 0;
+  }
+
+  const values = [];
+  const rows = events.map((event, i) => {
+    const base = i * 5;
+    values.push(event.event_id, event.agent_name, event.service_name, event.action, event.reason);
+    return `($${base + 1}, $${base + 2}, $${base + 3}, $${base + 4}, $${base + 5})`;
+  });
+
+  const query = `
+    INSERT INTO ueba_events (event_id, agent_name, service_name, action, reason)
+    VALUES ${rows.join(', ')}
+    ON CONFLICT (event_id)
+    DO UPDATE SET action = EXCLUDED.action, reason = EXCLUDED.reason, timestamp = NOW();
+  `;
+
+  await pool.query(query, values);
+  return events.length;
+}
+
 /**
  * Get all UEBA events
  */
@@ -172,6 +199,7 @@ async function clearUEBALogs() {
 module.exports = {
   secureCall,
   logUEBAEvent,
+  logUEBAEvents,
   getAllUEBAEvents,
   getBlockedEvents,
   getUEBASummary,
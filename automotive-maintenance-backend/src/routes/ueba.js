@@ -1,6 +1,6 @@
 const express = require('express');
 const router = express.Router();
-const { logUEBAEvent, getAllUEBAEvents, getUEBASummary } = require('../middleware/ueba');
+const { logUEBAEvent, logUEBAEvents, getAllUEBAEvents, getUEBASummary } = require('../middleware/ueba');
 
 // POST /ueba/event - Log UEBA event from AI agents
 router.post('/event', async (req, res) => {
@@ -40,6 +40,46 @@ router.post('/event', async (req, res) => {
   }
 });
 
+// POST /ueba/events/bulk - Log a batch of UEBA events from the agents' audit pipeline
+router.post('/events/bulk', async (req, res) => {
+  try {
+    const { events } = req.body;
+
+    if (!Array.isArray(events)) {
+      return res.status(400).json({
+        success: false,
+        error: 'events must be an array',
+        timestamp: new Date().toISOString()
+      });
+    }
+
+    const valid = events
+      .filter(e => e && e.agent_name && e.service_name && e.status)
+      .map(e => ({
+        event_id: require('uuid').v4(),
+        agent_name: e.agent_name,
+        service_name: e.service_name,
+        action: e.status.toLowerCase(),
+        reason: e.details || ''
+      }));
+
+    const inserted = await logUEBAEvents(valid);
+
+    return res.status(201).json({
+      success: true,
+      data: { inserted, rejected: events.length - valid.length },
+      timestamp: new Date().toISOString()
+    });
+  } catch (error) {
+    console.error('Error logging UEBA events:', error.message);
+    return res.status(500).json({
+      success: false,
+      error: error.message,
+      timestamp: new Date().toISOString()
+    });
+  }
+});
+
 // GET /ueba/events - Get all UEBA events
 router.get('/events', async (req, res) => {
   try {
@@ -0,0 +1,220 @@
+"""Fleet-scale batch execution of the agent graph on a bounded worker pool."""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.agents.checkpoints import new_flow_id
+from app.agents.flow_result import summarize_flow
+from app.agents.master import run_predictive_flow_async
+from app.config.settings import get_settings
+from app.data.repositories import TelematicsRepo
+from app.domain.fleet_risk import score_records
+from app.domain.risk_rules import LEVELS
+
+
+async def _run_vehicle(vehicle_id: str, include_state: bool) -> Dict[str, Any]:
+    start = time.perf_counter()
+    flow_id = new_flow_id()
+    try:
+        state = await run_predictive_flow_async(vehicle_id, flow_id=flow_id)
+    except Exception as exc:  # noqa: BLE001
+        # With CHECKPOINT_ENABLED it is checkpointed up to the failure and can be resumed by its id
+        state = {"vehicle_id": vehicle_id, "flow_id": flow_id, "error_message": str(exc)}
+    return summarize_flow(vehicle_id, state, time.perf_counter() - start, include_state)
+
+
+@dataclass
+class BatchJob:
+    job_id: str
+    vehicle_ids: List[str]
+    include_state: bool = False
+    screened_out: int = 0
+    status: str = "QUEUED"  # QUEUED, RUNNING, COMPLETED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    succeeded: int = 0
+    failed: int = 0
+    pool_run: Optional[Any] = None  # FleetRun, when the batch runs on the process pool
+    _cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status == "COMPLETED"
+
+    def record(self, result: Dict[str, Any]) -> None:
+        with self._cond:
+            self.results.append(result)
+            if result["success"]:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            if len(self.results) == len(self.vehicle_ids):
+                self.status = "COMPLETED"
+                self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        pool = self.pool_run.summary() if self.pool_run is not None else None
+        with self._cond:
+            completed = len(self.results)
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            summary = {
+                "job_id": self.job_id,
+                "status": self.status,
+                "total": len(self.vehicle_ids),
+                "completed": completed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "screened_out": self.screened_out,
+                "elapsed_sec": round(elapsed, 3),
+                "throughput_per_sec": round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+            }
+        if pool is not None:
+            summary["pool"] = {key: pool[key] for key in ("processes", "cpu_sec", "cpu_ms_per_flow", "cores_used", "workers")}
+        return summary
+
+    def iter_results(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield per-vehicle results in completion order, blocking until the job finishes."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.results) and not self.done:
+                    if not self._cond.wait(timeout):
+                        return
+                pending = self.results[index:]
+                finished = self.done
+            for result in pending:
+                yield result
+            index += len(pending)
+            if finished and index >= len(self.vehicle_ids):
+                return
+
+
+class BatchManager:
+    """
+    Runs the agent graph for many vehicles on one shared, bounded pool.
+
+    Flows run as `ainvoke` coroutines on a dedicated event loop thread, so the pool
+    size caps concurrent flows rather than OS threads. With FLEET_PROCESSES set, they run
+    on a FleetPool of worker processes instead, to use more than one core.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, max_jobs: Optional[int] = None, processes: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.max_workers = max_workers or settings.batch_max_workers
+        self.max_jobs = max_jobs or settings.batch_max_jobs
+        self.processes = settings.fleet_processes if processes is None else processes
+        self._pool = None
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._slots = asyncio.Semaphore(self.max_workers)
+                threading.Thread(target=self._loop.run_forever, name="agent-batch", daemon=True).start()
+            return self._loop
+
+    def _ensure_pool(self):
+        from app.agents.fleet_pool import FleetPool
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = FleetPool(self.processes).start()
+            return self._pool
+
+    def submit(
+        self,
+        vehicle_ids: Optional[List[str]] = None,
+        fleet_id: Optional[str] = None,
+        include_state: bool = False,
+        min_risk_level: Optional[str] = None,
+    ) -> BatchJob:
+        if min_risk_level and min_risk_level not in LEVELS:
+            raise ValueError(f"min_risk_level must be one of {', '.join(LEVELS)}")
+
+        ids = list(dict.fromkeys(vehicle_ids or []))
+        fleet = None
+        if not ids or min_risk_level:
+            fleet = TelematicsRepo.list_vehicles(fleet_id)
+        if not ids:
+            ids = [v["vehicle_id"] for v in fleet if v.get("vehicle_id")]
+
+        screened_out = 0
+        if min_risk_level:
+            before = len(ids)
+            ids = self._prescreen(ids, fleet, min_risk_level)
+            screened_out = before - len(ids)
+        if not ids and not screened_out:
+            raise ValueError("No vehicles to process")
+
+        job = BatchJob(job_id=uuid.uuid4().hex, vehicle_ids=ids, include_state=include_state, screened_out=screened_out)
+        self._register(job)
+        if not ids:
+            # Every vehicle was screened out: nothing reaches the agent graph
+            job.status = "COMPLETED"
+            job.started_at = job.finished_at = time.time()
+            return job
+
+        job.status = "RUNNING"
+        job.started_at = time.time()
+        if self.processes:
+            job.pool_run = self._ensure_pool().submit(ids, include_state, on_result=job.record)
+            return job
+        loop = self._ensure_loop()
+        for vehicle_id in ids:
+            asyncio.run_coroutine_threadsafe(self._run_one(job, vehicle_id), loop)
+        return job
+
+    @staticmethod
+    def _prescreen(ids: List[str], fleet: List[Dict[str, Any]], min_risk_level: str) -> List[str]:
+        """Keeps vehicles at `min_risk_level` or worse, scored in one vectorized pass."""
+        records = [v for v in fleet if v.get("vehicle_id")]
+        scores = score_records(records)
+        risky = set(scores.vehicle_ids[scores.at_least(min_risk_level)].tolist())
+        known = {v["vehicle_id"] for v in records}
+        # Vehicles without fleet telematics can't be screened, so they still go through the graph
+        return [v_id for v_id in ids if v_id in risky or v_id not in known]
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _register(self, job: BatchJob) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # Evict the oldest finished jobs once we exceed the retention limit
+            for old_id in list(self._jobs):
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                if self._jobs[old_id].done:
+                    del self._jobs[old_id]
+
+    async def _run_one(self, job: BatchJob, vehicle_id: str) -> None:
+        async with self._slots:
+            job.record(await _run_vehicle(vehicle_id, job.include_state))
+
+
+batch_manager = BatchManager()
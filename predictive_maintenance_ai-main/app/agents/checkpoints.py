@@ -0,0 +1,322 @@
+"""Per-node checkpoints for the agent flow, keyed by flow id, so failed flows can resume.
+
+LangGraph saves the state after every step of a flow (thread_id = flow_id). A flow that
+raised, e.g. an LLM timeout in feedback, resumes with only the tasks that failed. A flow
+that finished with an error_message resumes from the step before the error first
+appeared, so only that step runs again. Completed flows are dropped unless
+CHECKPOINT_KEEP_COMPLETED is set; failed and abandoned ones are swept once they have not
+run for CHECKPOINT_RETENTION_HOURS.
+
+Checkpointing is opt-in (CHECKPOINT_ENABLED), as every step adds a write to the flow.
+Checkpoints go to SQLite (CHECKPOINT_SQLITE_PATH, under DATA_DIR) through
+langgraph-checkpoint-sqlite. Without that package, or with an empty path, they are kept
+in memory and last only as long as the process.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.config.settings import get_settings
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # optional: pip install langgraph-checkpoint-sqlite
+    SqliteSaver = None
+
+
+def new_flow_id() -> str:
+    return uuid.uuid4().hex
+
+
+def flow_config(flow_id: str, checkpoint_id: Optional[str] = None) -> Dict[str, Any]:
+    configurable = {"thread_id": flow_id}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+if SqliteSaver is not None:
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """SqliteSaver that also serves `ainvoke`/`astream`, running each query in a worker thread.
+
+        The connection is shared across threads behind the saver's own lock; queries take
+        well under a millisecond, so this costs far less than an aiosqlite connection per loop.
+        """
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[Any]:
+            items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Fleet pool and queue workers write from several processes; wait out each other's commits
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # A crash may lose the last steps (they re-run on resume) but never corrupts the file
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+_lock = threading.Lock()
+_saver: Optional[BaseCheckpointSaver] = None
+
+
+def get_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """The process-wide saver, or None when CHECKPOINT_ENABLED is off."""
+    global _saver
+    settings = get_settings()
+    if not settings.checkpoint_enabled:
+        return None
+    with _lock:
+        if _saver is None:
+            path = settings.checkpoint_sqlite_path
+            if path and SqliteSaver is not None:
+                _saver = ThreadedSqliteSaver(_connect(path))
+            else:
+                if path:
+                    print("⚠️ [Checkpoints] langgraph-checkpoint-sqlite is not installed; keeping checkpoints in memory")
+                _saver = InMemorySaver()
+        return _saver
+
+
+def checkpoint_backend() -> str:
+    saver = get_checkpointer()
+    if saver is None:
+        return "disabled"
+    return "memory" if isinstance(saver, InMemorySaver) else "sqlite"
+
+
+# --- Idempotent booking and retention ---
+
+class FlowLedger:
+    """
+    The booking each flow made, recorded as soon as the backend confirms it, so a resumed
+    scheduling step reuses it instead of booking the vehicle a second time. Also notes when
+    each flow last ran, so the checkpoints of flows nobody resumes can be swept.
+    """
+
+    def __init__(self, path: str = ""):
+        self._lock = threading.Lock()
+        self._memory: Dict[str, str] = {}
+        self._runs: Dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._conn = _connect(path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flow_bookings ("
+                " flow_id TEXT PRIMARY KEY, vehicle_id TEXT NOT NULL, booking TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flow_runs ("
+                " flow_id TEXT PRIMARY KEY, vehicle_id TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS flow_runs_updated ON flow_runs (updated_at)")
+            self._conn.commit()
+
+    def get(self, flow_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._conn is None:
+                value = self._memory.get(flow_id)
+            else:
+                row = self._conn.execute("SELECT booking FROM flow_bookings WHERE flow_id = ?", (flow_id,)).fetchone()
+                value = row[0] if row else None
+        return json.loads(value) if value else None
+
+    def record(self, flow_id: str, vehicle_id: str, booking: Dict[str, Any]) -> None:
+        value = json.dumps(booking, default=str)
+        with self._lock:
+            if self._conn is None:
+                self._memory[flow_id] = value
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flow_bookings (flow_id, vehicle_id, booking, created_at) VALUES (?, ?, ?, ?)",
+                (flow_id, vehicle_id, value, time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, flow_id: str, vehicle_id: str) -> None:
+        """Marks the flow as run (or resumed) now."""
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                self._runs[flow_id] = now
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flow_runs (flow_id, vehicle_id, updated_at) VALUES (?, ?, ?)",
+                (flow_id, vehicle_id, now),
+            )
+            self._conn.commit()
+
+    def idle_since(self, before: float) -> List[str]:
+        """Flows that have not run since `before`, including bookings of flows never touched."""
+        with self._lock:
+            if self._conn is None:
+                return [flow_id for flow_id, updated_at in self._runs.items() if updated_at < before]
+            rows = self._conn.execute(
+                "SELECT flow_id FROM flow_runs WHERE updated_at < ?"
+                " UNION SELECT flow_id FROM flow_bookings WHERE created_at < ?"
+                " AND flow_id NOT IN (SELECT flow_id FROM flow_runs)",
+                (before, before),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, flow_id: str) -> None:
+        with self._lock:
+            if self._conn is None:
+                self._memory.pop(flow_id, None)
+                self._runs.pop(flow_id, None)
+                return
+            self._conn.execute("DELETE FROM flow_bookings WHERE flow_id = ?", (flow_id,))
+            self._conn.execute("DELETE FROM flow_runs WHERE flow_id = ?", (flow_id,))
+            self._conn.commit()
+
+
+_ledger: Optional[FlowLedger] = None
+
+
+def get_flow_ledger() -> Optional[FlowLedger]:
+    """Stored next to the checkpoints; None when checkpointing is off, as flows can't be resumed then."""
+    global _ledger
+    settings = get_settings()
+    if not settings.checkpoint_enabled:
+        return None
+    with _lock:
+        if _ledger is None:
+            _ledger = FlowLedger(settings.checkpoint_sqlite_path if SqliteSaver is not None else "")
+        return _ledger
+
+
+def forget_flow(flow_id: str) -> None:
+    """Drops a flow's checkpoints and booking record."""
+    saver = get_checkpointer()
+    if saver is None:
+        return
+    saver.delete_thread(flow_id)
+    get_flow_ledger().forget(flow_id)
+
+
+# Each process sweeps at most this often, from the flows it starts
+SWEEP_INTERVAL_SEC = 600.0
+_next_sweep = 0.0
+
+
+def sweep_flows(max_age_sec: Optional[float] = None) -> int:
+    """
+    Drops the checkpoints and booking records of flows that have not run for `max_age_sec`
+    (default CHECKPOINT_RETENTION_HOURS): failed flows nobody resumed, and flows whose
+    process died mid-way. Returns how many flows were dropped.
+    """
+    ledger = get_flow_ledger()
+    if ledger is None:
+        return 0
+    if max_age_sec is None:
+        max_age_sec = get_settings().checkpoint_retention_hours * 3600
+    flow_ids = ledger.idle_since(time.time() - max_age_sec)
+    for flow_id in flow_ids:
+        forget_flow(flow_id)
+    if flow_ids:
+        print(f"🧹 [Checkpoints] Dropped {len(flow_ids)} flow(s) idle for over {max_age_sec / 3600:g}h")
+    return len(flow_ids)
+
+
+def touch_flow(flow_id: str, vehicle_id: str) -> None:
+    """Called as a flow starts or resumes; now and then also sweeps expired flows."""
+    global _next_sweep
+    ledger = get_flow_ledger()
+    if ledger is None:
+        return
+    ledger.touch(flow_id, vehicle_id)
+    if get_settings().checkpoint_retention_hours <= 0:
+        return
+    with _lock:
+        now = time.monotonic()
+        due = now >= _next_sweep
+        if due:
+            _next_sweep = now + SWEEP_INTERVAL_SEC
+    if due:
+        sweep_flows()
+
+
+def lineage(graph, flow_id: str) -> Iterator[Any]:
+    """State snapshots of the flow's current branch, newest first (a resume forks a new branch)."""
+    if graph.checkpointer is None:
+        return
+    snapshot = graph.get_state(flow_config(flow_id))
+    # Unknown flows come back as an empty snapshot without metadata
+    while snapshot.metadata is not None:
+        yield snapshot
+        if snapshot.parent_config is None:
+            return
+        snapshot = graph.get_state(snapshot.parent_config)
+
+
+def _resume_from(snapshots) -> Optional[Any]:
+    latest = snapshots[0]
+    if latest.next:
+        return latest
+    if not latest.values.get("error_message"):
+        return None
+    # Walk back to the last snapshot without the error; its pending step is the one that failed
+    for snapshot in snapshots[1:]:
+        if not snapshot.values.get("error_message"):
+            return snapshot
+    return snapshots[-1]
+
+
+def resume_point(graph, flow_id: str) -> Optional[Any]:
+    """
+    The snapshot a resume should start from: the latest one if the flow stopped mid-way,
+    the one before the error if it finished with one, or None if there is nothing to redo.
+    Raises KeyError for unknown (or already forgotten) flows.
+    """
+    snapshots = list(lineage(graph, flow_id))
+    if not snapshots:
+        raise KeyError(flow_id)
+    return _resume_from(snapshots)
+
+
+def describe(graph, flow_id: str) -> Dict[str, Any]:
+    """Progress of a checkpointed flow: which nodes finished, what runs next, the error if any."""
+    snapshots = list(lineage(graph, flow_id))
+    if not snapshots:
+        raise KeyError(flow_id)
+    latest = snapshots[0]
+    # Every step before the latest finished; in the latest, tasks that succeeded left a result
+    completed = [name for snapshot in reversed(snapshots[1:]) for name in snapshot.next if name != "__start__"]
+    completed += [task.name for task in latest.tasks if task.error is None and task.result is not None]
+    return {
+        "flow_id": flow_id,
+        "vehicle_id": latest.values.get("vehicle_id"),
+        "step": latest.metadata.get("step"),
+        "completed": completed,
+        "next": list(latest.next),
+        "failed": [task.name for task in latest.tasks if task.error is not None],
+        "error_message": latest.values.get("error_message"),
+        "booking_id": latest.values.get("booking_id"),
+        "resumable": _resume_from(snapshots) is not None,
+        "updated_at": latest.created_at,
+    }
@@ -0,0 +1,408 @@
+"""
+Multi-process fleet runs: the agent graph on every CPU core.
+
+Flows in one process interleave on an event loop. Their CPU work still holds the GIL:
+prompt building, JSON parsing, risk scoring, UEBA checks and audit serialization. A fleet
+run therefore tops out at about one core. FleetPool runs the flows in spawned worker
+processes. At start, each worker builds the graph, its HTTP and LLM clients and the UEBA
+pipeline once, then keeps up to FLEET_PROCESS_CONCURRENCY flows in flight on its own loop.
+
+Vehicles are queued in chunks of FLEET_CHUNK_SIZE. A worker gets the next chunk whenever
+it has a free slot, so faster workers take the work slower ones have not reached (work
+stealing instead of fixed shards). Results come back per vehicle. The
+parent merges them with each worker's CPU time and tracing metrics, so /metrics also
+covers flows that ran in the pool.
+
+    python -m app.agents.fleet_pool --processes 8 --fleet-id FLEET_A --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing import connection
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.agents.batch import _run_vehicle
+from app.agents.flow_result import summarize_flow
+from app.observability.metrics import drain_metrics, merge_metrics
+from app.config.settings import get_settings
+
+# How often a busy worker ships its tracing metrics to the parent
+METRICS_INTERVAL_SEC = 1.0
+
+
+# --- Worker processes ---
+
+async def _serve(conn, concurrency: int) -> None:
+    from app.data.repositories import aclose_async_client
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    running: Set[asyncio.Task] = set()
+    shipped = {"cpu": time.process_time(), "metrics_at": time.monotonic()}
+
+    # Only this thread sends; the executor thread below only receives
+    def report(run_id: str, result: Dict[str, Any]) -> None:
+        cpu = time.process_time()
+        message = {"kind": "result", "run_id": run_id, "result": result, "cpu_sec": cpu - shipped["cpu"]}
+        shipped["cpu"] = cpu
+        if time.monotonic() - shipped["metrics_at"] >= METRICS_INTERVAL_SEC:
+            message["metrics"] = drain_metrics()
+            shipped["metrics_at"] = time.monotonic()
+        conn.send(message)
+
+    async def run(run_id: str, vehicle_id: str, include_state: bool) -> None:
+        try:
+            result = await _run_vehicle(vehicle_id, include_state)
+        finally:
+            slots.release()
+        report(run_id, result)
+
+    try:
+        while True:
+            conn.send({"kind": "ready"})
+            task = await loop.run_in_executor(None, conn.recv)
+            if task is None:
+                break
+            run_id, vehicle_ids, include_state = task
+            for vehicle_id in vehicle_ids:
+                # The next chunk is only asked for once this one has all its flows running
+                await slots.acquire()
+                flow = asyncio.create_task(run(run_id, vehicle_id, include_state))
+                running.add(flow)
+                flow.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+    finally:
+        conn.send({"kind": "exit", "metrics": drain_metrics()})
+        await aclose_async_client()
+
+
+def _worker_main(conn, concurrency: int, setup: Optional[Callable[[], None]]) -> None:
+    # Ctrl-C goes to the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if setup is not None:
+        setup()
+    # The graph was built when this module's imports ran; clients are built on first use
+    asyncio.run(_serve(conn, concurrency))
+
+
+# --- Parent ---
+
+@dataclass
+class FleetRun:
+    """One fleet submitted to the pool; results arrive in completion order."""
+
+    run_id: str
+    vehicle_ids: List[str]
+    include_state: bool = False
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    workers: Dict[int, Dict[str, float]] = field(default_factory=dict)
+    _outstanding: Dict[int, Set[str]] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _started(self, pid: int, vehicle_ids: List[str]) -> None:
+        with self._lock:
+            self._outstanding.setdefault(pid, set()).update(vehicle_ids)
+
+    def _record(self, pid: int, result: Dict[str, Any], cpu_sec: float = 0.0) -> None:
+        with self._lock:
+            outstanding = self._outstanding.get(pid, set())
+            if result["vehicle_id"] not in outstanding:
+                # Already reported lost when its worker died
+                return
+            outstanding.discard(result["vehicle_id"])
+            worker = self.workers.setdefault(pid, {"flows": 0, "failed": 0, "cpu_sec": 0.0})
+            worker["flows"] += 1
+            worker["failed"] += int(not result["success"])
+            worker["cpu_sec"] += cpu_sec
+            self.results.append(result)
+            finished = len(self.results) == len(self.vehicle_ids)
+            if finished:
+                self.finished_at = time.time()
+        if self.on_result is not None:
+            self.on_result(result)
+        if finished:
+            self._done.set()
+
+    def _lost(self, pid: int, reason: str) -> None:
+        """Fails the flows a dead worker had taken; their checkpoints stay resumable."""
+        with self._lock:
+            vehicle_ids = sorted(self._outstanding.get(pid, ()))
+        for vehicle_id in vehicle_ids:
+            state = {"vehicle_id": vehicle_id, "error_message": reason}
+            self._record(pid, summarize_flow(vehicle_id, state, 0.0, False))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = len(self.results)
+            failed = sum(1 for result in self.results if not result["success"])
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            workers = {str(pid): {**stats, "cpu_sec": round(stats["cpu_sec"], 3)} for pid, stats in self.workers.items()}
+        cpu_sec = sum(stats["cpu_sec"] for stats in workers.values())
+        return {
+            "run_id": self.run_id,
+            "total": len(self.vehicle_ids),
+            "completed": completed,
+            "succeeded": completed - failed,
+            "failed": failed,
+            "elapsed_sec": round(elapsed, 3),
+            "throughput_per_sec": round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+            "processes": len(workers),
+            "cpu_sec": round(cpu_sec, 3),
+            "cpu_ms_per_flow": round(cpu_sec * 1000 / completed, 1) if completed else 0.0,
+            # Busy cores on average; close to `processes` means the run was CPU-bound
+            "cores_used": round(cpu_sec / elapsed, 2) if elapsed > 0 else 0.0,
+            "workers": workers,
+        }
+
+
+@dataclass
+class _Worker:
+    index: int
+    process: Any
+    conn: Any
+    idle: bool = False
+    alive: bool = True
+
+
+class FleetPool:
+    """
+    Long-lived worker processes shared by every fleet run submitted to it.
+
+    Each worker has its own pipe and asks for a chunk whenever it has room, so a worker
+    that dies can't leave a shared queue locked. Dead workers are replaced, and the flows
+    they had taken are reported as failed.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        setup: Optional[Callable[[], None]] = None,
+    ):
+        settings = get_settings()
+        self.processes = processes or settings.fleet_processes or os.cpu_count() or 1
+        self.concurrency = concurrency or settings.fleet_process_concurrency
+        self.chunk_size = chunk_size or settings.fleet_chunk_size
+        # Runs first in every worker, e.g. to register a stand-in LLM; must be picklable
+        self.setup = setup
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._workers: List[_Worker] = []
+        self._pending: Deque[Tuple[str, List[str], bool]] = deque()
+        self._runs: Dict[str, FleetRun] = {}
+        self._collector: Optional[threading.Thread] = None
+        self._closing = False
+
+    def _spawn(self, index: int) -> _Worker:
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.concurrency, self.setup),
+            name=f"fleet-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        # Only the child holds its end now, so the parent reads EOF once the child is gone
+        child_conn.close()
+        return _Worker(index, process, conn)
+
+    def start(self) -> "FleetPool":
+        with self._lock:
+            if not self._workers:
+                self._workers = [self._spawn(index) for index in range(self.processes)]
+                self._collector = threading.Thread(target=self._collect, name="fleet-pool-results", daemon=True)
+                self._collector.start()
+                print(f"🚀 [FleetPool] Started {self.processes} worker process(es), {self.concurrency} flows each")
+        return self
+
+    def submit(
+        self,
+        vehicle_ids: List[str],
+        include_state: bool = False,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> FleetRun:
+        self.start()
+        ids = list(dict.fromkeys(vehicle_ids))
+        run = FleetRun(run_id=uuid.uuid4().hex, vehicle_ids=ids, include_state=include_state, on_result=on_result)
+        if not ids:
+            run.finished_at = run.started_at
+            run._done.set()
+            return run
+        with self._lock:
+            self._runs[run.run_id] = run
+            for offset in range(0, len(ids), self.chunk_size):
+                self._pending.append((run.run_id, ids[offset:offset + self.chunk_size], include_state))
+            for worker in self._workers:
+                if worker.idle and self._pending:
+                    self._dispatch(worker)
+        return run
+
+    def run(self, vehicle_ids: List[str], include_state: bool = False) -> FleetRun:
+        run = self.submit(vehicle_ids, include_state)
+        run.wait()
+        return run
+
+    def _dispatch(self, worker: _Worker) -> None:
+        """Sends the worker the next chunk, or marks it idle; call with the lock held."""
+        if self._closing or not self._pending:
+            worker.idle = True
+            return
+        run_id, vehicle_ids, include_state = self._pending.popleft()
+        self._runs[run_id]._started(worker.process.pid, vehicle_ids)
+        worker.idle = False
+        worker.conn.send((run_id, vehicle_ids, include_state))
+
+    def _handle(self, worker: _Worker, message: Dict[str, Any]) -> None:
+        if message.get("metrics"):
+            merge_metrics(message["metrics"])
+        if message["kind"] == "ready":
+            with self._lock:
+                self._dispatch(worker)
+        elif message["kind"] == "result":
+            with self._lock:
+                run = self._runs.get(message["run_id"])
+            if run is not None:
+                run._record(worker.process.pid, message["result"], message["cpu_sec"])
+                self._forget_if_done(run)
+
+    def _forget_if_done(self, run: FleetRun) -> None:
+        if run.done:
+            with self._lock:
+                self._runs.pop(run.run_id, None)
+
+    def _worker_exited(self, worker: _Worker) -> None:
+        worker.alive = False
+        # Whatever it sent before exiting still counts; only the rest is lost
+        try:
+            while worker.conn.poll():
+                self._handle(worker, worker.conn.recv())
+        except (EOFError, OSError):
+            pass
+        worker.conn.close()
+        worker.process.join()
+        with self._lock:
+            runs = list(self._runs.values())
+            closing = self._closing
+        for run in runs:
+            run._lost(worker.process.pid, f"Worker process exited with code {worker.process.exitcode}")
+            self._forget_if_done(run)
+        if not closing:
+            print(f"⚠️ [FleetPool] {worker.process.name} exited with {worker.process.exitcode}; restarting it")
+            replacement = self._spawn(worker.index)
+            with self._lock:
+                self._workers[worker.index] = replacement
+
+    def _collect(self) -> None:
+        while True:
+            with self._lock:
+                workers = [worker for worker in self._workers if worker.alive]
+            if not workers:
+                return
+            handles = {}
+            for worker in workers:
+                handles[worker.conn] = worker
+                handles[worker.process.sentinel] = worker
+            for handle in connection.wait(list(handles), timeout=1.0):
+                worker = handles[handle]
+                if not worker.alive:
+                    continue
+                try:
+                    message = worker.conn.recv() if handle is worker.conn else None
+                except (EOFError, OSError):
+                    message = None
+                if message is None:
+                    self._worker_exited(worker)
+                    continue
+                try:
+                    self._handle(worker, message)
+                except Exception as exc:  # noqa: BLE001
+                    print(f"⚠️ [FleetPool] Dropped a message from {worker.process.name}: {exc}")
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        """Drops chunks no worker has taken, lets running flows finish, then stops the workers."""
+        with self._lock:
+            if not self._workers or self._closing:
+                return
+            self._closing = True
+            self._pending.clear()
+            workers = list(self._workers)
+            for worker in workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        self._collector.join(5.0)
+
+
+# --- CLI ---
+
+def parse_args(argv=None) -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the agent flow for a fleet on every CPU core.")
+    parser.add_argument("--processes", type=int, default=settings.fleet_processes or os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=settings.fleet_process_concurrency, help="flows per process")
+    parser.add_argument("--chunk-size", type=int, default=settings.fleet_chunk_size)
+    parser.add_argument("--fleet-id", help="run every vehicle of this fleet (default: all vehicles)")
+    parser.add_argument("--vehicle", action="append", dest="vehicle_ids", help="vehicle id; repeatable")
+    parser.add_argument("--include-state", action="store_true", help="keep each flow's full state in the results")
+    parser.add_argument("--output", help="write the summary and per-vehicle results as JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    vehicle_ids = args.vehicle_ids
+    if not vehicle_ids:
+        from app.data.repositories import TelematicsRepo
+
+        vehicle_ids = [v["vehicle_id"] for v in TelematicsRepo.list_vehicles(args.fleet_id) if v.get("vehicle_id")]
+    if not vehicle_ids:
+        print("❌ [FleetPool] No vehicles to process")
+        return 1
+
+    pool = FleetPool(args.processes, args.concurrency, args.chunk_size)
+    try:
+        run = pool.run(vehicle_ids, args.include_state)
+    finally:
+        pool.shutdown()
+    summary = run.summary()
+    print(json.dumps({key: value for key, value in summary.items() if key != "workers"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "results": run.results}, f, indent=2, default=str)
+        print(f"💾 Results written to {args.output}")
+    return 0 if summary["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Durable queue of agent flow jobs in SQLite, shared by the API and the worker processes.
+
+The API only enqueues; `python -m app.agents.flow_worker` runs the flows, so flow
+concurrency scales with worker processes instead of the HTTP threadpool, and queued or
+in-flight work survives a restart. A claimed job is leased for the visibility timeout
+and the worker renews the lease while the flow runs. If the worker dies, the lease
+lapses and another worker picks the job up. Failed attempts are retried with
+exponential backoff, and a retry resumes the flow from its checkpoint (see checkpoints.py).
+A vehicle has at most one queued or running job; enqueueing it again returns that job.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.checkpoints import new_flow_id
+from app.config.settings import get_settings
+
+# Finished jobs beyond FLOW_JOB_HISTORY are deleted once every this many finishes
+PRUNE_EVERY = 100
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS flow_jobs ("
+    " job_id TEXT PRIMARY KEY, vehicle_id TEXT NOT NULL, flow_id TEXT NOT NULL,"
+    " status TEXT NOT NULL, include_state INTEGER NOT NULL DEFAULT 0,"
+    " attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+    " available_at REAL NOT NULL, lease_until REAL, worker TEXT,"
+    " result TEXT, error TEXT,"
+    " created_at REAL NOT NULL, started_at REAL, finished_at REAL)",
+    # Per-vehicle deduplication: one active job per vehicle, enforced across processes
+    "CREATE UNIQUE INDEX IF NOT EXISTS flow_jobs_active_vehicle ON flow_jobs (vehicle_id)"
+    " WHERE status IN ('QUEUED', 'RUNNING')",
+    "CREATE INDEX IF NOT EXISTS flow_jobs_ready ON flow_jobs (status, available_at)",
+)
+
+
+@dataclass
+class FlowJob:
+    job_id: str
+    vehicle_id: str
+    flow_id: str
+    status: str = "QUEUED"  # QUEUED, RUNNING, COMPLETED, FAILED
+    include_state: bool = False
+    attempts: int = 0
+    max_attempts: int = 3
+    available_at: float = field(default_factory=time.time)
+    lease_until: Optional[float] = None
+    worker: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("COMPLETED", "FAILED")
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "FlowJob":
+        values = dict(row)
+        values["include_state"] = bool(values["include_state"])
+        values["result"] = json.loads(values["result"]) if values["result"] else None
+        return cls(**values)
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "job_id": self.job_id,
+            "vehicle_id": self.vehicle_id,
+            "flow_id": self.flow_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "queued_ms": round(((self.started_at or time.time()) - self.created_at) * 1000, 1),
+        }
+        if self.status == "QUEUED" and self.attempts:
+            summary["retry_in_sec"] = round(max(0.0, self.available_at - time.time()), 1)
+        if self.status == "RUNNING":
+            summary["worker"] = self.worker
+        if self.started_at and self.finished_at:
+            summary["run_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.result is not None:
+            summary["result"] = self.result
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+
+class FlowQueue:
+    """
+    One connection per process, shared by its threads behind a lock; SQLite's own locking
+    keeps claims atomic across processes. Every method is one short transaction.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        settings = get_settings()
+        self.path = path or settings.flow_queue_path
+        self.visibility_timeout = settings.flow_visibility_timeout_sec
+        self.max_attempts = settings.flow_max_attempts
+        self.backoff = settings.flow_retry_backoff_sec
+        self.backoff_max = settings.flow_retry_backoff_max_sec
+        self.history = settings.flow_job_history
+        self._lock = threading.Lock()
+        self._finished = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit, with an explicit BEGIN IMMEDIATE where a read must not race another process
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        """Runs a write; returns the number of rows it changed."""
+        with self._lock:
+            return self._conn.execute(query, params).rowcount
+
+    def _fetchone(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+
+    def _fetchall(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def _finish(self, count: int = 1) -> None:
+        """Counts jobs that reached COMPLETED or FAILED, pruning the history every PRUNE_EVERY of them."""
+        with self._lock:
+            before, self._finished = self._finished, self._finished + count
+        if before // PRUNE_EVERY != self._finished // PRUNE_EVERY:
+            # Keep the newest `history` finished jobs for polling
+            self._execute(
+                "DELETE FROM flow_jobs WHERE status IN ('COMPLETED', 'FAILED') AND job_id NOT IN ("
+                " SELECT job_id FROM flow_jobs WHERE status IN ('COMPLETED', 'FAILED')"
+                " ORDER BY finished_at DESC LIMIT ?)",
+                (self.history,),
+            )
+
+    # --- Producers (API) ---
+
+    def enqueue(
+        self, vehicle_id: str, include_state: bool = False, max_attempts: Optional[int] = None
+    ) -> Tuple[FlowJob, bool]:
+        """Returns (job, deduplicated); an already queued or running job for the vehicle is reused."""
+        job = FlowJob(
+            job_id=uuid.uuid4().hex,
+            vehicle_id=vehicle_id,
+            flow_id=new_flow_id(),
+            include_state=include_state,
+            max_attempts=max_attempts or self.max_attempts,
+        )
+        try:
+            self._execute(
+                "INSERT INTO flow_jobs (job_id, vehicle_id, flow_id, status, include_state, max_attempts,"
+                " available_at, created_at) VALUES (?, ?, ?, 'QUEUED', ?, ?, ?, ?)",
+                (job.job_id, vehicle_id, job.flow_id, int(include_state), job.max_attempts,
+                 job.available_at, job.created_at),
+            )
+            return job, False
+        except sqlite3.IntegrityError:
+            row = self._fetchone(
+                "SELECT * FROM flow_jobs WHERE vehicle_id = ? AND status IN ('QUEUED', 'RUNNING')", (vehicle_id,)
+            )
+            if row is None:
+                # The active job finished between the insert and the lookup
+                return self.enqueue(vehicle_id, include_state, max_attempts)
+            return FlowJob.from_row(row), True
+
+    def get(self, job_id: str) -> Optional[FlowJob]:
+        row = self._fetchone("SELECT * FROM flow_jobs WHERE job_id = ?", (job_id,))
+        return FlowJob.from_row(row) if row else None
+
+    def recent(self, vehicle_id: Optional[str] = None, limit: int = 50) -> List[FlowJob]:
+        query, params = "SELECT * FROM flow_jobs", ()
+        if vehicle_id:
+            query, params = query + " WHERE vehicle_id = ?", (vehicle_id,)
+        rows = self._fetchall(query + " ORDER BY created_at DESC LIMIT ?", (*params, limit))
+        return [FlowJob.from_row(row) for row in rows]
+
+    def pending(self) -> int:
+        """Jobs still queued (including retries waiting out their backoff) or running."""
+        return self._fetchone("SELECT COUNT(*) FROM flow_jobs WHERE status IN ('QUEUED', 'RUNNING')")[0]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        counts = dict(self._fetchall("SELECT status, COUNT(*) FROM flow_jobs GROUP BY status"))
+        oldest = self._fetchone("SELECT MIN(created_at) FROM flow_jobs WHERE status = 'QUEUED'")[0]
+        workers = self._fetchone(
+            "SELECT COUNT(DISTINCT worker) FROM flow_jobs WHERE status = 'RUNNING' AND lease_until > ?", (now,)
+        )[0]
+        return {
+            "path": self.path,
+            "queued": counts.get("QUEUED", 0),
+            "running": counts.get("RUNNING", 0),
+            "completed": counts.get("COMPLETED", 0),
+            "failed": counts.get("FAILED", 0),
+            "oldest_queued_sec": round(now - oldest, 1) if oldest else 0.0,
+            "busy_workers": workers,
+            "visibility_timeout_sec": self.visibility_timeout,
+            "max_attempts": self.max_attempts,
+        }
+
+    # --- Consumers (workers) ---
+
+    def claim(self, worker: str) -> Optional[FlowJob]:
+        """
+        Leases the next ready job: queued and due, or running with a lapsed lease (its worker
+        died). A job whose lease lapsed on its last attempt is failed instead.
+        """
+        job, lapsed = self._claim(worker, time.time())
+        if lapsed:
+            self._finish(lapsed)
+        return job
+
+    def _claim(self, worker: str, now: float) -> Tuple[Optional[FlowJob], int]:
+        """The claimed job, if any, and how many lapsed jobs were failed on the way."""
+        lapsed = 0
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT * FROM flow_jobs WHERE (status = 'QUEUED' AND available_at <= ?)"
+                        " OR (status = 'RUNNING' AND lease_until <= ?) ORDER BY available_at LIMIT 1",
+                        (now, now),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None, lapsed
+                    job = FlowJob.from_row(row)
+                    if job.status == "RUNNING" and job.attempts >= job.max_attempts:
+                        conn.execute(
+                            "UPDATE flow_jobs SET status = 'FAILED', error = ?, finished_at = ?, lease_until = NULL"
+                            " WHERE job_id = ?",
+                            (f"Worker {job.worker} stopped responding (attempt {job.attempts} of {job.max_attempts})",
+                             now, job.job_id),
+                        )
+                        lapsed += 1
+                        continue
+                    conn.execute(
+                        "UPDATE flow_jobs SET status = 'RUNNING', attempts = attempts + 1, worker = ?,"
+                        " lease_until = ?, started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+                        (worker, now + self.visibility_timeout, now, job.job_id),
+                    )
+                    row = conn.execute("SELECT * FROM flow_jobs WHERE job_id = ?", (job.job_id,)).fetchone()
+                    conn.execute("COMMIT")
+                    return FlowJob.from_row(row), lapsed
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def extend(self, job: FlowJob, worker: str) -> bool:
+        """Renews the lease; False if the job was reclaimed by another worker meanwhile."""
+        changed = self._execute(
+            "UPDATE flow_jobs SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = 'RUNNING'",
+            (time.time() + self.visibility_timeout, job.job_id, worker),
+        )
+        return changed == 1
+
+    def complete(self, job: FlowJob, worker: str, result: Dict[str, Any]) -> bool:
+        changed = self._execute(
+            "UPDATE flow_jobs SET status = 'COMPLETED', result = ?, error = NULL, finished_at = ?,"
+            " lease_until = NULL WHERE job_id = ? AND worker = ? AND status = 'RUNNING'",
+            (json.dumps(result, default=str), time.time(), job.job_id, worker),
+        )
+        # 0 rows: the lease was lost and another worker owns the job now
+        if changed == 1:
+            self._finish()
+        return changed == 1
+
+    def fail(self, job: FlowJob, worker: str, error: str) -> bool:
+        """Schedules a retry after backoff * 2^(attempt-1) seconds, or fails the job for good."""
+        now = time.time()
+        if job.attempts < job.max_attempts:
+            delay = min(self.backoff * 2 ** (job.attempts - 1), self.backoff_max)
+            changed = self._execute(
+                "UPDATE flow_jobs SET status = 'QUEUED', error = ?, available_at = ?, lease_until = NULL,"
+                " worker = NULL WHERE job_id = ? AND worker = ? AND status = 'RUNNING'",
+                (error, now + delay, job.job_id, worker),
+            )
+            return changed == 1
+        changed = self._execute(
+            "UPDATE flow_jobs SET status = 'FAILED', error = ?, finished_at = ?, lease_until = NULL"
+            " WHERE job_id = ? AND worker = ? AND status = 'RUNNING'",
+            (error, now, job.job_id, worker),
+        )
+        if changed == 1:
+            self._finish()
+        return changed == 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_queue: Optional[FlowQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_flow_queue() -> FlowQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = FlowQueue()
+        return _queue
@@ -0,0 +1,21 @@
+"""Per-vehicle flow results, as reported by batch jobs, the fleet pool and the flow queue."""
+
+from typing import Any, Dict
+
+
+def summarize_flow(vehicle_id: str, state: Dict[str, Any], duration: float, include_state: bool) -> Dict[str, Any]:
+    """The outcome of one flow from its final state; `include_state` also attaches the whole state."""
+    result = {
+        "vehicle_id": vehicle_id,
+        "flow_id": state.get("flow_id"),
+        "success": not state.get("error_message"),
+        "risk_score": state.get("risk_score"),
+        "risk_level": state.get("risk_level"),
+        "priority_level": state.get("priority_level"),
+        "booking_id": state.get("booking_id"),
+        "error": state.get("error_message"),
+        "duration_ms": round(duration * 1000, 1),
+    }
+    if include_state:
+        result["data"] = state
+    return result
@@ -0,0 +1,152 @@
+"""
+Worker processes for the durable flow queue (see flow_queue.py).
+
+    python -m app.agents.flow_worker --workers 4
+    python -m app.agents.flow_worker --drain   # run until nothing is queued or running
+
+Each process claims one job at a time and runs it on the sync graph, so the flows of
+different workers run on different cores. The launcher restarts workers that crash, and
+on SIGINT/SIGTERM it lets the running flows finish before exiting. A flow that raises is
+retried with backoff; with CHECKPOINT_ENABLED, retries resume from the flow's last
+checkpoint instead of starting over.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from app.agents.flow_result import summarize_flow
+from app.config.settings import get_settings
+
+
+def _keep_leased(queue, job, worker: str, done: threading.Event) -> None:
+    """Renews the job's lease while the flow runs, so only dead workers lose their jobs."""
+    while not done.wait(queue.visibility_timeout / 3):
+        if not queue.extend(job, worker):
+            print(f"⚠️ [FlowWorker {worker}] Lost the lease on job {job.job_id}; another worker took it over")
+            return
+
+
+def _run_flow(job) -> Dict[str, Any]:
+    from app.agents.master import resume_predictive_flow, run_predictive_flow
+
+    if job.attempts > 1:
+        try:
+            return resume_predictive_flow(job.flow_id)
+        except KeyError:
+            # Checkpointing is off or nothing was saved: start over under the same flow id
+            pass
+    return run_predictive_flow(job.vehicle_id, flow_id=job.flow_id)
+
+
+def run_job(queue, job, worker: str) -> bool:
+    """Runs one claimed job and records the outcome; returns whether it completed."""
+    print(f"🛠️ [FlowWorker {worker}] {job.vehicle_id}: job {job.job_id} attempt {job.attempts}/{job.max_attempts}")
+    done = threading.Event()
+    keeper = threading.Thread(target=_keep_leased, args=(queue, job, worker, done), daemon=True)
+    keeper.start()
+    started = time.perf_counter()
+    try:
+        state = _run_flow(job)
+    except Exception as exc:  # noqa: BLE001
+        print(f"⚠️ [FlowWorker {worker}] {job.vehicle_id} failed: {exc}")
+        queue.fail(job, worker, str(exc))
+        return False
+    finally:
+        done.set()
+        keeper.join()
+
+    # A flow that finished with an error_message is not retried here; it stays resumable by flow_id
+    queue.complete(job, worker, summarize_flow(job.vehicle_id, state, time.perf_counter() - started, job.include_state))
+    return True
+
+
+def work(stop, poll_interval: float, drain: bool = False) -> None:
+    """Claim-run loop of one worker process."""
+    from app.agents.flow_queue import FlowQueue
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    queue = FlowQueue()
+    print(f"👷 [FlowWorker {worker}] Polling {queue.path}")
+    try:
+        while not stop.is_set():
+            job = queue.claim(worker)
+            if job is None:
+                if drain and queue.pending() == 0:
+                    return
+                stop.wait(poll_interval)
+                continue
+            run_job(queue, job, worker)
+    finally:
+        queue.close()
+
+
+def _process_main(stop, poll_interval: float, drain: bool) -> None:
+    # Ctrl-C goes to the whole process group; the launcher decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(stop, poll_interval, drain)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run agent flows from the durable job queue.")
+    parser.add_argument("--workers", type=int, default=settings.flow_workers, help="worker processes")
+    parser.add_argument("--poll-interval", type=float, default=settings.flow_poll_interval_sec, help="seconds")
+    parser.add_argument("--drain", action="store_true", help="stop once no job is queued or running")
+    parser.add_argument("--grace", type=float, default=60.0, help="seconds to let running flows finish on shutdown")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # spawn: each worker builds its own graph, clients and UEBA pipeline from scratch
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+
+    def start(index: int):
+        process = context.Process(
+            target=_process_main, args=(stop, args.poll_interval, args.drain), name=f"flow-worker-{index}"
+        )
+        process.start()
+        return process
+
+    signals: List[int] = []
+
+    def request_stop(signum, frame) -> None:
+        # Only note it: setting `stop` in a handler can deadlock with a wait holding its lock
+        signals.append(signum)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    processes: List[Any] = [start(index) for index in range(args.workers)]
+    print(f"🚀 [FlowWorker] Started {len(processes)} worker process(es)")
+    while not signals and any(process.is_alive() for process in processes):
+        for index, process in enumerate(processes):
+            if process.exitcode not in (None, 0):
+                # Its job's lease lapses and the job is picked up again (as a retry)
+                print(f"⚠️ [FlowWorker] {process.name} exited with {process.exitcode}; restarting it")
+                processes[index] = start(index)
+        time.sleep(0.5)
+
+    if signals:
+        print("🛑 [FlowWorker] Stopping after the running flows finish...")
+    stop.set()
+
+    deadline = time.monotonic() + args.grace
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
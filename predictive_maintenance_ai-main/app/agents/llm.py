@@ -0,0 +1,185 @@
+"""Shared LLM client registry.
+
+Clients are built once per (provider, model) from `get_settings()` and reused by
+every node, so repeated calls ride the same keep-alive connection pool instead of
+paying a new HTTP client and TLS handshake each time. Calls go through
+`invoke_llm` / `ainvoke_llm`, which enforce a concurrency limit and record
+per-node timing.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+
+from app.observability.metrics import record_llm
+from app.config.settings import get_settings
+
+
+_lock = threading.Lock()
+_sync_clients: Dict[Tuple[str, str], BaseChatModel] = {}
+# httpx async pools are bound to the loop that opened them, so async clients are kept per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], BaseChatModel]]" = (
+    weakref.WeakKeyDictionary()
+)
+_overrides: Dict[Tuple[str, str], BaseChatModel] = {}
+
+_sync_slots: Optional[threading.BoundedSemaphore] = None
+_async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _key(provider: Optional[str], model: Optional[str]) -> Tuple[str, str]:
+    settings = get_settings()
+    return (provider or settings.llm_provider, model or settings.llm_model)
+
+
+def _pool_limits() -> httpx.Limits:
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.llm_pool_size,
+        max_keepalive_connections=settings.llm_pool_size,
+        keepalive_expiry=settings.llm_keepalive_sec,
+    )
+
+
+def _build_llm(provider: str, model: str, use_async: bool) -> BaseChatModel:
+    settings = get_settings()
+    if provider == "google":
+        return ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=settings.google_api_key,
+            api_version=settings.llm_api_version,
+            timeout=settings.llm_timeout,
+            max_retries=settings.llm_max_retries,
+        )
+
+    pooled = {"http_async_client": httpx.AsyncClient(limits=_pool_limits())} if use_async else {
+        "http_client": httpx.Client(limits=_pool_limits())
+    }
+    return ChatOpenAI(
+        model=model,
+        base_url=settings.llm_base_url,
+        api_key=settings.openai_api_key,
+        timeout=settings.llm_timeout,
+        max_retries=settings.llm_max_retries,
+        **pooled,
+    )
+
+
+def get_llm(provider: Optional[str] = None, model: Optional[str] = None) -> BaseChatModel:
+    """Returns the shared client for (provider, model), building it on first use."""
+    key = _key(provider, model)
+    override = _overrides.get(key)
+    if override is not None:
+        return override
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        clients = _sync_clients if loop is None else _async_clients.setdefault(loop, {})
+        llm = clients.get(key)
+        if llm is None:
+            llm = _build_llm(*key, use_async=loop is not None)
+            clients[key] = llm
+        return llm
+
+
+def register_llm(llm: BaseChatModel, provider: Optional[str] = None, model: Optional[str] = None) -> None:
+    """Pins a client for (provider, model), e.g. a local stand-in for tests and benchmarks."""
+    _overrides[_key(provider, model)] = llm
+
+
+def clear_llm_registry() -> None:
+    with _lock:
+        _sync_clients.clear()
+        _async_clients.clear()
+        _overrides.clear()
+
+
+def _sync_semaphore() -> threading.BoundedSemaphore:
+    global _sync_slots
+    if _sync_slots is None:
+        with _lock:
+            if _sync_slots is None:
+                _sync_slots = threading.BoundedSemaphore(get_settings().llm_max_concurrency)
+    return _sync_slots
+
+
+def _async_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(get_settings().llm_max_concurrency)
+        _async_slots[loop] = slots
+    return slots
+
+
+def _record(node: str, started: float, waited: float, failed: bool) -> None:
+    elapsed = time.perf_counter() - started
+    record_llm(elapsed)
+    with _lock:
+        entry = _stats.setdefault(
+            node, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_ms": 0.0}
+        )
+        entry["calls"] += 1
+        entry["errors"] += int(failed)
+        entry["total_ms"] += elapsed * 1000
+        entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+        entry["queue_ms"] += waited * 1000
+
+
+def invoke_llm(messages: List[BaseMessage], node: str = "default", **kwargs) -> Any:
+    llm = get_llm(**kwargs)
+    queued = time.perf_counter()
+    with _sync_semaphore():
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = llm.invoke(messages)
+            failed = False
+            return response
+        finally:
+            _record(node, started, started - queued, failed)
+
+
+async def ainvoke_llm(messages: List[BaseMessage], node: str = "default", **kwargs) -> Any:
+    llm = get_llm(**kwargs)
+    queued = time.perf_counter()
+    async with _async_semaphore():
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await llm.ainvoke(messages)
+            failed = False
+            return response
+        finally:
+            _record(node, started, started - queued, failed)
+
+
+def llm_stats() -> Dict[str, Any]:
+    settings = get_settings()
+    with _lock:
+        nodes = {
+            node: {**entry, "avg_ms": round(entry["total_ms"] / entry["calls"], 1) if entry["calls"] else 0.0}
+            for node, entry in _stats.items()
+        }
+        pooled = len(_sync_clients) + sum(len(c) for c in _async_clients.values())
+    return {
+        "provider": settings.llm_provider,
+        "model": settings.llm_model,
+        "max_concurrency": settings.llm_max_concurrency,
+        "pooled_clients": pooled,
+        "nodes": nodes,
+    }
@@ -1,13 +1,56 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from app.agents.checkpoints import flow_config, forget_flow, get_checkpointer, new_flow_id, resume_point, touch_flow
 from app.agents.state import AgentState
+from app.config.settings import get_settings
+from app.agents.tracing import finish_flow, flow_span, node_span
 
 # Import ALL Worker Nodes
-from app.agents.nodes.data_analysis import data_analysis_node
-from app.agents.nodes.diagnosis import diagnosis_node
-from app.agents.nodes.customer_engagement import customer_node
-from app.agents.nodes.scheduling import scheduling_node
-from app.agents.nodes.feedback import feedback_node          # <--- NEW IMPORT
-from app.agents.nodes.manufacturing_insights import manufacturing_node
+from app.agents.nodes.data_analysis import adata_analysis_node, data_analysis_node
+from app.agents.nodes.diagnosis import adiagnosis_node, diagnosis_node
+from app.agents.nodes.customer_engagement import acustomer_node, customer_node
+from app.agents.nodes.scheduling import ascheduling_node, scheduling_node
+from app.agents.nodes.feedback import afeedback_node, feedback_node          # <--- NEW IMPORT
+from app.agents.nodes.manufacturing_insights import amanufacturing_node, manufacturing_node
+
+
+def _node(name: str, func, afunc):
+    """
+    Pairs a node's sync and async implementations so both `invoke` and `ainvoke` work,
+    timing each run under `name` (see tracing.py).
+    """
+    def traced(state: AgentState) -> dict:
+        with node_span(name):
+            return func(state)
+
+    async def atraced(state: AgentState) -> dict:
+        with node_span(name):
+            return await afunc(state)
+
+    return RunnableLambda(traced, afunc=atraced, name=func.__name__)
+
+
+def _join_node(state: AgentState) -> dict:
+    """Barrier for the parallel branches; nothing left to write."""
+    print(f"🏁 [Master] Flow complete for {state['vehicle_id']}")
+    return {}
+
+
+def route_after_analysis(state: AgentState) -> str:
+    """Healthy (LOW) or errored vehicles skip every LLM and scheduler call."""
+    if state.get("error_message") or state.get("risk_level", "LOW") == "LOW":
+        return END
+    return "diagnosis"
+
+
+def route_after_diagnosis(state: AgentState):
+    if state.get("error_message"):
+        return END
+    return ["customer_engagement", "manufacturing"]
+
 
 def build_graph():
     """
@@ -17,56 +60,164 @@ def build_graph():
     workflow = StateGraph(AgentState)
 
     # 2. Add Nodes (The Workers)
-    workflow.add_node("data_analysis", data_analysis_node)
-    workflow.add_node("diagnosis", diagnosis_node)
-    workflow.add_node("customer_engagement", customer_node)
-    workflow.add_node("scheduling", scheduling_node)
-    workflow.add_node("feedback", feedback_node)             # <--- ADD NODE
-    workflow.add_node("manufacturing", manufacturing_node)
+    workflow.add_node("data_analysis", _node("data_analysis", data_analysis_node, adata_analysis_node))
+    workflow.add_node("diagnosis", _node("diagnosis", diagnosis_node, adiagnosis_node))
+    workflow.add_node("customer_engagement", _node("customer_engagement", customer_node, acustomer_node))
+    workflow.add_node("scheduling", _node("scheduling", scheduling_node, ascheduling_node))
+    workflow.add_node("feedback", _node("feedback", feedback_node, afeedback_node))             # <--- ADD NODE
+    workflow.add_node("manufacturing", _node("manufacturing", manufacturing_node, amanufacturing_node))
+
+    workflow.add_node("join", _join_node)
 
     # 3. Define Edges (The Logic Flow)
     # Start -> Analysis
     workflow.set_entry_point("data_analysis")
 
-    # Analysis -> Diagnosis
-    workflow.add_edge("data_analysis", "diagnosis")
+    # Analysis -> Diagnosis (or straight to END when healthy / errored)
+    workflow.add_conditional_edges("data_analysis", route_after_analysis, ["diagnosis", END])
 
-    # Diagnosis -> Customer
-    workflow.add_edge("diagnosis", "customer_engagement")
+    # Diagnosis fans out into two independent branches that run concurrently:
+    #   Customer -> Scheduler -> Feedback   (needs the booking decision)
+    #   Manufacturing (CAPA)                (needs only the diagnosis)
+    workflow.add_conditional_edges(
+        "diagnosis", route_after_diagnosis, ["customer_engagement", "manufacturing", END]
+    )
 
-    # Customer -> Scheduler
     workflow.add_edge("customer_engagement", "scheduling")
+    workflow.add_edge("scheduling", "feedback")
 
-    # Scheduler -> Feedback
-    workflow.add_edge("scheduling", "feedback")              # <--- CONNECT SCHEDULER TO FEEDBACK
+    # Join: waits for BOTH branches before finishing (see state.py for the merge contract)
+    workflow.add_edge(["feedback", "manufacturing"], "join")
+    workflow.add_edge("join", END)
 
-    # Feedback -> Manufacturing (CAPA)
-    workflow.add_edge("feedback", "manufacturing")           # <--- CONNECT FEEDBACK TO MANUFACTURING
-
-    # Manufacturing -> END
-    workflow.add_edge("manufacturing", END)
-
-    # 4. Compile the brain
-    return workflow.compile()
+    # 4. Compile the brain (state is checkpointed after every step, see checkpoints.py)
+    return workflow.compile(checkpointer=get_checkpointer())
 
 # Initialize the runnable application ONCE
 agent_app = build_graph()
 
-def run_predictive_flow(vehicle_id: str):
+def _initial_state(vehicle_id: str, flow_id: str) -> dict:
+    return {
+        "vehicle_id": vehicle_id,
+        "flow_id": flow_id,
+        "risk_score": 0,
+        "detected_issues": [],
+        "ueba_alert_triggered": False
+    }
+
+
+def _config(flow_id: str, checkpoint_id: Optional[str] = None) -> Optional[dict]:
+    return flow_config(flow_id, checkpoint_id) if get_checkpointer() is not None else None
+
+
+def _release(state: dict) -> None:
+    """Flows that finished without an error have nothing to resume; their checkpoints go."""
+    if not state.get("error_message") and not get_settings().checkpoint_keep_completed:
+        forget_flow(state["flow_id"])
+
+
+def _finish(trace, state: dict, include_timings: bool) -> dict:
+    finish_flow(trace, state)
+    if include_timings:
+        state = {**state, "timings": trace.breakdown()}
+    return state
+
+
+def run_predictive_flow(vehicle_id: str, include_timings: bool = False, flow_id: Optional[str] = None):
     """
     The main entry point for the API/UI to call.
+    With `include_timings`, the returned state carries a per-node "timings" breakdown.
+    Pass a `flow_id` to be able to resume the flow if this call raises.
     """
     print(f"\n🚀 STARTING FULL AGENT FLOW FOR: {vehicle_id}")
     
     # Initialize State
-    initial_state = {
-        "vehicle_id": vehicle_id,
-        "risk_score": 0,
-        "detected_issues": [],
-        "ueba_alert_triggered": False
-    }
+    flow_id = flow_id or new_flow_id()
+    initial_state = _initial_state(vehicle_id, flow_id)
+    touch_flow(flow_id, vehicle_id)
 
     # Run the Graph
-    final_state = agent_app.invoke(initial_state)
-    
-    return final_state
\ No newline at end of file
+    with flow_span(vehicle_id, flow_id) as trace:
+        final_state = agent_app.invoke(initial_state, _config(flow_id))
+        _release(final_state)
+        return _finish(trace, final_state, include_timings)
+
+
+async def run_predictive_flow_async(vehicle_id: str, include_timings: bool = False, flow_id: Optional[str] = None):
+    """
+    Async entry point: runs the same graph with `ainvoke` so the caller's event loop is never blocked.
+    """
+    print(f"\n🚀 STARTING FULL AGENT FLOW FOR: {vehicle_id}")
+
+    flow_id = flow_id or new_flow_id()
+    await asyncio.to_thread(touch_flow, flow_id, vehicle_id)
+    with flow_span(vehicle_id, flow_id) as trace:
+        final_state = await agent_app.ainvoke(_initial_state(vehicle_id, flow_id), _config(flow_id))
+        await asyncio.to_thread(_release, final_state)
+        return _finish(trace, final_state, include_timings)
+
+
+def resume_predictive_flow(flow_id: str, include_timings: bool = False):
+    """
+    Continues a checkpointed flow from its last completed node; only the failed step and
+    what follows it run again. A flow with nothing left to redo returns its stored state.
+    Raises KeyError for unknown flows.
+    """
+    start = resume_point(agent_app, flow_id)
+    if start is None:
+        return agent_app.get_state(flow_config(flow_id)).values
+
+    vehicle_id = start.values["vehicle_id"]
+    print(f"\n🔁 RESUMING AGENT FLOW {flow_id} FOR: {vehicle_id} (next: {', '.join(start.next)})")
+    touch_flow(flow_id, vehicle_id)
+
+    with flow_span(vehicle_id, flow_id) as trace:
+        final_state = agent_app.invoke(None, start.config)
+        _release(final_state)
+        return _finish(trace, final_state, include_timings)
+
+
+async def resume_predictive_flow_async(flow_id: str, include_timings: bool = False):
+    """Async counterpart of `resume_predictive_flow`."""
+    start = await asyncio.to_thread(resume_point, agent_app, flow_id)
+    if start is None:
+        return (await agent_app.aget_state(flow_config(flow_id))).values
+
+    vehicle_id = start.values["vehicle_id"]
+    print(f"\n🔁 RESUMING AGENT FLOW {flow_id} FOR: {vehicle_id} (next: {', '.join(start.next)})")
+    await asyncio.to_thread(touch_flow, flow_id, vehicle_id)
+
+    with flow_span(vehicle_id, flow_id) as trace:
+        final_state = await agent_app.ainvoke(None, start.config)
+        await asyncio.to_thread(_release, final_state)
+        return _finish(trace, final_state, include_timings)
+
+async def stream_predictive_flow(vehicle_id: str, flow_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams the flow as it runs:
+      {"type": "update", "node": ..., "data": {...}}    partial state as each node finishes
+      {"type": "token", "node": ..., "content": "..."}  LLM tokens while a node is generating
+      {"type": "done", "state": {...}}                  final merged state
+    """
+    print(f"\n🚀 STREAMING AGENT FLOW FOR: {vehicle_id}")
+
+    flow_id = flow_id or new_flow_id()
+    await asyncio.to_thread(touch_flow, flow_id, vehicle_id)
+    final_state: Dict[str, Any] = {}
+    with flow_span(vehicle_id, flow_id) as trace:
+        async for mode, chunk in agent_app.astream(
+            _initial_state(vehicle_id, flow_id), _config(flow_id), stream_mode=["updates", "messages", "values"]
+        ):
+            if mode == "updates":
+                for node, update in chunk.items():
+                    yield {"type": "update", "node": node, "data": update or {}}
+            elif mode == "messages":
+                message, metadata = chunk
+                if message.content:
+                    yield {"type": "token", "node": metadata.get("langgraph_node"), "content": message.content}
+            else:
+                final_state = chunk
+        await asyncio.to_thread(_release, final_state)
+        finish_flow(trace, final_state)
+
+    yield {"type": "done", "state": final_state, "timings": trace.breakdown()}
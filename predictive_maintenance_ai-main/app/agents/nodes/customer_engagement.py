@@ -1,74 +1,87 @@
-import os
-
-from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 
+from app.agents.llm import ainvoke_llm, invoke_llm
+from app.agents.prompts import CUSTOMER_ENGAGEMENT, TokenMeter
 from app.agents.state import AgentState
 from app.data.repositories import NotificationRepo
-from app.ueba.middleware import secure_call
-from app.config.settings import get_settings
+from app.ueba.middleware import asecure_call, secure_call
 
-load_dotenv()
 
+# Only these priorities warrant booking a workshop slot straight away
+URGENT_PRIORITIES = {"High", "Critical"}
 
-def _get_llm():
-    settings = get_settings()
-    if settings.llm_provider == "google":
-        return ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            google_api_key=settings.google_api_key,
-            api_version=settings.llm_api_version,
-        )
-    else:
-        return ChatOpenAI(
-            model=settings.llm_model,
-            base_url="https://openrouter.ai/api/v1",
-            api_key=settings.openai_api_key,
-        )
 
-def customer_node(state: AgentState) -> AgentState:
-    print("🗣️ [Customer] Drafting notification...")
-    
-    # Get details
+def _is_urgent(state: AgentState) -> bool:
+    return state.get("priority_level") in URGENT_PRIORITIES
+
+
+def _build_prompt(state: AgentState) -> str:
     owner = state["vehicle_metadata"].get("owner", "Customer")
     model = state["vehicle_metadata"].get("model", "Vehicle")
-    diagnosis = state["diagnosis_report"]
+    # Compact diagnosis fields only; the full report isn't needed for a short message
+    component = state.get("failed_component") or "Unknown"
+    action = state.get("recommended_action") or "Inspection"
     priority = state["priority_level"]
 
-    llm = _get_llm()
+    if _is_urgent(state):
+        topic = f"Their {model} needs urgent repair."
+        ask = "Ask them to confirm a booking for tomorrow."
+    else:
+        topic = f"Their {model} shows early signs of wear worth checking."
+        ask = "Suggest they schedule a check-up at their next convenience."
 
     # Prompt the AI to write a message
-    prompt = f"""
-    You are a Service Advisor at a Truck Dealership.
-    Write a short, professional text message to {owner}.
-    
-    Topic: Their {model} needs urgent repair.
-    Diagnosis Summary: {diagnosis}
-    Priority: {priority}
-    
-    Ask them to confirm a booking for tomorrow.
-    """
-
-    response = llm.invoke([HumanMessage(content=prompt)])
-    state["customer_script"] = response.content
+    return CUSTOMER_ENGAGEMENT.render(
+        owner=owner, topic=topic, component=component, action=action, priority=priority, ask=ask
+    )
+
+
+def _notification_args(state: AgentState, script: str) -> tuple:
+    return (
+        state["vehicle_id"],
+        script,
+        "app",
+        {"priority": state["priority_level"]},
+    )
+
+
+def _finish(state: AgentState, script: str, meter: TokenMeter) -> dict:
+    owner = state["vehicle_metadata"].get("owner", "Customer")
+    print(f"📞 [Customer] Message sent to {owner}. Waiting for reply...")
+
+    decision = "BOOKED" if _is_urgent(state) else "DEFERRED"
+    return {"customer_script": script, "customer_decision": decision, **meter.update()}
+
+
+def customer_node(state: AgentState) -> dict:
+    print("🗣️ [Customer] Drafting notification...")
+
+    prompt = _build_prompt(state)
+    meter = TokenMeter("customer_engagement")
+    response = meter.record(prompt, invoke_llm([HumanMessage(content=prompt)], node="customer_engagement"))
+    script = response.content
 
     agent_name = "CustomerEngagement"
     try:
-        secure_call(
-            agent_name,
-            "NotificationRepo",
-            NotificationRepo.push_notification,
-            state["vehicle_id"],
-            state["customer_script"],
-            "app",
-            {"priority": priority},
-        )
+        secure_call(agent_name, "NotificationRepo", NotificationRepo.push_notification, *_notification_args(state, script))
     except Exception as exc:  # noqa: BLE001
         print(f"⚠️ [Customer] Notification failed: {exc}")
 
-    print(f"📞 [Customer] Message sent to {owner}. Waiting for reply...")
-    state["customer_decision"] = "BOOKED"
+    return _finish(state, script, meter)
+
+
+async def acustomer_node(state: AgentState) -> dict:
+    print("🗣️ [Customer] Drafting notification...")
+
+    prompt = _build_prompt(state)
+    meter = TokenMeter("customer_engagement")
+    response = meter.record(prompt, await ainvoke_llm([HumanMessage(content=prompt)], node="customer_engagement"))
+    script = response.content
+
+    agent_name = "CustomerEngagement"
+    try:
+        await asecure_call(agent_name, "NotificationRepo", NotificationRepo.apush_notification, *_notification_args(state, script))
+    except Exception as exc:  # noqa: BLE001
+        print(f"⚠️ [Customer] Notification failed: {exc}")
 
-    return state
\ No newline at end of file
+    return _finish(state, script, meter)
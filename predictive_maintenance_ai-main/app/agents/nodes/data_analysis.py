@@ -1,39 +1,93 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from app.agents.state import AgentState
 from app.data.repositories import MaintenanceRepo, TelematicsRepo, VehicleRepo
 from app.domain.risk_rules import calculate_risk_score
 
 # IMPORT UEBA
-from app.ueba.middleware import secure_call
+from app.ueba.middleware import asecure_call, secure_call
+
+# Telematics and maintenance are independent reads, so the sync node issues them side by side
+_fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="data-analysis")
+
+
+def healthy_report() -> dict:
+    """Summary for LOW-risk vehicles, which the graph routes straight to END (no LLM needed)."""
+    return {
+        "diagnosis_report": "Vehicle is healthy. No issues detected.",
+        "recommended_action": "Monitor",
+        "priority_level": "Low",
+        "manufacturing_recommendations": "No design changes needed.",
+    }
+
+
+def _analyze(state: AgentState, vehicle, telematics, maintenance) -> dict:
+    if not vehicle or not telematics:
+        return {"error_message": f"Vehicle {state['vehicle_id']} not found."}
+
+    # 3. Calculate Risk (Internal logic doesn't need UEBA, only external data access)
+    risk_assessment = calculate_risk_score(telematics)
+    
+    update = {
+        "vehicle_metadata": vehicle,
+        "telematics_data": telematics,
+        "maintenance_history": maintenance,
+        "risk_score": risk_assessment["score"],
+        "risk_level": risk_assessment["level"],
+        "detected_issues": risk_assessment["reasons"],
+    }
+    if risk_assessment["level"] == "LOW":
+        update.update(healthy_report())
+    return update
+
+
+def _blocked(exc: PermissionError) -> dict:
+    return {"error_message": str(exc), "ueba_alert_triggered": True}
+
 
-def data_analysis_node(state: AgentState) -> AgentState:
+def data_analysis_node(state: AgentState) -> dict:
     v_id = state["vehicle_id"]
     agent_name = "DataAnalysis"  # Aligns with UEBA policy
     
     print(f"🔍 [Analyzer] Requesting secure access for {v_id}...")
 
     try:
-        vehicle = secure_call(agent_name, "VehicleRepo", VehicleRepo.get_vehicle_details, v_id)
-        telematics = secure_call(agent_name, "TelematicsRepo", TelematicsRepo.get_latest_telematics, v_id)
-        maintenance = secure_call(agent_name, "MaintenanceRepo", MaintenanceRepo.get_maintenance_history, v_id)
-
-        if not vehicle or not telematics:
-            state["error_message"] = f"Vehicle {v_id} not found."
-            return state
-
-        state["vehicle_metadata"] = vehicle
-        state["telematics_data"] = telematics
-        state["maintenance_history"] = maintenance
-
-        # 3. Calculate Risk (Internal logic doesn't need UEBA, only external data access)
-        risk_assessment = calculate_risk_score(telematics)
-        
-        state["risk_score"] = risk_assessment["score"]
-        state["risk_level"] = risk_assessment["level"]
-        state["detected_issues"] = risk_assessment["reasons"]
-        
-        return state
+        # Each fetch runs in a copy of this context, so tracing attributes it to this node
+        telematics_call = _fetch_pool.submit(
+            contextvars.copy_context().run,
+            secure_call, agent_name, "TelematicsRepo", TelematicsRepo.get_latest_telematics, v_id
+        )
+        maintenance_call = _fetch_pool.submit(
+            contextvars.copy_context().run,
+            secure_call, agent_name, "MaintenanceRepo", MaintenanceRepo.get_maintenance_history, v_id
+        )
+        telematics = telematics_call.result()
+        maintenance = maintenance_call.result()
+        # Metadata comes from the same telematics payload; still routed through UEBA for the audit trail
+        vehicle = secure_call(agent_name, "VehicleRepo", VehicleRepo.from_telematics, v_id, telematics)
+
+        return _analyze(state, vehicle, telematics, maintenance)
+
+    except PermissionError as e:
+        return _blocked(e)
+
+
+async def adata_analysis_node(state: AgentState) -> dict:
+    v_id = state["vehicle_id"]
+    agent_name = "DataAnalysis"
+
+    print(f"🔍 [Analyzer] Requesting secure access for {v_id}...")
+
+    try:
+        telematics, maintenance = await asyncio.gather(
+            asecure_call(agent_name, "TelematicsRepo", TelematicsRepo.aget_latest_telematics, v_id),
+            asecure_call(agent_name, "MaintenanceRepo", MaintenanceRepo.aget_maintenance_history, v_id),
+        )
+        vehicle = await asecure_call(agent_name, "VehicleRepo", VehicleRepo.from_telematics, v_id, telematics)
+
+        return _analyze(state, vehicle, telematics, maintenance)
 
     except PermissionError as e:
-        state["error_message"] = str(e)
-        state["ueba_alert_triggered"] = True
-        return state
\ No newline at end of file
+        return _blocked(e)
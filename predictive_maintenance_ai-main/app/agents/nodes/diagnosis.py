@@ -1,87 +1,140 @@
-import os
+from typing import List, Optional
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 
+from app.agents.llm import ainvoke_llm, invoke_llm
+from app.agents.nodes.data_analysis import healthy_report
+from app.agents.prompts import DIAGNOSIS, TokenMeter
+from app.agents.response_cache import acached_call, cached_call, fault_key
 from app.agents.state import AgentState
 from app.config.settings import get_settings
+from app.domain.diagnosis import SCHEMA_PROMPT, Diagnosis, legacy_diagnosis, parse_diagnosis
 
+# Part of the cache key, so answers in an older output format are never reused
+OUTPUT_FORMAT = "json-v1"
 
-def _get_llm():
-    settings = get_settings()
-    if settings.llm_provider == "google":
-        return ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            google_api_key=settings.google_api_key,
-            api_version=settings.llm_api_version,
-        )
-    else:
-        return ChatOpenAI(
-            model=settings.llm_model,
-            base_url="https://openrouter.ai/api/v1",
-            api_key=settings.openai_api_key,
-        )
 
+def _is_healthy(state: AgentState) -> bool:
+    return state.get("risk_score", 0) < 20
 
-def diagnosis_node(state: AgentState) -> AgentState:
+
+def _build_prompt(state: AgentState) -> str:
+    telematics = state["telematics_data"]
+    codes = telematics.get("dtc_readable")
+    return DIAGNOSIS.render(
+        model=state["vehicle_metadata"].get("model"),
+        issues=state["detected_issues"],
+        oil_pressure=telematics.get("oil_pressure_psi"),
+        engine_temp=telematics.get("engine_temp_c"),
+        codes=", ".join(codes) if isinstance(codes, list) else codes,
+        schema=SCHEMA_PROMPT,
+    )
+
+
+def _repair(messages: List[BaseMessage], content: str, error: ValueError) -> List[BaseMessage]:
+    # Validation errors can be long; the first lines are enough for the model to fix its output
+    details = "\n".join(str(error).splitlines()[:6])
+    return messages + [
+        AIMessage(content=content),
+        HumanMessage(content=f"That response is invalid:\n{details}\nReply with only the corrected JSON object."),
+    ]
+
+
+def _validated(content: str, messages: List[BaseMessage], attempt: int) -> tuple:
+    """Returns (canonical JSON or None, messages for the repair call or None when out of retries)."""
+    try:
+        return parse_diagnosis(content).model_dump_json(), None
+    except ValueError as exc:
+        if attempt >= get_settings().diagnosis_repair_retries:
+            print(f"⚠️ [Diagnosis] Output failed validation, giving up: {str(exc).splitlines()[0]}")
+            return None, None
+        print(f"⚠️ [Diagnosis] Output failed validation, asking for a repair: {str(exc).splitlines()[0]}")
+        return None, _repair(messages, content, exc)
+
+
+def _fallback(state: AgentState, raw: Optional[str]) -> Diagnosis:
+    """Last resort when the model never produced valid output: priority follows the rule-based risk level."""
+    legacy = legacy_diagnosis(raw)
+    if legacy is not None:
+        return legacy
+    report = " ".join((raw or "").split())[:300] or "; ".join(state.get("detected_issues") or [])
+    return Diagnosis(
+        report=report or "Diagnosis unavailable.",
+        action="Inspect vehicle at workshop",
+        priority=(state.get("risk_level") or "MEDIUM").capitalize(),
+        confidence=0.0,
+    )
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(message.content for message in messages)
+
+
+def _to_update(state: AgentState, content: Optional[str], raw: Optional[str], meter: TokenMeter) -> dict:
+    diagnosis = parse_diagnosis(content) if content else _fallback(state, raw)
+    return {
+        "diagnosis_report": diagnosis.report,
+        "recommended_action": diagnosis.action,
+        "priority_level": diagnosis.priority,
+        "failed_component": diagnosis.component,
+        "diagnosis_confidence": diagnosis.confidence,
+        **meter.update(),
+    }
+
+
+def diagnosis_node(state: AgentState) -> dict:
     """
     Worker 2: Uses LLM to explain the issue and recommend action.
     """
     print("🧠 [Diagnosis] LLM analyzing failure patterns...")
-    
+
     # 1. Check if there is anything to diagnose
-    if state.get("risk_score", 0) < 20:
-        state["diagnosis_report"] = "Vehicle is healthy. No issues detected."
-        state["recommended_action"] = "Monitor"
-        state["priority_level"] = "Low"
-        return state
+    if _is_healthy(state):
+        return healthy_report()
 
-    # 2. Initialize LLM
-    llm = _get_llm()
+    # 2. Prepare prompt for the AI
+    messages: List[BaseMessage] = [HumanMessage(content=_build_prompt(state))]
+    raw: Optional[str] = None
+    meter = TokenMeter("diagnosis")
 
-    # 3. Prepare prompt for the AI
-    issues = "\n".join(state["detected_issues"])
-    telematics = state["telematics_data"]
-    
-    prompt = f"""
-    You are a Senior Fleet Mechanic AI. 
-    Analyze this truck's status:
-    
-    Vehicle: {state['vehicle_metadata'].get('model')}
-    Issues Detected:
-    {issues}
-    
-    Telematics:
-    - Oil Pressure: {telematics.get('oil_pressure_psi')} psi
-    - Engine Temp: {telematics.get('engine_temp_c')} C
-    - Active Codes: {telematics.get('dtc_readable')}
-    
-    TASK:
-    1. Explain technically what is failing.
-    2. Recommend the specific repair needed.
-    3. Set priority (Low/Medium/High/Critical).
-    
-    Output format:
-    Report: [Your explanation]
-    Action: [Specific repair]
-    Priority: [Level]
+    # 3. Call the shared LLM client, repairing invalid JSON; only validated answers are
+    #    shared across the fleet (identical fault patterns get one answer)
+    def produce() -> Optional[str]:
+        nonlocal raw
+        pending, attempt = messages, 0
+        while pending is not None:
+            raw = meter.record(_prompt_text(pending), invoke_llm(pending, node="diagnosis")).content
+            content, pending = _validated(raw, pending, attempt)
+            attempt += 1
+        return content
+
+    content = cached_call("diagnosis", fault_key(state, OUTPUT_FORMAT), produce)
+
+    # 4. Map the structured fields into a state update
+    return _to_update(state, content, raw, meter)
+
+
+async def adiagnosis_node(state: AgentState) -> dict:
+    """
+    Async Worker 2: same as `diagnosis_node`, awaiting the LLM instead of blocking.
     """
+    print("🧠 [Diagnosis] LLM analyzing failure patterns...")
+
+    if _is_healthy(state):
+        return healthy_report()
+
+    messages: List[BaseMessage] = [HumanMessage(content=_build_prompt(state))]
+    raw: Optional[str] = None
+    meter = TokenMeter("diagnosis")
+
+    async def produce() -> Optional[str]:
+        nonlocal raw
+        pending, attempt = messages, 0
+        while pending is not None:
+            raw = meter.record(_prompt_text(pending), await ainvoke_llm(pending, node="diagnosis")).content
+            content, pending = _validated(raw, pending, attempt)
+            attempt += 1
+        return content
 
-    # 4. Call the LLM
-    response = llm.invoke([HumanMessage(content=prompt)])
-    content = response.content
-
-    # 5. Save to State
-    # (In a real app, we'd use Structured Output/JSON mode to parse this reliably)
-    state["diagnosis_report"] = content
-    
-    # Simple keyword extraction for the sake of the demo
-    if "Critical" in content:
-        state["priority_level"] = "Critical"
-    elif "High" in content:
-        state["priority_level"] = "High"
-    else:
-        state["priority_level"] = "Medium"
-
-    return state
\ No newline at end of file
+    content = await acached_call("diagnosis", fault_key(state, OUTPUT_FORMAT), produce)
+    return _to_update(state, content, raw, meter)
@@ -1,60 +1,60 @@
-import os
-
-from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 
+from app.agents.llm import ainvoke_llm, invoke_llm
+from app.agents.prompts import MANUFACTURING, TokenMeter
+from app.agents.response_cache import acached_call, cached_call, fault_key
 from app.agents.state import AgentState
-from app.config.settings import get_settings
-
-load_dotenv()
-
-
-def _get_llm():
-    settings = get_settings()
-    if settings.llm_provider == "google":
-        return ChatGoogleGenerativeAI(
-            model=settings.llm_model,
-            google_api_key=settings.google_api_key,
-            api_version=settings.llm_api_version,
-        )
-    else:
-        return ChatOpenAI(
-            model=settings.llm_model,
-            base_url="https://openrouter.ai/api/v1",
-            api_key=settings.openai_api_key,
-        )
-
-def manufacturing_node(state: AgentState) -> AgentState:
+
+# Part of the CAPA cache key; bump it whenever the MANUFACTURING prompt changes
+CAPA_PROMPT_VERSION = "capa-v2"
+
+
+def _needs_capa(state: AgentState) -> bool:
+    return state["risk_score"] >= 40
+
+
+def _build_prompt(state: AgentState) -> str:
+    # Long diagnosis reports are cut to the template's budget
+    return MANUFACTURING.render(
+        model=state["vehicle_metadata"].get("model"),
+        component=state.get("failed_component") or "Unknown",
+        failure=state["diagnosis_report"],
+        repair=state.get("recommended_action"),
+    )
+
+
+def manufacturing_node(state: AgentState) -> dict:
     print("🏭 [Manufacturing] Analyzing failure for fleet-wide patterns...")
     
     # Only run if there is a real issue
-    if state["risk_score"] < 40:
-        state["manufacturing_recommendations"] = "No design changes needed."
-        return state
+    if not _needs_capa(state):
+        return {"manufacturing_recommendations": "No design changes needed."}
 
-    llm = _get_llm()
-    diagnosis = state["diagnosis_report"]
-    model = state["vehicle_metadata"].get("model")
+    prompt = _build_prompt(state)
+    meter = TokenMeter("manufacturing")
+    content = cached_call(
+        "capa",
+        fault_key(state, CAPA_PROMPT_VERSION),
+        lambda: meter.record(prompt, invoke_llm([HumanMessage(content=prompt)], node="manufacturing")).content,
+    )
 
-    prompt = f"""
-    You are a Quality Engineering AI at the {model} factory.
-    A vehicle has failed in the field.
-    
-    Diagnosis: {diagnosis}
-    
-    TASK:
-    Suggest a 'Root Cause Design Improvement' to prevent this in future models.
-    Focus on material changes, sensor placement, or software logic.
-    
-    Output format:
-    Design Flaw: [What failed]
-    Engineering Fix: [Technical solution]
-    """
+    print("✅ [Manufacturing] CAPA Report Generated.")
+    return {"manufacturing_recommendations": content, **meter.update()}
+
+
+async def amanufacturing_node(state: AgentState) -> dict:
+    print("🏭 [Manufacturing] Analyzing failure for fleet-wide patterns...")
+
+    if not _needs_capa(state):
+        return {"manufacturing_recommendations": "No design changes needed."}
+
+    prompt = _build_prompt(state)
+    meter = TokenMeter("manufacturing")
+
+    async def produce() -> str:
+        return meter.record(prompt, await ainvoke_llm([HumanMessage(content=prompt)], node="manufacturing")).content
+
+    content = await acached_call("capa", fault_key(state, CAPA_PROMPT_VERSION), produce)
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    state["manufacturing_recommendations"] = response.content
-    
     print("✅ [Manufacturing] CAPA Report Generated.")
-    return state
\ No newline at end of file
+    return {"manufacturing_recommendations": content, **meter.update()}
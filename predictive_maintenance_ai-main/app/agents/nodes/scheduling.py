@@ -1,6 +1,9 @@
+import asyncio
+
+from app.agents.checkpoints import get_flow_ledger
 from app.agents.state import AgentState
 from app.data.repositories import NotificationRepo, SchedulerRepo
-from app.ueba.middleware import secure_call
+from app.ueba.middleware import asecure_call, secure_call
 
 
 def _choose_slot(slot_payload):
@@ -10,53 +13,122 @@ def _choose_slot(slot_payload):
     return None
 
 
-def scheduling_node(state: AgentState) -> AgentState:
-    print("🗓️ [Scheduler] Finding repair slot...")
+def _booking_args(state: AgentState, selected_slot) -> tuple:
+    return (
+        state["vehicle_id"],
+        selected_slot.get("slot_id"),
+        selected_slot.get("center_id"),
+        state["vehicle_metadata"].get("owner", "Customer"),
+    )
+
+
+def _booking_update(booking, selected_slot) -> dict:
+    update = {
+        "booking_id": booking.get("booking", {}).get("booking_id") or booking.get("booking_id"),
+        "selected_slot": selected_slot.get("time") or selected_slot,
+    }
+    print(f"✅ [Scheduler] CONFIRMED! ID: {update['booking_id']}")
+    return update
+
+
+def _recorded_booking(state: AgentState):
+    """(booking, slot) from an earlier attempt of this flow, so a resumed flow never books twice."""
+    ledger = get_flow_ledger()
+    recorded = ledger.get(state["flow_id"]) if ledger and state.get("flow_id") else None
+    if recorded is None:
+        return None
+    print(f"♻️ [Scheduler] Reusing booking from an earlier attempt of flow {state['flow_id']}")
+    return recorded["booking"], recorded["slot"]
+
+
+def _record_booking(state: AgentState, booking, selected_slot) -> None:
+    ledger = get_flow_ledger()
+    if ledger and state.get("flow_id"):
+        ledger.record(state["flow_id"], state["vehicle_id"], {"booking": booking, "slot": selected_slot})
+
 
+def _confirmation_args(state: AgentState, update: dict) -> tuple:
+    return (
+        state["vehicle_id"],
+        f"Your service is booked for {update['selected_slot']}",
+        "app",
+        {"booking_id": update.get("booking_id")},
+    )
+
+
+def _should_book(state: AgentState) -> bool:
     if state.get("customer_decision") != "BOOKED":
         print("⏸️ Booking skipped by customer.")
-        return state
+        return False
+    return True
+
+
+def _failure(update: dict, exc: Exception) -> dict:
+    if isinstance(exc, PermissionError):
+        print(f"⛔ [UEBA] BLOCKED: {exc}")
+    else:
+        print(f"⚠️ [Scheduler] Failed: {exc}")
+    return {**update, "error_message": str(exc)}
+
+
+def scheduling_node(state: AgentState) -> dict:
+    print("🗓️ [Scheduler] Finding repair slot...")
+
+    if not _should_book(state):
+        return {}
 
     agent_name = "Scheduling"
-    v_id = state["vehicle_id"]
+    update = {}
 
     try:
-        slots = secure_call(agent_name, "SchedulerRepo", SchedulerRepo.get_available_slots)
-        selected_slot = _choose_slot(slots)
-        if not selected_slot:
-            state["error_message"] = "No available slots"
-            return state
-
-        booking = secure_call(
-            agent_name,
-            "SchedulerRepo",
-            SchedulerRepo.book_appointment,
-            v_id,
-            selected_slot.get("slot_id"),
-            selected_slot.get("center_id"),
-            state["vehicle_metadata"].get("owner", "Customer"),
-        )
-
-        state["booking_id"] = booking.get("booking", {}).get("booking_id") or booking.get("booking_id")
-        state["selected_slot"] = selected_slot.get("time") or selected_slot
-        print(f"✅ [Scheduler] CONFIRMED! ID: {state['booking_id']}")
+        recorded = _recorded_booking(state)
+        if recorded:
+            booking, selected_slot = recorded
+        else:
+            slots = secure_call(agent_name, "SchedulerRepo", SchedulerRepo.get_available_slots)
+            selected_slot = _choose_slot(slots)
+            if not selected_slot:
+                return {"error_message": "No available slots"}
+
+            booking = secure_call(agent_name, "SchedulerRepo", SchedulerRepo.book_appointment, *_booking_args(state, selected_slot))
+            _record_booking(state, booking, selected_slot)
+        update = _booking_update(booking, selected_slot)
 
         # Notify customer about booking
-        secure_call(
-            agent_name,
-            "NotificationRepo",
-            NotificationRepo.push_notification,
-            v_id,
-            f"Your service is booked for {state['selected_slot']}",
-            "app",
-            {"booking_id": state.get("booking_id")},
-        )
-
-    except PermissionError as e:
-        state["error_message"] = str(e)
-        print(f"⛔ [UEBA] BLOCKED: {e}")
+        secure_call(agent_name, "NotificationRepo", NotificationRepo.push_notification, *_confirmation_args(state, update))
+
     except Exception as exc:  # noqa: BLE001
-        state["error_message"] = str(exc)
-        print(f"⚠️ [Scheduler] Failed: {exc}")
+        return _failure(update, exc)
+
+    return update
+
+
+async def ascheduling_node(state: AgentState) -> dict:
+    print("🗓️ [Scheduler] Finding repair slot...")
+
+    if not _should_book(state):
+        return {}
+
+    agent_name = "Scheduling"
+    update = {}
+
+    try:
+        # The ledger is SQLite; keep its reads and writes off the event loop
+        recorded = await asyncio.to_thread(_recorded_booking, state)
+        if recorded:
+            booking, selected_slot = recorded
+        else:
+            slots = await asecure_call(agent_name, "SchedulerRepo", SchedulerRepo.aget_available_slots)
+            selected_slot = _choose_slot(slots)
+            if not selected_slot:
+                return {"error_message": "No available slots"}
+
+            booking = await asecure_call(agent_name, "SchedulerRepo", SchedulerRepo.abook_appointment, *_booking_args(state, selected_slot))
+            await asyncio.to_thread(_record_booking, state, booking, selected_slot)
+        update = _booking_update(booking, selected_slot)
+        await asecure_call(agent_name, "NotificationRepo", NotificationRepo.apush_notification, *_confirmation_args(state, update))
+
+    except Exception as exc:  # noqa: BLE001
+        return _failure(update, exc)
 
-    return state
\ No newline at end of file
+    return update
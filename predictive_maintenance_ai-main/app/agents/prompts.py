@@ -0,0 +1,207 @@
+"""Prompt templates, token budgets and token accounting for the agent nodes.
+
+Templates are dedented once at import, and rendered prompts have their whitespace
+normalised, so indentation never reaches the model. Each field can have its own token
+cap, and each node has an overall budget (PROMPT_TOKEN_BUDGETS overrides the defaults).
+Long inputs are summarised extractively: whole sentences or list items are kept from the
+start until the cap, and the rest is dropped with a marker. Token counts are estimated
+locally (about 4 characters per token), since real tokenizers differ per provider. The
+provider's own counts, when it reports them, are used for the per-call usage in state.
+"""
+
+import math
+import re
+import textwrap
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import get_settings
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = " [...]"
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SPACES = re.compile(r"[ \t]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def normalize(text: str) -> str:
+    """Strips indentation and trailing spaces, collapses runs of blank lines."""
+    lines = [line.rstrip() for line in textwrap.dedent(text).splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def summarize(value: Any, max_tokens: int) -> str:
+    """
+    Fits `value` into `max_tokens`. Lists keep whole items, text keeps whole sentences,
+    and a single over-long item is cut at a word boundary.
+    """
+    if isinstance(value, (list, tuple)):
+        parts, separator = [_SPACES.sub(" ", str(item)).strip() for item in value], "\n"
+    else:
+        parts, separator = _SENTENCE.split(" ".join(str(value or "").split())), " "
+    text = separator.join(parts)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = max(max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARK), 0)
+    kept: List[str] = []
+    used = 0
+    for part in parts:
+        cost = len(part) + (len(separator) if kept else 0)
+        if used + cost > limit:
+            break
+        kept.append(part)
+        used += cost
+    if not kept:
+        cut = parts[0][:limit]
+        kept = [cut.rsplit(" ", 1)[0] if " " in cut else cut]
+    return separator.join(kept) + TRUNCATION_MARK
+
+
+class PromptTemplate:
+    """A node's prompt: `str.format` fields, optional per-field token caps and a total budget."""
+
+    def __init__(self, node: str, text: str, budget: int, limits: Optional[Dict[str, int]] = None):
+        self.node = node
+        self.text = normalize(text)
+        self.budget = budget
+        self.limits = limits or {}
+
+    def render(self, **values: Any) -> str:
+        budget = _budget_overrides().get(self.node, self.budget)
+        limits = dict(self.limits)
+        while True:
+            fields = {
+                name: summarize(value, limits[name]) if name in limits else value
+                for name, value in values.items()
+            }
+            prompt = normalize(self.text.format(**fields))
+            over = estimate_tokens(prompt) - budget
+            shrinkable = {name: limit for name, limit in limits.items() if limit > 16 and name in values}
+            if over <= 0 or not shrinkable:
+                if over > 0:
+                    print(f"⚠️ [Prompts] {self.node} prompt is {over} tokens over its budget of {budget}")
+                return prompt
+            # Take the excess from the capped fields, largest first
+            name = max(shrinkable, key=shrinkable.get)
+            limits[name] = max(16, min(limits[name], estimate_tokens(fields[name])) - over)
+
+
+_overrides: Optional[Dict[str, int]] = None
+
+
+def _budget_overrides() -> Dict[str, int]:
+    """PROMPT_TOKEN_BUDGETS, e.g. "diagnosis=500,manufacturing=200"."""
+    global _overrides
+    if _overrides is None:
+        overrides = {}
+        for item in get_settings().prompt_token_budgets.split(","):
+            if "=" in item:
+                node, budget = item.split("=", 1)
+                overrides[node.strip()] = int(budget)
+        _overrides = overrides
+    return _overrides
+
+
+DIAGNOSIS = PromptTemplate(
+    "diagnosis",
+    """
+    You are a Senior Fleet Mechanic AI.
+    Analyze this truck's status:
+
+    Vehicle: {model}
+    Issues Detected:
+    {issues}
+
+    Telematics:
+    - Oil Pressure: {oil_pressure} psi
+    - Engine Temp: {engine_temp} C
+    - Active Codes: {codes}
+
+    TASK:
+    1. Explain technically what is failing.
+    2. Recommend the specific repair needed.
+    3. Set priority (Low/Medium/High/Critical).
+
+    {schema}
+    """,
+    budget=400,
+    limits={"issues": 120, "codes": 60},
+)
+
+CUSTOMER_ENGAGEMENT = PromptTemplate(
+    "customer_engagement",
+    """
+    You are a Service Advisor at a Truck Dealership.
+    Write a short, professional text message to {owner}.
+
+    Topic: {topic}
+    Faulty Part: {component}
+    Recommended Repair: {action}
+    Priority: {priority}
+
+    {ask}
+    """,
+    budget=160,
+    limits={"component": 16, "action": 40},
+)
+
+FEEDBACK = PromptTemplate(
+    "feedback",
+    """
+    You are a Customer Experience AI.
+    The customer {owner} just had their truck serviced after our urgent alert ({repair}).
+
+    Write a short, warm 'Post-Service Follow-up' script (Voice Style).
+    Ask if the vehicle is running smoothly and request a satisfaction rating (1-5).
+    """,
+    budget=120,
+    limits={"repair": 30},
+)
+
+MANUFACTURING = PromptTemplate(
+    "manufacturing",
+    """
+    You are a Quality Engineering AI at the {model} factory.
+    A vehicle has failed in the field.
+
+    Failed Component: {component}
+    Failure: {failure}
+    Field Repair: {repair}
+
+    TASK:
+    Suggest a 'Root Cause Design Improvement' to prevent this in future models.
+    Focus on material changes, sensor placement, or software logic.
+
+    Output format:
+    Design Flaw: [What failed]
+    Engineering Fix: [Technical solution]
+    """,
+    budget=220,
+    limits={"failure": 80, "repair": 30},
+)
+
+
+# --- Token accounting ---
+
+class TokenMeter:
+    """Counts one node's LLM calls; `update()` is merged into the node's state update."""
+
+    def __init__(self, node: str):
+        self.node = node
+        self.counts = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def record(self, prompt: str, response: Any) -> Any:
+        usage = getattr(response, "usage_metadata", None) or {}
+        self.counts["calls"] += 1
+        self.counts["prompt_tokens"] += usage.get("input_tokens") or estimate_tokens(prompt)
+        self.counts["completion_tokens"] += usage.get("output_tokens") or estimate_tokens(response.content)
+        return response
+
+    def update(self) -> Dict[str, Any]:
+        # Cache hits make no calls and report nothing
+        return {"token_usage": {self.node: dict(self.counts)}} if self.counts["calls"] else {}
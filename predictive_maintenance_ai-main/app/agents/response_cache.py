@@ -0,0 +1,201 @@
+"""Prompt-keyed cache for deterministic LLM calls (diagnosis, CAPA).
+
+Keys are normalised on the inputs that actually drive the answer (vehicle model,
+risk level, the kinds of detected issues and the sorted DTC list), so identical
+fault patterns across a fleet share one LLM answer. Lookups go to a bounded
+in-memory LRU first, then to an optional SQLite tier that survives restarts.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol
+
+from app.config.settings import get_settings
+from app.data.cache import TTLCache
+
+
+class ResponseCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+
+class SQLiteTier:
+    """On-disk TTL tier shared by every namespace; safe to use from many threads."""
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, namespace: str, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, time.time() + self.ttl),
+            )
+            self._writes += 1
+            # Purge expired rows every so often instead of on every write
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+
+class ResponseCache:
+    """Memory LRU in front of an optional SQLite tier, for one namespace (e.g. "diagnosis")."""
+
+    def __init__(self, namespace: str, memory: TTLCache, disk: Optional[SQLiteTier] = None):
+        self.namespace = namespace
+        self.memory = memory
+        self.disk = disk
+        self.disk_hits = 0
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(self.namespace, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(self.namespace, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.memory.stats(), "disk_enabled": self.disk is not None, "disk_hits": self.disk_hits}
+
+
+_lock = threading.Lock()
+_caches: Dict[str, ResponseCacheBackend] = {}
+_disk: Optional[SQLiteTier] = None
+
+
+def _disk_tier() -> Optional[SQLiteTier]:
+    global _disk
+    settings = get_settings()
+    if not settings.llm_cache_sqlite_path:
+        return None
+    if _disk is None:
+        _disk = SQLiteTier(settings.llm_cache_sqlite_path, settings.llm_cache_ttl_sec)
+    return _disk
+
+
+def get_response_cache(namespace: str) -> ResponseCacheBackend:
+    with _lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            settings = get_settings()
+            memory = TTLCache(settings.llm_cache_max_entries, settings.llm_cache_ttl_sec)
+            cache = ResponseCache(namespace, memory, _disk_tier())
+            _caches[namespace] = cache
+        return cache
+
+
+def register_response_cache(namespace: str, cache: ResponseCacheBackend) -> None:
+    """Plugs in a custom backend (anything with get/set/stats) for a namespace."""
+    with _lock:
+        _caches[namespace] = cache
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+# --- Key normalisation ---
+
+_READING = re.compile(r"\s*\(.*?\)")
+
+
+def _risk_bucket(state: Dict[str, Any]) -> List[str]:
+    # "Critical Overheating (118°C)" -> "Critical Overheating": the tier matters, the exact reading doesn't
+    return sorted(_READING.sub("", reason) for reason in state.get("detected_issues") or [])
+
+
+def _dtc_list(telematics: Dict[str, Any]) -> List[str]:
+    codes = telematics.get("active_dtc_codes") or telematics.get("dtc_readable") or []
+    if isinstance(codes, str):
+        codes = [codes]
+    return sorted({str(code).strip().upper() for code in codes})
+
+
+def fault_key(state: Dict[str, Any], *extra: Any) -> str:
+    """Fleet-wide key for a fault pattern: model, risk level, issue tiers and sorted DTCs."""
+    telematics = state.get("telematics_data") or {}
+    payload = [
+        (state.get("vehicle_metadata") or {}).get("model"),
+        state.get("risk_level"),
+        _risk_bucket(state),
+        _dtc_list(telematics),
+        *extra,
+    ]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# --- Cached LLM calls ---
+
+def cached_call(namespace: str, key: str, produce: Callable[[], Optional[str]]) -> Optional[str]:
+    """
+    Returns the cached answer for `key`, or caches what `produce()` returns (e.g. a validated
+    completion). `produce` returns None for answers that must not be shared; those aren't cached.
+    """
+    if not get_settings().llm_cache_enabled:
+        return produce()
+    cache = get_response_cache(namespace)
+    content = cache.get(key)
+    if content is None:
+        content = produce()
+        if content is not None:
+            cache.set(key, content)
+    return content
+
+
+def _in_memory(cache: ResponseCacheBackend) -> bool:
+    return isinstance(cache, ResponseCache) and cache.disk is None
+
+
+async def acached_call(namespace: str, key: str, produce: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+    if not get_settings().llm_cache_enabled:
+        return await produce()
+    cache = get_response_cache(namespace)
+    # The SQLite tier (or a custom backend) may block; only the memory-only cache stays on the loop
+    in_memory = _in_memory(cache)
+    content = cache.get(key) if in_memory else await asyncio.to_thread(cache.get, key)
+    if content is None:
+        content = await produce()
+        if content is not None:
+            if in_memory:
+                cache.set(key, content)
+            else:
+                await asyncio.to_thread(cache.set, key, content)
+    return content
+
@@ -1,48 +1,73 @@
-from typing import TypedDict, List, Optional, Dict, Any
+import operator
+from typing import Annotated, TypedDict, List, Optional, Dict, Any
+
+
+# --- State-merge contract ---
+# Nodes return partial updates (only the keys they own), never the whole state.
+# After diagnosis the graph fans out into two concurrent branches:
+#   customer_engagement -> scheduling -> feedback   and   manufacturing
+# Keys owned by exactly one node need no reducer. Keys that more than one branch
+# may write in the same step MUST declare a reducer below, otherwise LangGraph
+# rejects the concurrent update.
+
+def merge_errors(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """Keeps every distinct error reported by parallel branches."""
+    if not left:
+        return right
+    if not right or right == left:
+        return left
+    return f"{left}; {right}"
+
+
+def merge_token_usage(
+    left: Optional[Dict[str, Dict[str, int]]], right: Optional[Dict[str, Dict[str, int]]]
+) -> Dict[str, Dict[str, int]]:
+    """Sums the per-node LLM call and token counters reported by parallel branches."""
+    merged = {node: dict(counts) for node, counts in (left or {}).items()}
+    for node, counts in (right or {}).items():
+        entry = merged.setdefault(node, {})
+        for field, value in counts.items():
+            entry[field] = entry.get(field, 0) + value
+    return merged
+
 
 class AgentState(TypedDict):
     # Inputs
     vehicle_id: str
-    vehicle_id: str
-    vehicle_metadata: Optional[Dict[str, Any]]
-    telematics_data: Optional[Dict[str, Any]]
-    risk_score: int
-    risk_level: str
-    detected_issues: List[str]
-    diagnosis_report: str
-    recommended_action: str
-    priority_level: str
-    customer_script: str
-    customer_decision: str
-    booking_id: Optional[str]
-    error_message: Optional[str]
-    ueba_alert_triggered: bool
-    
+    flow_id: str  # checkpoint thread; resume with POST /orchestration/flows/{flow_id}/resume
+
     # Data Layer (Populated by DataAnalysisAgent)
     vehicle_metadata: Optional[Dict[str, Any]]
     telematics_data: Optional[Dict[str, Any]]
-    
+    maintenance_history: Optional[Any]
+
     # Analysis Layer (Populated by DataAnalysisAgent)
     risk_score: int
     risk_level: str # LOW, MEDIUM, HIGH, CRITICAL
     detected_issues: List[str]
-    
-    # Diagnosis Layer (Populated by DiagnosisAgent)
+
+    # Diagnosis Layer (Populated by DiagnosisAgent, validated against app/domain/diagnosis.py)
     diagnosis_report: str
     recommended_action: str
     priority_level: str
-    
+    failed_component: str
+    diagnosis_confidence: float
+
     # Customer Layer (Populated by CustomerAgent)
     customer_script: str
     customer_decision: str # "BOOKED", "DEFERRED", "REJECTED"
-    
+
     # Scheduling Layer (Populated by SchedulingAgent)
     selected_slot: str
     booking_id: Optional[str]
-    
-    # System Flags
-    error_message: Optional[str]
-    ueba_alert_triggered: bool
 
+    # Feedback / Manufacturing Layers (parallel branches)
+    feedback_request: str
     manufacturing_recommendations: str
-    feedback_request: str
\ No newline at end of file
+
+    # System Flags (may be written by either parallel branch)
+    error_message: Annotated[Optional[str], merge_errors]
+    ueba_alert_triggered: Annotated[bool, operator.or_]
+
+    # Per-node {"calls", "prompt_tokens", "completion_tokens"} (see app/agents/prompts.py)
+    token_usage: Annotated[Dict[str, Dict[str, int]], merge_token_usage]
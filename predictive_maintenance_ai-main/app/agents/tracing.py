@@ -0,0 +1,53 @@
+"""Per-flow and per-node tracing for the agent graph.
+
+A flow trace lives in a context variable, so everything a node calls (LLM, backend
+HTTP, UEBA checks) attributes its time to the node that is running. LangGraph copies
+the context into the tasks and threads that run parallel branches. The trace, the
+histograms and the recorders themselves are in app/observability/metrics.py.
+"""
+
+import contextlib
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from app.observability.metrics import FLOW_SECONDS, NODE_SECONDS, FlowTrace, flow_trace, running_node
+
+
+def finish_flow(trace: FlowTrace, state: Optional[Dict[str, Any]] = None) -> None:
+    """Stops the flow clock and records it; flows that end without a state count as errors."""
+    if trace.finished is not None:
+        return
+    trace.finished = time.perf_counter()
+    outcome = "error" if state is None or state.get("error_message") else "success"
+    FLOW_SECONDS.observe(trace.finished - trace.started, outcome)
+
+
+@contextlib.contextmanager
+def flow_span(vehicle_id: str, flow_id: Optional[str] = None) -> Iterator[FlowTrace]:
+    """Traces one flow run in the current context; call `finish_flow` with the final state."""
+    trace = FlowTrace(vehicle_id, flow_id)
+    token = flow_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        finish_flow(trace)
+        try:
+            flow_trace.reset(token)
+        except ValueError:
+            # An async generator closed from another context; the variable dies with that context
+            pass
+
+
+@contextlib.contextmanager
+def node_span(node: str) -> Iterator[None]:
+    token = running_node.set(node)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        running_node.reset(token)
+        NODE_SECONDS.observe(elapsed, node)
+        trace = flow_trace.get()
+        if trace is not None:
+            trace.add(node, "wall_ms", elapsed * 1000)
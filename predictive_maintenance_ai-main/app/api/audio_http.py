@@ -0,0 +1,124 @@
+"""
+HTTP helpers for serving audio: conditional requests (ETag / Last-Modified -> 304),
+single byte ranges (206 / 416) and cache headers
+"""
+
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Content-addressed clips never change, so clients may keep them for a year without revalidating
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _base_headers(etag: str, last_modified: Optional[float], immutable: bool) -> Dict[str, str]:
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        "Access-Control-Allow-Origin": "*",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float], immutable: bool) -> bool:
+    """True if the client's cached copy is current (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    if immutable:
+        return True
+    if last_modified is None:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified_response(etag: str, last_modified: Optional[float], immutable: bool) -> Response:
+    headers = _base_headers(etag, last_modified, immutable)
+    headers.pop("Accept-Ranges")
+    return Response(status_code=304, headers=headers)
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single `bytes=` range into inclusive (start, end).
+    Returns None for multi-range or malformed headers (served as a full 200), raises ValueError if unsatisfiable
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def audio_response(
+    request: Request,
+    audio: bytes,
+    etag: str,
+    last_modified: Optional[float] = None,
+    immutable: bool = False,
+    media_type: str = "audio/mpeg",
+) -> Response:
+    """
+    Serve in-memory audio with conditional and Range support
+
+    Args:
+        request: Incoming request (for If-None-Match / If-Modified-Since / Range / If-Range)
+        audio: Full audio bytes
+        etag: Quoted entity tag, e.g. '"<content hash>"'
+        last_modified: Unix timestamp for Last-Modified, if known
+        immutable: Content never changes for this URL (content-addressed)
+    """
+    if is_not_modified(request, etag, last_modified, immutable):
+        return not_modified_response(etag, last_modified, immutable)
+
+    headers = _base_headers(etag, last_modified, immutable)
+    size = len(audio)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send the whole file
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _byte_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(audio[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    return Response(audio, media_type=media_type, headers=headers)
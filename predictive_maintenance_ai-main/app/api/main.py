@@ -1,16 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from pathlib import Path
+import asyncio
+import json
 import os
 
-from app.agents.master import run_predictive_flow
-from app.api.voice_tts import VoiceTTSService
+from app.agents.batch import batch_manager
+from app.agents.checkpoints import describe, get_checkpointer, new_flow_id
+from app.agents.flow_queue import get_flow_queue
+from app.agents.llm import llm_stats
+from app.agents.master import agent_app, resume_predictive_flow_async, run_predictive_flow_async, stream_predictive_flow
+from app.agents.response_cache import response_cache_stats
+from app.observability.metrics import render_metrics
+from app.data.repositories import aclose_async_client, repo_cache_stats
+from app.api.audio_http import audio_response, is_not_modified, not_modified_response
+from app.api.tts_jobs import QueueFullError, TTSJobQueue
+from app.api.voice_stream import stream_flow_audio
+from app.api.voice_tts import VoiceTTSService, cache_key_from_filename, media_type_for
+from app.ueba.policies import behaviour_stats
+from app.ueba.storage import audit_pipeline, audit_stats
+from app.config.settings import get_settings
 
 
 class RunFlowRequest(BaseModel):
     vehicle_id: str
     customer_name: str | None = None
+    include_timings: bool = False  # add a per-node time breakdown as data["timings"]
+
+
+class ResumeFlowRequest(BaseModel):
+    include_timings: bool = False
+
+
+class EnqueueFlowRequest(BaseModel):
+    vehicle_ids: list[str]
+    include_state: bool = False
+    max_attempts: int | None = None  # default FLOW_MAX_ATTEMPTS
+
+
+class BatchFlowRequest(BaseModel):
+    vehicle_ids: list[str] | None = None
+    fleet_id: str | None = None
+    include_state: bool = False
+    min_risk_level: str | None = None
 
 
 class TTSRequest(BaseModel):
@@ -18,10 +52,15 @@ class TTSRequest(BaseModel):
     language: str = "en"
     slow: bool = False
     filename: str | None = None
+    stream: bool = False  # return the audio itself, synthesized in memory without touching disk
+    priority: str = "live"  # "live" runs before "batch" (notifications, pre-rendering)
+    wait: bool = True  # False: return a job to poll at /voice/jobs/{job_id} right away
 
 
 # Initialize TTS service
 tts_service = VoiceTTSService()
+tts_service.start_background_cleanup()
+tts_jobs = TTSJobQueue(tts_service)
 
 
 app = FastAPI(title="Predictive Maintenance AI Agents", version="1.0.0")
@@ -59,61 +98,314 @@ def status():
     return {"status": "ready", "service": "ai-agents"}
 
 
+@app.get("/llm/stats")
+def get_llm_stats():
+    return {"success": True, **llm_stats()}
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        "success": True,
+        "llm_responses": response_cache_stats(),
+        "repositories": repo_cache_stats(),
+        "tts_audio": tts_service.cache.stats(),
+    }
+
+
+@app.get("/ueba/stats")
+def get_ueba_stats():
+    return {"success": True, "audit": audit_stats(), "agents": behaviour_stats()}
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format: flow, node, LLM, backend and UEBA latency histograms"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def _flow_failed(flow_id: str, exc: Exception) -> HTTPException:
+    detail = {"error": str(exc), "flow_id": flow_id}
+    if get_checkpointer() is not None:
+        # Checkpointed up to the failing node, so the client can resume instead of starting over
+        detail["resume_url"] = f"/orchestration/flows/{flow_id}/resume"
+    return HTTPException(status_code=500, detail=detail)
+
+
 @app.post("/orchestration/run_flow")
-def run_flow(req: RunFlowRequest):
+async def run_flow(req: RunFlowRequest):
+    flow_id = new_flow_id()
     try:
-        state = run_predictive_flow(req.vehicle_id)
+        state = await run_predictive_flow_async(req.vehicle_id, include_timings=req.include_timings, flow_id=flow_id)
     except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+        raise _flow_failed(flow_id, exc) from exc
 
     success = not state.get("error_message")
     return {
         "success": success,
         "vehicle_id": req.vehicle_id,
         "customer_name": req.customer_name,
+        "flow_id": flow_id,
+        "data": state,
+    }
+
+
+@app.get("/orchestration/flows/{flow_id}")
+async def get_flow(flow_id: str):
+    """Checkpoint progress of a flow that failed (completed flows are not kept by default)"""
+    try:
+        progress = await asyncio.to_thread(describe, agent_app, flow_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Flow not found") from exc
+    return {"success": True, **progress}
+
+
+@app.post("/orchestration/flows/{flow_id}/resume")
+async def resume_flow(flow_id: str, req: ResumeFlowRequest | None = None):
+    """Re-runs a failed flow from its last completed node; bookings already made are reused"""
+    include_timings = req.include_timings if req else False
+    try:
+        state = await resume_predictive_flow_async(flow_id, include_timings=include_timings)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Flow not found") from exc
+    except Exception as exc:  # noqa: BLE001
+        raise _flow_failed(flow_id, exc) from exc
+
+    return {
+        "success": not state.get("error_message"),
+        "vehicle_id": state.get("vehicle_id"),
+        "flow_id": flow_id,
         "data": state,
     }
 
 
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@app.get("/orchestration/run_flow/{vehicle_id}/stream")
+async def stream_flow(vehicle_id: str):
+    """Server-Sent Events: one `update` per node, `token` events while LLM nodes generate, then `done`"""
+
+    async def _events():
+        try:
+            async for event in stream_predictive_flow(vehicle_id):
+                yield _sse(event)
+        except Exception as exc:  # noqa: BLE001
+            yield _sse({"type": "error", "detail": str(exc)})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/orchestration")
+async def flow_socket(websocket: WebSocket):
+    """Send {"vehicle_id": "..."} to start a flow; events are pushed as JSON messages, same shape as the SSE stream"""
+    await websocket.accept()
+    try:
+        while True:
+            request = await websocket.receive_json()
+            vehicle_id = request.get("vehicle_id")
+            if not vehicle_id:
+                await websocket.send_json({"type": "error", "detail": "vehicle_id is required"})
+                continue
+            try:
+                async for event in stream_predictive_flow(vehicle_id):
+                    await websocket.send_text(json.dumps(event, default=str))
+            except WebSocketDisconnect:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/orchestration/jobs", status_code=202)
+def enqueue_flows(req: EnqueueFlowRequest):
+    """Queues flows for the worker processes (python -m app.agents.flow_worker); one active job per vehicle"""
+    vehicle_ids = list(dict.fromkeys(req.vehicle_ids))
+    if not vehicle_ids:
+        raise HTTPException(status_code=400, detail="vehicle_ids is required")
+    if req.max_attempts is not None and req.max_attempts < 1:
+        raise HTTPException(status_code=400, detail="max_attempts must be at least 1")
+
+    queue = get_flow_queue()
+    jobs = []
+    for vehicle_id in vehicle_ids:
+        job, deduplicated = queue.enqueue(vehicle_id, req.include_state, req.max_attempts)
+        jobs.append({**job.summary(), "deduplicated": deduplicated, "poll_url": f"/orchestration/jobs/{job.job_id}"})
+    return {"success": True, "jobs": jobs}
+
+
+@app.get("/orchestration/jobs")
+def list_flow_jobs(vehicle_id: str | None = None, limit: int = 50):
+    queue = get_flow_queue()
+    return {
+        "success": True,
+        "queue": queue.stats(),
+        "jobs": [job.summary() for job in queue.recent(vehicle_id, min(max(limit, 1), 500))],
+    }
+
+
+@app.get("/orchestration/jobs/{job_id}")
+def get_flow_job(job_id: str):
+    job = get_flow_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, **job.summary()}
+
+
+@app.post("/orchestration/batch")
+def run_batch(req: BatchFlowRequest):
+    try:
+        job = batch_manager.submit(req.vehicle_ids, req.fleet_id, req.include_state, req.min_risk_level)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=502, detail=f"Failed to resolve fleet: {exc}") from exc
+
+    return {"success": True, **job.summary()}
+
+
+@app.get("/orchestration/batch/{job_id}")
+def get_batch(job_id: str, include_results: bool = False):
+    job = batch_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    response = {"success": True, **job.summary()}
+    if include_results:
+        response["results"] = list(job.results)
+    return response
+
+
+@app.get("/orchestration/batch/{job_id}/stream")
+def stream_batch(job_id: str):
+    """Stream per-vehicle results as NDJSON in completion order, then a final summary line"""
+    job = batch_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    def _lines():
+        for result in job.iter_results():
+            yield json.dumps({"type": "result", **result}, default=str) + "\n"
+        yield json.dumps({"type": "summary", **job.summary()}) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    batch_manager.shutdown()
+    audit_pipeline.close()
+    tts_service.stop_background_cleanup()
+    tts_jobs.close()
+    await aclose_async_client()
+
+
 # TTS Voice Endpoints
 @app.post("/voice/tts")
-def text_to_speech(request: TTSRequest):
-    """Convert text to speech and return audio file path"""
+async def text_to_speech(request: TTSRequest, http_request: Request):
+    """
+    Convert text to speech on the TTS workers and return the audio file path (or the audio itself
+    when `stream` is set). Returns 202 with a job to poll if it isn't done within TTS_JOB_WAIT_SEC
+    or `wait` is false.
+    """
     try:
-        result = tts_service.text_to_speech(
+        job = tts_jobs.submit(
             text=request.text,
             language=request.language,
             slow=request.slow,
-            filename=request.filename
+            filename=request.filename,
+            stream=request.stream,
+            priority=request.priority
         )
-        
-        if not result.get("success"):
-            raise HTTPException(status_code=500, detail=result.get("error", "TTS generation failed"))
-        
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    # Streamed audio isn't kept for polling, so those requests always wait
+    if request.wait or request.stream:
+        try:
+            await job.wait(get_settings().tts_job_wait_sec)
+        except asyncio.TimeoutError:
+            if request.stream:
+                raise HTTPException(status_code=504, detail="TTS generation timed out")
+
+    if not job.done:
+        return JSONResponse(
+            status_code=202,
+            content={"success": True, **job.summary(), "poll_url": f"/voice/jobs/{job.job_id}"}
+        )
+    if job.status == "FAILED":
+        raise HTTPException(status_code=500, detail=job.error or "TTS generation failed")
+
+    if request.stream:
+        # Same ETag as /voice/audio/tts_<key>.<ext>, where the clip stays available while it is in memory
+        return audio_response(
+            http_request, job.audio, f'"{job.result["cache_key"]}"',
+            immutable=True, media_type=job.result["media_type"]
+        )
+    return job.result
+
+
+@app.get("/voice/jobs/{job_id}")
+def get_tts_job(job_id: str):
+    """Status of a queued TTS job; the result holds the audio filename once it is COMPLETED"""
+    job = tts_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="TTS job not found")
+    return {"success": True, **job.summary()}
+
+
+@app.get("/voice/flow/{vehicle_id}/stream")
+async def stream_flow_voice(vehicle_id: str, language: str = "en", slow: bool = False):
+    """Run the agent flow and stream the customer message as audio while it is being written"""
+    return StreamingResponse(
+        stream_flow_audio(vehicle_id, tts_jobs, language=language, slow=slow),
+        media_type=tts_service.media_type(language),
+        headers={
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*"
+        }
+    )
 
 
 @app.get("/voice/audio/{filename}")
-def get_audio_file(filename: str):
-    """Serve generated audio file"""
+def get_audio_file(filename: str, request: Request):
+    """Serve generated audio with Range, ETag and 304 support; content-addressed clips are immutable"""
+    if Path(filename).name != filename:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
     try:
+        key = cache_key_from_filename(filename)
+        if key is not None:
+            # The name is the content hash: a matching ETag needs no lookup at all
+            etag = f'"{key}"'
+            if is_not_modified(request, etag, None, immutable=True):
+                return not_modified_response(etag, None, immutable=True)
+            audio = tts_service.audio_bytes(key)
+            if audio is None:
+                raise HTTPException(status_code=404, detail="Audio file not found")
+            return audio_response(
+                request, audio, etag, tts_service.cache.created(key),
+                immutable=True, media_type=media_type_for(filename)
+            )
+
+        # Custom-named files can be overwritten, so clients revalidate them
         file_path = tts_service.output_dir / filename
-        
-        if not file_path.exists():
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Audio file not found")
-        
-        return FileResponse(
-            path=str(file_path),
-            media_type="audio/mpeg",
-            filename=filename,
-            headers={
-                "Accept-Ranges": "bytes",
-                "Cache-Control": "no-cache",
-                "Access-Control-Allow-Origin": "*"
-            }
-        )
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if is_not_modified(request, etag, stat.st_mtime, immutable=False):
+            return not_modified_response(etag, stat.st_mtime, immutable=False)
+        return audio_response(request, file_path.read_bytes(), etag, stat.st_mtime, media_type=media_type_for(filename))
     except HTTPException:
         raise
     except Exception as e:
@@ -134,13 +426,16 @@ def get_available_languages():
 
 @app.get("/voice/status")
 def get_tts_status():
-    """Check if TTS service is available"""
+    """Check if TTS service is available, with per-engine latency"""
     try:
         is_available = tts_service.is_available()
         return {
             "success": True,
             "available": is_available,
-            "service": "gTTS"
+            "service": tts_service.engines.default,
+            "fallback": tts_service.engines.fallback,
+            "engines": tts_service.engines.stats(),
+            "jobs": tts_jobs.stats()
         }
     except Exception as e:
         return {
@@ -0,0 +1,193 @@
+"""
+Pluggable speech engines for the voice service
+gTTS (Google, network) and eSpeak NG (local, offline) behind one interface, chosen
+per language from settings, with automatic fallback and per-engine latency metrics
+"""
+
+import io
+import logging
+from abc import ABC, abstractmethod
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from gtts import gTTS
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav"}
+
+
+class TTSEngine(ABC):
+    """Text in, audio bytes out"""
+
+    name = "base"
+    extension = "mp3"
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.extension]
+
+    @abstractmethod
+    def synthesize(self, text: str, language: str, slow: bool) -> bytes:
+        ...
+
+    def is_available(self) -> bool:
+        return True
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS: natural voices, one HTTPS round-trip per utterance"""
+
+    name = "gtts"
+    extension = "mp3"
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+
+    def synthesize(self, text: str, language: str, slow: bool) -> bytes:
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, slow=slow, timeout=self.timeout).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class EspeakEngine(TTSEngine):
+    """eSpeak NG via its CLI: offline and fast, robotic voice, WAV output"""
+
+    name = "espeak"
+    extension = "wav"
+
+    # Language codes that differ from eSpeak voice names
+    VOICES = {"zh-CN": "cmn", "zh-TW": "cmn", "pt": "pt-br"}
+
+    def __init__(self, binary: Optional[str] = None, timeout: Optional[float] = None):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.timeout = timeout
+
+    def synthesize(self, text: str, language: str, slow: bool) -> bytes:
+        if not self.binary:
+            raise RuntimeError("espeak-ng is not installed")
+        command = [
+            self.binary,
+            "--stdout",
+            "-v", self.VOICES.get(language, language),
+            "-s", "120" if slow else "165",
+            text,
+        ]
+        result = subprocess.run(command, capture_output=True, check=True, timeout=self.timeout)
+        return result.stdout
+
+    def is_available(self) -> bool:
+        return self.binary is not None
+
+
+class EngineRouter:
+    """Picks the engine for a language, falls back when it fails, and records latency per engine"""
+
+    def __init__(
+        self,
+        engines: Dict[str, TTSEngine],
+        default: str,
+        by_language: Optional[Dict[str, str]] = None,
+        fallback: Optional[str] = None,
+    ):
+        named = [default, *(by_language or {}).values()] + ([fallback] if fallback else [])
+        unknown = sorted({name for name in named if name not in engines})
+        if unknown:
+            raise ValueError(f"Unknown TTS engine(s) {', '.join(unknown)}; choose from {', '.join(engines)}")
+        self.engines = engines
+        self.default = default
+        self.by_language = by_language or {}
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def engine_for(self, language: str) -> TTSEngine:
+        name = self.by_language.get(language, self.default)
+        engine = self.engines.get(name)
+        if engine is None or not engine.is_available():
+            engine = self.engines.get(self.fallback) or self.engines[self.default]
+        return engine
+
+    def candidates(self, language: str) -> List[TTSEngine]:
+        """Engines that may have produced audio for `language`: the routed one, then the fallback"""
+        engine = self.engine_for(language)
+        backup = self.engines.get(self.fallback)
+        if backup is None or backup is engine or not backup.is_available():
+            return [engine]
+        return [engine, backup]
+
+    def synthesize(self, text: str, language: str, slow: bool) -> Tuple[TTSEngine, bytes]:
+        engine = self.engine_for(language)
+        try:
+            return engine, self._timed(engine, text, language, slow)
+        except Exception as e:
+            backup = self.engines.get(self.fallback)
+            if backup is None or backup is engine or not backup.is_available():
+                raise
+            logger.warning(f"TTS engine {engine.name} failed ({str(e)}), falling back to {backup.name}")
+            self._count(engine.name, "fallbacks")
+            return backup, self._timed(backup, text, language, slow)
+
+    def _timed(self, engine: TTSEngine, text: str, language: str, slow: bool) -> bytes:
+        started = time.perf_counter()
+        failed = True
+        try:
+            audio = engine.synthesize(text, language, slow)
+            failed = False
+            return audio
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                entry = self._entry(engine.name)
+                entry["calls"] += 1
+                entry["errors"] += int(failed)
+                entry["total_ms"] += elapsed_ms
+                entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+                entry["chars"] += len(text)
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self._stats.setdefault(
+            name, {"calls": 0, "errors": 0, "fallbacks": 0, "total_ms": 0.0, "max_ms": 0.0, "chars": 0}
+        )
+
+    def _count(self, name: str, field: str) -> None:
+        with self._lock:
+            self._entry(name)[field] += 1
+
+    def is_available(self) -> bool:
+        return any(engine.is_available() for engine in self.engines.values())
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            stats = {}
+            for name, engine in self.engines.items():
+                entry = dict(self._entry(name))
+                entry["avg_ms"] = round(entry["total_ms"] / entry["calls"], 1) if entry["calls"] else 0.0
+                stats[name] = {"available": engine.is_available(), **entry}
+            return stats
+
+
+def parse_language_map(spec: str) -> Dict[str, str]:
+    """'hi=espeak,en=gtts' -> {'hi': 'espeak', 'en': 'gtts'}"""
+    mapping = {}
+    for item in spec.split(","):
+        if "=" in item:
+            language, engine = item.split("=", 1)
+            mapping[language.strip()] = engine.strip()
+    return mapping
+
+
+def build_router(settings) -> EngineRouter:
+    engines: Dict[str, TTSEngine] = {
+        "gtts": GTTSEngine(timeout=settings.tts_timeout_sec),
+        "espeak": EspeakEngine(timeout=settings.tts_timeout_sec),
+    }
+    return EngineRouter(
+        engines,
+        default=settings.tts_engine,
+        by_language=parse_language_map(settings.tts_engine_by_language),
+        fallback=settings.tts_fallback_engine or None,
+    )
@@ -0,0 +1,252 @@
+"""
+TTS job queue: synthesis runs on a small dedicated worker pool instead of the request
+threadpool, so a burst of voice requests can't starve the agent API. Identical pending
+requests share one job, and live calls are served before batch notifications.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.api.voice_tts import VoiceTTSService
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITIES = {"live": 0, "batch": 10}
+
+
+class QueueFullError(RuntimeError):
+    """Too many TTS jobs are waiting; the caller should retry later"""
+
+
+@dataclass
+class TTSJob:
+    job_id: str
+    key: Tuple
+    text: str
+    language: str = "en"
+    slow: bool = False
+    filename: Optional[str] = None
+    stream: bool = False  # keep the audio in memory only and hand the bytes back
+    priority: int = PRIORITIES["live"]
+    status: str = "QUEUED"  # QUEUED, RUNNING, COMPLETED, FAILED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    audio: Optional[bytes] = field(default=None, repr=False)
+    error: Optional[str] = None
+    coalesced: int = 0  # requests that joined this job after it was created
+    future: Future = field(default_factory=Future, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("COMPLETED", "FAILED")
+
+    async def wait(self, timeout: Optional[float] = None) -> "TTSJob":
+        """Waits for the job without blocking the event loop; raises asyncio.TimeoutError"""
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.future)), timeout)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        queued_for = (self.started_at or time.time()) - self.created_at
+        summary = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "priority": next((name for name, value in PRIORITIES.items() if value == self.priority), self.priority),
+            "text_length": len(self.text),
+            "language": self.language,
+            "coalesced": self.coalesced,
+            "queued_ms": round(queued_for * 1000, 1),
+        }
+        if self.started_at and self.finished_at:
+            summary["synthesis_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.result is not None:
+            summary["result"] = self.result
+        if self.error:
+            summary["error"] = self.error
+        return summary
+
+
+class TTSJobQueue:
+    """
+    Priority queue drained by `workers` threads. Pending work is capped at `max_pending`
+    (submit raises QueueFullError beyond that) and finished jobs are kept for polling,
+    up to `history` of them.
+    """
+
+    def __init__(
+        self,
+        service: VoiceTTSService,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        history: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.service = service
+        self.workers = workers or settings.tts_workers
+        self.max_pending = max_pending or settings.tts_max_pending_jobs
+        self.history = history or settings.tts_job_history
+        self._heap: List[Tuple[int, int, TTSJob]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._jobs: "OrderedDict[str, TTSJob]" = OrderedDict()
+        self._active: Dict[Tuple, TTSJob] = {}  # coalescing key -> queued or running job
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _ensure_workers(self) -> None:
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"tts-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(
+        self,
+        text: str,
+        language: str = "en",
+        slow: bool = False,
+        filename: Optional[str] = None,
+        stream: bool = False,
+        priority: str = "live",
+    ) -> TTSJob:
+        """
+        Queue a synthesis, or join an identical one that hasn't finished yet
+
+        Args:
+            text: Text to convert to speech
+            language: Language code (default: 'en' for English)
+            slow: Whether to speak slowly (default: False)
+            filename: Custom output filename; content-addressed when omitted
+            stream: Keep the audio in memory only (job.audio) instead of writing it to disk
+            priority: "live" (caller is waiting) or "batch" (notifications, pre-rendering)
+
+        Returns:
+            The job; await `job.wait()` or poll it by `job_id`
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        rank = PRIORITIES[priority]
+        key = (self.service.cache_key(text, language, slow), filename, stream)
+
+        with self._cond:
+            if self._closed:
+                raise QueueFullError("TTS queue is shut down")
+            job = self._active.get(key)
+            if job is not None:
+                job.coalesced += 1
+                self.coalesced += 1
+                if rank < job.priority and job.status == "QUEUED":
+                    # Re-queued at the higher priority; the stale heap entry is skipped when popped
+                    job.priority = rank
+                    heapq.heappush(self._heap, (rank, next(self._seq), job))
+                    self._cond.notify()
+                return job
+
+            if len(self._active) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"{len(self._active)} TTS jobs pending")
+
+            job = TTSJob(
+                job_id=uuid.uuid4().hex, key=key, text=text, language=language, slow=slow,
+                filename=filename, stream=stream, priority=rank,
+            )
+            self._active[key] = job
+            self._register(job)
+            heapq.heappush(self._heap, (rank, next(self._seq), job))
+            self.submitted += 1
+            self._ensure_workers()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[TTSJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def _register(self, job: TTSJob) -> None:
+        self._jobs[job.job_id] = job
+        # Evict the oldest finished jobs once we exceed the retention limit
+        for old_id in list(self._jobs):
+            if len(self._jobs) <= self.history:
+                break
+            if self._jobs[old_id].done:
+                del self._jobs[old_id]
+
+    def _next_job(self) -> Optional[TTSJob]:
+        with self._cond:
+            while True:
+                while self._heap:
+                    rank, _, job = heapq.heappop(self._heap)
+                    if job.status == "QUEUED" and rank == job.priority:
+                        job.status = "RUNNING"
+                        job.started_at = time.time()
+                        return job
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                job.result = self._run(job)
+                job.status = "COMPLETED" if job.result.get("success") else "FAILED"
+                job.error = job.result.get("error")
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"TTS job {job.job_id} failed: {str(e)}")
+                job.status = "FAILED"
+                job.error = str(e)
+            job.finished_at = time.time()
+            with self._cond:
+                self._active.pop(job.key, None)
+                if job.stream:
+                    # Only the waiters need the bytes; don't keep them around for polling
+                    self._jobs.pop(job.job_id, None)
+            job.future.set_result(job)
+
+    def _run(self, job: TTSJob) -> Dict[str, Any]:
+        if not job.stream:
+            return self.service.text_to_speech(job.text, job.language, job.slow, job.filename)
+        key, job.audio, media_type = self.service.synthesize_clip(job.text, job.language, job.slow, persist=False)
+        return {
+            "success": True,
+            "cache_key": key,
+            "media_type": media_type,
+            "language": job.language,
+            "text_length": len(job.text),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            running = sum(1 for job in self._active.values() if job.status == "RUNNING")
+            return {
+                "workers": self.workers,
+                "queued": len(self._active) - running,
+                "running": running,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+            }
+
+    def close(self) -> None:
+        """Stops the workers once the jobs already queued have run"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,219 @@
+"""
+Progressive voice output for agent flows
+Streams the customer message's LLM tokens, cuts them into sentences and synthesizes
+each sentence as soon as it is complete, so audio starts after the first sentence
+instead of after the whole completion plus a full TTS pass
+"""
+
+import asyncio
+import logging
+import re
+import struct
+import time
+from typing import AsyncIterator, List, Optional
+
+from app.agents.master import stream_predictive_flow
+from app.api.tts_jobs import TTSJobQueue
+
+logger = logging.getLogger(__name__)
+
+# Node whose text is read out to the customer
+SPOKEN_NODE = "customer_engagement"
+
+# Sentence end: . ! ? followed by whitespace (so "3.5" is never split), or a line break
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Sentences synthesized ahead of playback
+MAX_PENDING_CHUNKS = 4
+
+# Flows outlive their audio stream; keep references so they aren't garbage-collected mid-run
+_running_flows: set = set()
+
+# RIFF/data length for a stream whose total size isn't known up front
+_WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+class SentenceSegmenter:
+    """Accumulates streamed text and hands back complete sentences"""
+
+    def __init__(self, min_chars: int = 20, max_chars: int = 240):
+        """
+        Args:
+            min_chars: Shorter fragments are merged with the next sentence
+            max_chars: Longer runs without punctuation are cut at the last space
+        """
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return sentences
+            end, resume = cut
+            sentence = self._buffer[:end].strip()
+            self._buffer = self._buffer[resume:]
+            if sentence:
+                sentences.append(sentence)
+
+    def _next_cut(self) -> Optional[tuple]:
+        for match in _BOUNDARY.finditer(self._buffer):
+            if match.start() >= self.min_chars:
+                return match.start(), match.end()
+        if len(self._buffer) > self.max_chars:
+            space = self._buffer.rfind(" ", 0, self.max_chars)
+            end = space if space > 0 else self.max_chars
+            return end, end
+        return None
+
+    def flush(self) -> Optional[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+
+def _wav_data_offset(audio: bytes) -> Optional[int]:
+    """Offset of the sample data in a RIFF/WAVE clip, None if it isn't one"""
+    if len(audio) < 12 or audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return None
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4]
+        size = struct.unpack_from("<I", audio, offset + 4)[0]
+        if chunk_id == b"data":
+            return offset + 8
+        offset += 8 + size + (size & 1)
+    return None
+
+
+class AudioJoiner:
+    """
+    Turns per-sentence clips into one playable stream. MP3 frames concatenate as they are;
+    for WAV the first header is kept with open-ended sizes and later headers are stripped.
+    Clips in a different format (an engine fell back mid-stream) are dropped.
+    """
+
+    def __init__(self, media_type: str):
+        self.media_type = media_type
+        self._started = False
+
+    def add(self, audio: bytes) -> Optional[bytes]:
+        data_offset = _wav_data_offset(audio)
+        if (data_offset is not None) != (self.media_type == "audio/wav"):
+            logger.warning(f"Dropping TTS chunk that isn't {self.media_type}")
+            return None
+        if data_offset is None:
+            return audio
+        if self._started:
+            return audio[data_offset:]
+        self._started = True
+        header = bytearray(audio[:data_offset])
+        struct.pack_into("<I", header, 4, _WAV_UNKNOWN_SIZE)
+        struct.pack_into("<I", header, data_offset - 4, _WAV_UNKNOWN_SIZE)
+        return bytes(header) + audio[data_offset:]
+
+
+async def _spoken_sentences(vehicle_id: str, sentences: asyncio.Queue) -> None:
+    """
+    Runs the whole flow (booking, CAPA and feedback still complete after the message is spoken)
+    and queues the customer message sentence by sentence, then None
+    """
+    segmenter = SentenceSegmenter()
+    streamed = False
+    spoken = False
+    try:
+        async for event in stream_predictive_flow(vehicle_id):
+            if spoken:
+                continue
+            if event["type"] == "token" and event["node"] == SPOKEN_NODE:
+                streamed = True
+                for sentence in segmenter.feed(event["content"]):
+                    await sentences.put(sentence)
+            elif event["type"] == "update" and event["node"] == SPOKEN_NODE:
+                # Models that don't stream still produce the full script here
+                if not streamed:
+                    segmenter.feed(event["data"].get("customer_script") or "")
+                for sentence in segmenter.feed("\n"):
+                    await sentences.put(sentence)
+                rest = segmenter.flush()
+                if rest:
+                    await sentences.put(rest)
+                spoken = True
+                await sentences.put(None)
+            elif event["type"] == "done":
+                # No customer message (healthy vehicle or blocked flow): read out the outcome instead
+                state = event["state"]
+                summary = state.get("error_message") or state.get("diagnosis_report")
+                if summary:
+                    await sentences.put(summary)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Voice flow failed for {vehicle_id}: {exc}")
+    finally:
+        if not spoken:
+            await sentences.put(None)
+
+
+async def _synthesize_sentence(tts_jobs: TTSJobQueue, sentence: str, language: str, slow: bool) -> bytes:
+    job = await tts_jobs.submit(sentence, language, slow, stream=True, priority="live").wait()
+    if job.status != "COMPLETED":
+        raise RuntimeError(job.error or "TTS generation failed")
+    return job.audio
+
+
+async def stream_flow_audio(
+    vehicle_id: str,
+    tts_jobs: TTSJobQueue,
+    language: str = "en",
+    slow: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Yields audio chunks (MP3, or one continuous WAV for local engines) for the flow's
+    customer message as it is being written
+
+    Args:
+        vehicle_id: Vehicle to run the agent flow for
+        tts_jobs: Queue that synthesizes each sentence (at live priority)
+        language: Language code (default: 'en' for English)
+        slow: Whether to speak slowly (default: False)
+    """
+    started = time.perf_counter()
+    sentences: asyncio.Queue = asyncio.Queue()
+    # Synthesis runs ahead of playback, up to MAX_PENDING_CHUNKS sentences
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_CHUNKS)
+
+    async def _synthesize() -> None:
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                break
+            await chunks.put(asyncio.create_task(_synthesize_sentence(tts_jobs, sentence, language, slow)))
+        await chunks.put(None)
+
+    # The flow task is not awaited: if the listener hangs up, the agent flow still finishes
+    flow = asyncio.create_task(_spoken_sentences(vehicle_id, sentences))
+    _running_flows.add(flow)
+    flow.add_done_callback(_running_flows.discard)
+    synthesizer = asyncio.create_task(_synthesize())
+    joiner = AudioJoiner(tts_jobs.service.media_type(language))
+    first = True
+    try:
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            try:
+                audio = await chunk
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"TTS chunk failed: {exc}")
+                continue
+            audio = joiner.add(audio)
+            if audio is None:
+                continue
+            if first:
+                logger.info(f"Time to first audio for {vehicle_id}: {(time.perf_counter() - started) * 1000:.0f} ms")
+                first = False
+            yield audio
+    finally:
+        synthesizer.cancel()
@@ -1,20 +1,153 @@
 """
-Voice TTS Service using gTTS (Google Text-to-Speech)
+Voice TTS Service using gTTS (Google Text-to-Speech) or a local engine (see tts_engines.py)
 Provides text-to-speech conversion for voice assistant functionality
 """
 
+import hashlib
 import os
 import logging
+import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any
-from gtts import gTTS
+from typing import Optional, Dict, Any, List, Tuple
 import tempfile
 import time
 
+from app.api.tts_engines import MEDIA_TYPES, TTSEngine, build_router
+from app.config.settings import get_settings
+from app.data.cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
+# Content-addressed files: tts_<sha256 of (engine, language, slow, text)>.<mp3|wav>
+_CACHED_NAME = re.compile(r"^tts_([0-9a-f]{64})\.(mp3|wav)$")
+
+
+def cache_key_from_filename(filename: str) -> Optional[str]:
+    """Content hash for a content-addressed file name, None for any other name"""
+    match = _CACHED_NAME.match(filename)
+    return match.group(1) if match else None
+
+
+def media_type_for(filename: str) -> str:
+    return MEDIA_TYPES.get(Path(filename).suffix.lstrip("."), "application/octet-stream")
+
+
+def audio_cache_key(text: str, language: str, slow: bool, engine: str = "gtts") -> str:
+    """Hash of what determines the audio; whitespace differences don't produce new files"""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{engine}|{language}|{int(slow)}|{normalized}".encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Size-bounded LRU of synthesized clips on disk, with an in-memory index so hits
+    never touch the filesystem until the file is served
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> (size, last used, created, extension), least recently used first
+        self._index: "OrderedDict[str, Tuple[int, float, float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self) -> None:
+        entries = []
+        for file_path in self.directory.glob("tts_*"):
+            match = _CACHED_NAME.match(file_path.name)
+            if match:
+                stat = file_path.stat()
+                entries.append((stat.st_mtime, match.group(1), stat.st_size, match.group(2)))
+        for mtime, key, size, extension in sorted(entries):
+            self._index[key] = (size, mtime, mtime, extension)
+            self._bytes += size
+
+    def _path(self, key: str, extension: str) -> Path:
+        return self.directory / f"tts_{key}.{extension}"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        found = self.lookup_first([key])
+        return found[1] if found else None
+
+    def lookup_first(self, keys: List[str]) -> Optional[Tuple[str, Path]]:
+        """(key, path) of the first cached key; counts as one hit or miss"""
+        with self._lock:
+            for key in keys:
+                entry = self._index.get(key)
+                if entry is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self._index[key] = (entry[0], time.time(), entry[2], entry[3])
+            self._index.move_to_end(key)
+            self.hits += 1
+        return key, self._path(key, entry[3])
+
+    def store(self, key: str, audio: bytes, extension: str = "mp3") -> Path:
+        target = self._path(key, extension)
+        # Write then rename, so a concurrent reader never sees a half-written file
+        tmp = target.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, target)
+        with self._lock:
+            now = time.time()
+            self._bytes += len(audio) - self._index.pop(key, (0, 0, 0, extension))[0]
+            self._index[key] = (len(audio), now, now, extension)
+            doomed = self._evict()
+        self._unlink(doomed)
+        return target
+
+    def _evict(self) -> list:
+        doomed = []
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            key, (size, _, _, extension) = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            doomed.append(self._path(key, extension))
+        return doomed
+
+    def _unlink(self, paths: list) -> None:
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.error(f"Failed to evict {path}: {str(e)}")
+
+    def last_used(self, key: str) -> Optional[float]:
+        entry = self._index.get(key)
+        return entry[1] if entry else None
+
+    def created(self, key: str) -> Optional[float]:
+        entry = self._index.get(key)
+        return entry[2] if entry else None
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._bytes -= self._index.pop(key, (0, 0, 0, ""))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
 class VoiceTTSService:
-    """Service for converting text to speech using gTTS"""
+    """Service for converting text to speech with the configured engines"""
     
     def __init__(self, output_dir: Optional[str] = None):
         """
@@ -29,7 +162,96 @@ class VoiceTTSService:
             self.output_dir = Path("app/data/voice_outputs")
         
         self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        settings = get_settings()
+        self.engines = build_router(settings)
+        self.cache = AudioCache(self.output_dir, int(settings.tts_cache_max_mb * 1024 * 1024))
+        # Hot clips kept in memory so repeated playback costs no disk reads
+        self.memory = TTLCache(settings.tts_memory_cache_entries, settings.tts_cache_max_age_hours * 3600)
+        self.max_age_hours = settings.tts_cache_max_age_hours
+        self._cleanup_interval = settings.tts_cleanup_interval_sec
+        self._stop_cleanup = threading.Event()
+        self._cleanup_thread: Optional[threading.Thread] = None
         logger.info(f"VoiceTTSService initialized with output directory: {self.output_dir}")
+
+    def start_background_cleanup(self):
+        """Run cleanup_old_files every `tts_cleanup_interval_sec` in a daemon thread"""
+        if self._cleanup_thread is not None:
+            return
+
+        def _loop():
+            while not self._stop_cleanup.wait(self._cleanup_interval):
+                try:
+                    self.cleanup_old_files(max_age_hours=self.max_age_hours)
+                except Exception as e:
+                    logger.error(f"Background TTS cleanup failed: {str(e)}")
+
+        self._cleanup_thread = threading.Thread(target=_loop, name="tts-cleanup", daemon=True)
+        self._cleanup_thread.start()
+
+    def stop_background_cleanup(self):
+        self._stop_cleanup.set()
+
+    def cache_key(self, text: str, language: str, slow: bool) -> str:
+        """Cache key for the engine that currently serves `language`"""
+        return audio_cache_key(text, language, slow, self.engines.engine_for(language).name)
+
+    def _cache_keys(self, text: str, language: str, slow: bool) -> List[Tuple[str, TTSEngine]]:
+        """
+        Keys a clip may be cached under, routed engine first: while that engine fails,
+        clips are rendered by the fallback and stored under the fallback's key
+        """
+        return [(audio_cache_key(text, language, slow, engine.name), engine) for engine in self.engines.candidates(language)]
+
+    def _cached_audio(self, text: str, language: str, slow: bool) -> Tuple[str, Path, bool]:
+        """
+        Returns (cache key, file path, cache hit), synthesizing and storing the audio on a miss
+        """
+        found = self.cache.lookup_first([key for key, _ in self._cache_keys(text, language, slow)])
+        if found is not None:
+            return found[0], found[1], True
+        key, audio, extension = self._render(text, language, slow)
+        self.memory.set(key, audio)
+        return key, self.cache.store(key, audio, extension), False
+
+    def audio_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Audio for a cache key from memory, else from disk (then kept in memory)
+
+        Returns:
+            MP3/WAV bytes, or None if the clip isn't cached
+        """
+        found = self._cached_bytes([key])
+        return found[1] if found else None
+
+    def _cached_bytes(self, keys: List[str]) -> Optional[Tuple[str, bytes]]:
+        """
+        (key, audio) for the first of `keys` that is cached; one disk cache lookup, so a
+        request counts as exactly one hit or miss however many keys it may be stored under
+        """
+        found = self.cache.lookup_first(keys)
+        if found is None:
+            # Streamed clips (persist=False) are only kept in memory
+            for key in keys:
+                audio = self.memory.get(key)
+                if audio is not None:
+                    return key, audio
+            return None
+        key, path = found
+        audio = self.memory.get(key)
+        if audio is None:
+            try:
+                audio = path.read_bytes()
+            except FileNotFoundError:
+                self.cache.forget(key)
+                return None
+            self.memory.set(key, audio)
+        return key, audio
+
+    def _render(self, text: str, language: str, slow: bool) -> Tuple[str, bytes, str]:
+        """Synthesize with the routed engine; returns (cache key of the engine used, audio, file extension)"""
+        engine, audio = self.engines.synthesize(text, language, slow)
+        return audio_cache_key(text, language, slow, engine.name), audio, engine.extension
     
     def text_to_speech(
         self,
@@ -45,27 +267,41 @@ class VoiceTTSService:
             text: Text to convert to speech
             language: Language code (default: 'en' for English)
             slow: Whether to speak slowly (default: False)
-            filename: Custom filename (without extension). Auto-generated if None.
+            filename: Custom filename (without extension). If None, the file is
+                named by content hash and identical requests reuse it without synthesis.
         
         Returns:
             Dictionary with audio file path and metadata
         """
         try:
-            # Generate filename if not provided
             if not filename:
-                filename = f"tts_{int(time.time() * 1000)}"
+                key, output_path, cached = self._cached_audio(text, language, slow)
+                if cached:
+                    logger.info(f"TTS cache hit: {output_path}")
+                else:
+                    logger.info(f"Generated TTS audio: {output_path}")
+                return {
+                    "success": True,
+                    "audio_path": str(output_path),
+                    "filename": output_path.name,
+                    "language": language,
+                    "text_length": len(text),
+                    "media_type": media_type_for(output_path.name),
+                    "cache_key": key,
+                    "cached": cached
+                }
             
-            # Ensure .mp3 extension
-            if not filename.endswith('.mp3'):
-                filename = f"{filename}.mp3"
+            # Synthesize, then name the file after the engine's format
+            _, audio, extension = self._render(text, language, slow)
             
-            output_path = self.output_dir / filename
+            # Ensure the extension matches the audio format
+            if not filename.endswith(f".{extension}"):
+                filename = f"{filename}.{extension}"
             
-            # Create TTS object
-            tts = gTTS(text=text, lang=language, slow=slow)
+            output_path = self.output_dir / filename
             
             # Save to file
-            tts.save(str(output_path))
+            output_path.write_bytes(audio)
             
             logger.info(f"Generated TTS audio: {output_path}")
             
@@ -84,6 +320,44 @@ class VoiceTTSService:
                 "error": str(e)
             }
     
+    def synthesize_clip(
+        self, text: str, language: str = "en", slow: bool = False, persist: bool = True
+    ) -> Tuple[str, bytes, str]:
+        """
+        Convert text to speech, served from the audio cache when possible
+
+        Args:
+            text: Text to convert to speech
+            language: Language code (default: 'en' for English)
+            slow: Whether to speak slowly (default: False)
+            persist: Also write new audio to the disk cache; if False it is only kept in memory
+
+        Returns:
+            (cache key, audio bytes, media type)
+        """
+        engines = dict(self._cache_keys(text, language, slow))
+        found = self._cached_bytes(list(engines))
+        if found is not None:
+            return found[0], found[1], engines[found[0]].media_type
+        key, audio, extension = self._render(text, language, slow)
+        self.memory.set(key, audio)
+        if persist:
+            self.cache.store(key, audio, extension)
+        return key, audio, MEDIA_TYPES[extension]
+
+    def synthesize(self, text: str, language: str = "en", slow: bool = False, persist: bool = True) -> bytes:
+        """
+        Convert text to speech and return the audio bytes (see `synthesize_clip`)
+
+        Returns:
+            MP3 or WAV bytes, depending on the engine serving `language`
+        """
+        return self.synthesize_clip(text, language, slow, persist)[1]
+
+    def media_type(self, language: str = "en") -> str:
+        """Audio format the engine serving `language` produces"""
+        return self.engines.engine_for(language).media_type
+
     def get_available_languages(self) -> Dict[str, str]:
         """
         Get available language codes
@@ -119,9 +393,8 @@ class VoiceTTSService:
             True if service is available
         """
         try:
-            # Try to create a simple TTS object
-            test_tts = gTTS(text="test", lang="en")
-            return True
+            # Local check only: no synthesis, no network call
+            return self.engines.is_available()
         except Exception as e:
             logger.error(f"TTS service not available: {str(e)}")
             return False
@@ -137,13 +410,24 @@ class VoiceTTSService:
         max_age_seconds = max_age_hours * 3600
         
         cleaned_count = 0
-        for file_path in self.output_dir.glob("tts_*.mp3"):
-            if (current_time - file_path.stat().st_mtime) > max_age_seconds:
-                try:
-                    file_path.unlink()
-                    cleaned_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {str(e)}")
+        for file_path in self.output_dir.glob("tts_*"):
+            if file_path.suffix not in (".mp3", ".wav"):
+                continue
+            match = _CACHED_NAME.match(file_path.name)
+            try:
+                # Cached files age from their last cache hit, other files from when they were written
+                last_used = self.cache.last_used(match.group(1)) if match else None
+                if (current_time - (last_used or file_path.stat().st_mtime)) <= max_age_seconds:
+                    continue
+                file_path.unlink()
+                cleaned_count += 1
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.error(f"Failed to delete {file_path}: {str(e)}")
+                continue
+            if match:
+                self.cache.forget(match.group(1))
         
         logger.info(f"Cleaned up {cleaned_count} old TTS files")
         return cleaned_count
@@ -9,6 +9,15 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+
+def _data_file(name: str, default: str) -> str:
+	"""Relative SQLite paths live under DATA_DIR, whatever the working directory; empty stays empty."""
+	path = os.getenv(name, default)
+	return os.path.join(DATA_DIR, path) if path and not os.path.isabs(path) else path
+
 
 @dataclass
 class Settings:
@@ -22,9 +31,86 @@ class Settings:
 	openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
 	google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
 	llm_api_version: str = os.getenv("LLM_API_VERSION", "v1beta")
+	llm_base_url: str = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+	llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "60"))
+	llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+	llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+	llm_pool_size: int = int(os.getenv("LLM_POOL_SIZE", "20"))
+	llm_keepalive_sec: float = float(os.getenv("LLM_KEEPALIVE_SEC", "60"))
+	# Extra LLM calls allowed to fix a diagnosis that fails schema validation
+	diagnosis_repair_retries: int = int(os.getenv("DIAGNOSIS_REPAIR_RETRIES", "1"))
+	# Per-node prompt token budgets overriding app/agents/prompts.py, e.g. "diagnosis=500,manufacturing=200"
+	prompt_token_budgets: str = os.getenv("PROMPT_TOKEN_BUDGETS", "")
+
+	llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+	llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+	llm_cache_ttl_sec: float = float(os.getenv("LLM_CACHE_TTL_SEC", "86400"))
+	llm_cache_sqlite_path: str = _data_file("LLM_CACHE_SQLITE_PATH", "")
+
+	# Per-node flow checkpoints for resume (opt-in); an empty path (or no langgraph-checkpoint-sqlite) keeps them in memory
+	checkpoint_enabled: bool = os.getenv("CHECKPOINT_ENABLED", "false").lower() == "true"
+	checkpoint_sqlite_path: str = _data_file("CHECKPOINT_SQLITE_PATH", "flow_checkpoints.sqlite")
+	checkpoint_keep_completed: bool = os.getenv("CHECKPOINT_KEEP_COMPLETED", "false").lower() == "true"
+	# Flows not run or resumed for this long lose their checkpoints and booking record; 0 keeps them
+	checkpoint_retention_hours: float = float(os.getenv("CHECKPOINT_RETENTION_HOURS", "72"))
+
+	# Durable flow job queue, drained by `python -m app.agents.flow_worker`
+	flow_queue_path: str = _data_file("FLOW_QUEUE_PATH", "flow_queue.sqlite")
+	flow_workers: int = int(os.getenv("FLOW_WORKERS", "2"))
+	flow_visibility_timeout_sec: float = float(os.getenv("FLOW_VISIBILITY_TIMEOUT_SEC", "120"))
+	flow_max_attempts: int = int(os.getenv("FLOW_MAX_ATTEMPTS", "3"))
+	flow_retry_backoff_sec: float = float(os.getenv("FLOW_RETRY_BACKOFF_SEC", "5"))
+	flow_retry_backoff_max_sec: float = float(os.getenv("FLOW_RETRY_BACKOFF_MAX_SEC", "300"))
+	flow_poll_interval_sec: float = float(os.getenv("FLOW_POLL_INTERVAL_SEC", "1"))
+	flow_job_history: int = int(os.getenv("FLOW_JOB_HISTORY", "10000"))
+
+	repo_cache_enabled: bool = os.getenv("REPO_CACHE_ENABLED", "true").lower() == "true"
+	repo_cache_max_entries: int = int(os.getenv("REPO_CACHE_MAX_ENTRIES", "4096"))
+	repo_cache_stale_sec: float = float(os.getenv("REPO_CACHE_STALE_SEC", "30"))
+	telematics_cache_ttl_sec: float = float(os.getenv("TELEMATICS_CACHE_TTL_SEC", "5"))
+	maintenance_cache_ttl_sec: float = float(os.getenv("MAINTENANCE_CACHE_TTL_SEC", "300"))
+	slots_cache_ttl_sec: float = float(os.getenv("SLOTS_CACHE_TTL_SEC", "30"))
 
 	log_to_backend: bool = os.getenv("LOG_TO_BACKEND", "true").lower() == "true"
 	ueba_enabled: bool = os.getenv("UEBA_ENABLED", "true").lower() == "true"
+	ueba_buffer_size: int = int(os.getenv("UEBA_BUFFER_SIZE", "10000"))
+	ueba_batch_size: int = int(os.getenv("UEBA_BATCH_SIZE", "100"))
+	ueba_flush_interval_ms: float = float(os.getenv("UEBA_FLUSH_INTERVAL_MS", "250"))
+	ueba_block_ms: float = float(os.getenv("UEBA_BLOCK_MS", "0"))
+	# Per agent within one flow, so it doesn't shrink as more flows run concurrently
+	ueba_rate_limit_per_sec: float = float(os.getenv("UEBA_RATE_LIMIT_PER_SEC", "100"))
+	ueba_anomaly_half_life_sec: float = float(os.getenv("UEBA_ANOMALY_HALF_LIFE_SEC", "30"))
+	ueba_novelty_warmup: int = int(os.getenv("UEBA_NOVELTY_WARMUP", "200"))
+	ueba_max_tracked_flows: int = int(os.getenv("UEBA_MAX_TRACKED_FLOWS", "10000"))
+	ueba_event_log_size: int = int(os.getenv("UEBA_EVENT_LOG_SIZE", "1000"))
+
+	tts_cache_max_mb: float = float(os.getenv("TTS_CACHE_MAX_MB", "200"))
+	tts_cache_max_age_hours: float = float(os.getenv("TTS_CACHE_MAX_AGE_HOURS", "168"))
+	tts_memory_cache_entries: int = int(os.getenv("TTS_MEMORY_CACHE_ENTRIES", "256"))
+	tts_cleanup_interval_sec: float = float(os.getenv("TTS_CLEANUP_INTERVAL_SEC", "3600"))
+	# "gtts" (network) or "espeak" (local eSpeak NG); per-language overrides as "hi=espeak,en=gtts"
+	tts_engine: str = os.getenv("TTS_ENGINE", "gtts")
+	tts_engine_by_language: str = os.getenv("TTS_ENGINE_BY_LANGUAGE", "")
+	tts_fallback_engine: str = os.getenv("TTS_FALLBACK_ENGINE", "espeak")
+	tts_timeout_sec: float = float(os.getenv("TTS_TIMEOUT_SEC", "10"))
+	# Dedicated synthesis workers, so voice load doesn't take request threads from the agent API
+	tts_workers: int = int(os.getenv("TTS_WORKERS", "4"))
+	tts_max_pending_jobs: int = int(os.getenv("TTS_MAX_PENDING_JOBS", "256"))
+	tts_job_history: int = int(os.getenv("TTS_JOB_HISTORY", "1000"))
+	tts_job_wait_sec: float = float(os.getenv("TTS_JOB_WAIT_SEC", "30"))
+
+	batch_max_workers: int = int(os.getenv("BATCH_MAX_WORKERS", "32"))
+	batch_max_jobs: int = int(os.getenv("BATCH_MAX_JOBS", "20"))
+	# >0: batches run on a pool of this many worker processes (see app/agents/fleet_pool.py)
+	fleet_processes: int = int(os.getenv("FLEET_PROCESSES", "0"))
+	fleet_process_concurrency: int = int(os.getenv("FLEET_PROCESS_CONCURRENCY", "8"))
+	fleet_chunk_size: int = int(os.getenv("FLEET_CHUNK_SIZE", "4"))
+
+	# Streaming telematics (app/data/telematics_stream.py): flows start when risk rises to this level
+	stream_trigger_min_level: str = os.getenv("STREAM_TRIGGER_MIN_LEVEL", "MEDIUM")
+	stream_trigger_cooldown_sec: float = float(os.getenv("STREAM_TRIGGER_COOLDOWN_SEC", "300"))
+	stream_max_vehicles: int = int(os.getenv("STREAM_MAX_VEHICLES", "100000"))
+	stream_queue_size: int = int(os.getenv("STREAM_QUEUE_SIZE", "10000"))
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1,181 @@
+"""Bounded in-memory caches shared by the agent and data layers."""
+
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_sec": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class ReadThroughCache:
+    """
+    Loader-backed cache with stale-while-revalidate. Entries are fresh for `ttl`
+    seconds; after that they are still served for up to `stale_ttl` seconds while a
+    single background refresh reloads them. Values are copied in and out, so callers
+    never share a mutable payload with the cache. `None` results are not cached.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = TTLCache(maxsize, ttl + stale_ttl)
+        self._lock = threading.Lock()
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set["asyncio.Task"] = set()
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING, False
+        fresh_until, value = entry
+        return copy.deepcopy(value), time.monotonic() >= fresh_until
+
+    def _store(self, key: Hashable, value: Any) -> Any:
+        if value is not None:
+            self._entries.set(key, (time.monotonic() + self.ttl, copy.deepcopy(value)))
+        return value
+
+    def _claim_refresh(self, key: Hashable) -> bool:
+        with self._lock:
+            self.stale_hits += 1
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _refreshed(self, key: Hashable, failed: bool) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            if failed:
+                self.refresh_errors += 1
+            else:
+                self.refreshes += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        value, stale = self._lookup(key)
+        if value is _MISSING:
+            return self._store(key, loader())
+        if stale and self._claim_refresh(key):
+            threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+        return value
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value, stale = self._lookup(key)
+        if value is _MISSING:
+            return self._store(key, await loader())
+        if stale and self._claim_refresh(key):
+            task = asyncio.get_running_loop().create_task(self._arefresh(key, loader))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        failed = True
+        try:
+            self._store(key, loader())
+            failed = False
+        except Exception:  # noqa: BLE001
+            # Keep serving the stale entry until it expires; the next miss surfaces the error
+            pass
+        finally:
+            self._refreshed(key, failed)
+
+    async def _arefresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        failed = True
+        try:
+            self._store(key, await loader())
+            failed = False
+        except Exception:  # noqa: BLE001
+            pass
+        finally:
+            self._refreshed(key, failed)
+
+    def invalidate(self, key: Hashable) -> bool:
+        return self._entries.invalidate(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._entries.stats()
+        with self._lock:
+            stats.update(
+                ttl_sec=self.ttl,
+                stale_ttl_sec=self.stale_ttl,
+                stale_hits=self.stale_hits,
+                refreshes=self.refreshes,
+                refresh_errors=self.refresh_errors,
+            )
+        return stats
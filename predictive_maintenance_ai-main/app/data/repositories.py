@@ -1,12 +1,21 @@
 """Repositories that proxy all agent data access to the backend REST API."""
 
-from typing import Any, Dict, Optional
+import asyncio
+import copy
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from app.observability.metrics import record_backend
 from app.config.settings import get_settings
+from app.data.cache import ReadThroughCache
 
 
 settings = get_settings()
@@ -28,35 +37,276 @@ def _build_session() -> requests.Session:
 
 session = _build_session()
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def _request(method: str, path: str, **kwargs) -> Any:
-    url = f"{settings.backend_api_url.rstrip('/')}{path}"
-    resp = session.request(method, url, timeout=settings.request_timeout, **kwargs)
-    resp.raise_for_status()
-    data = resp.json()
+# One pooled async client per event loop (httpx clients are bound to the loop they first run on).
+# Each entry also holds the generator that closes the client when its loop shuts down.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, AsyncIterator[None]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    """Parked at its yield until the loop shuts down its async generators, as asyncio.run does."""
+    try:
+        yield
+    finally:
+        # The generator keeps a reference to its loop; dropping the entry lets the loop be freed
+        loop = asyncio.get_running_loop()
+        if _async_clients.get(loop, (None,))[0] is client:
+            del _async_clients[loop]
+        await client.aclose()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0].is_closed:
+        # Loops closed without shutting down their async generators never ran the closer
+        for closed in [other for other in list(_async_clients.keys()) if other.is_closed()]:
+            _async_clients.pop(closed, None)
+        client = httpx.AsyncClient(
+            base_url=settings.backend_api_url.rstrip("/"),
+            timeout=settings.request_timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        closer = _close_with_loop(client)
+        # Run it up to its yield now, which also registers it with the loop's async generator hooks
+        try:
+            closer.asend(None).send(None)
+        except StopIteration:
+            pass
+        entry = _async_clients[loop] = (client, closer)
+    return entry[0]
+
+
+async def aclose_async_client() -> None:
+    entry = _async_clients.get(asyncio.get_running_loop())
+    if entry is not None:
+        await entry[1].aclose()
+
+
+def _unwrap(data: Any) -> Any:
     # Backend wraps payload in { success, data }
     if isinstance(data, dict) and "data" in data:
         return data.get("data")
     return data
 
 
+# --- In-flight coalescing ---
+# Identical GETs issued while one is already on the wire wait for that response instead
+# of hitting the backend again (e.g. two agents reading the same vehicle at once).
+# Followers get a deep copy so no two callers share a mutable payload.
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_inflight_lock = threading.Lock()
+_inflight: Dict[Any, _InFlight] = {}
+_ainflight: Dict[Any, "asyncio.Task"] = {}
+
+
+def _flight_key(path: str, params: Optional[Dict[str, Any]]) -> Any:
+    return (path, tuple(sorted((params or {}).items())))
+
+
+def _send(method: str, path: str, **kwargs) -> Any:
+    url = f"{settings.backend_api_url.rstrip('/')}{path}"
+    started = time.perf_counter()
+    resp = None
+    try:
+        resp = session.request(method, url, timeout=settings.request_timeout, **kwargs)
+        resp.raise_for_status()
+        return _unwrap(resp.json())
+    finally:
+        # urllib3 retries inside the adapter; its Retry object keeps one history entry per retry
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        record_backend(
+            method,
+            path,
+            time.perf_counter() - started,
+            retries=len(retries.history) if retries is not None else 0,
+            request_bytes=len(resp.request.body or b"") if resp is not None else 0,
+            response_bytes=len(resp.content) if resp is not None else 0,
+        )
+
+
+def _request(method: str, path: str, **kwargs) -> Any:
+    if method != "GET":
+        return _send(method, path, **kwargs)
+
+    key = _flight_key(path, kwargs.get("params"))
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _InFlight()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    try:
+        call.result = _send(method, path, **kwargs)
+        return call.result
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+async def _arequest(method: str, path: str, **kwargs) -> Any:
+    if method != "GET":
+        return await _asend(method, path, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    key = (loop, _flight_key(path, kwargs.get("params")))
+    fetch = _ainflight.get(key)
+    leader = fetch is None
+    if leader:
+        # Its own task: a caller that is cancelled, the first one included, doesn't cancel the others
+        fetch = _ainflight[key] = loop.create_task(_asend(method, path, **kwargs))
+        fetch.add_done_callback(lambda done: _land(key, done))
+
+    result = await asyncio.shield(fetch)
+    return result if leader else copy.deepcopy(result)
+
+
+def _land(key: Any, fetch: "asyncio.Task") -> None:
+    if _ainflight.get(key) is fetch:
+        del _ainflight[key]
+    if not fetch.cancelled():
+        fetch.exception()  # mark retrieved, in case every caller was cancelled
+
+
+async def _asend(method: str, path: str, **kwargs) -> Any:
+    client = get_async_client()
+    attempt = 0
+    started = time.perf_counter()
+    resp = None
+    try:
+        while True:
+            try:
+                resp = await client.request(method, path, **kwargs)
+                if resp.status_code not in RETRY_STATUSES or attempt >= settings.max_retries:
+                    break
+            except httpx.TransportError:
+                if attempt >= settings.max_retries:
+                    raise
+            # Same exponential backoff schedule as the urllib3 Retry on the sync session
+            await asyncio.sleep(settings.retry_backoff * (2 ** attempt))
+            attempt += 1
+        resp.raise_for_status()
+        return _unwrap(resp.json())
+    finally:
+        record_backend(
+            method,
+            path,
+            time.perf_counter() - started,
+            retries=attempt,
+            request_bytes=len(resp.request.content) if resp is not None else 0,
+            response_bytes=len(resp.content) if resp is not None else 0,
+        )
+
+
+# --- Read-through caches ---
+# Slow-changing reads (slots, maintenance history) and short-lived telematics snapshots
+# are served from memory; writes invalidate what they change (see book_appointment).
+
+def _read_cache(name: str, ttl: float) -> ReadThroughCache:
+    return ReadThroughCache(name, settings.repo_cache_max_entries, ttl, settings.repo_cache_stale_sec)
+
+
+_read_caches: Dict[str, ReadThroughCache] = {
+    "telematics": _read_cache("telematics", settings.telematics_cache_ttl_sec),
+    "maintenance": _read_cache("maintenance", settings.maintenance_cache_ttl_sec),
+    "slots": _read_cache("slots", settings.slots_cache_ttl_sec),
+}
+
+
+def _cached(name: str, key: Any, loader) -> Any:
+    if not settings.repo_cache_enabled:
+        return loader()
+    return _read_caches[name].get_or_load(key, loader)
+
+
+async def _acached(name: str, key: Any, loader) -> Any:
+    if not settings.repo_cache_enabled:
+        return await loader()
+    return await _read_caches[name].aget_or_load(key, loader)
+
+
+def repo_cache_stats() -> Dict[str, Any]:
+    return {name: cache.stats() for name, cache in _read_caches.items()}
+
+
+def invalidate_repo_cache(name: Optional[str] = None, key: Any = None) -> None:
+    """Drops one entry, one repository's cache, or (no arguments) every repository cache."""
+    caches = [_read_caches[name]] if name else _read_caches.values()
+    for cache in caches:
+        if key is None:
+            cache.clear()
+        else:
+            cache.invalidate(key)
+
+
 class TelematicsRepo:
     @staticmethod
     def get_latest_telematics(vehicle_id: str) -> Optional[Dict[str, Any]]:
-        return _request("GET", f"/telematics/{vehicle_id}")
+        return _cached("telematics", vehicle_id, lambda: _request("GET", f"/telematics/{vehicle_id}"))
+
+    @staticmethod
+    async def aget_latest_telematics(vehicle_id: str) -> Optional[Dict[str, Any]]:
+        return await _acached("telematics", vehicle_id, lambda: _arequest("GET", f"/telematics/{vehicle_id}"))
+
+    @staticmethod
+    def list_vehicles(fleet_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        params = {"fleet_id": fleet_id} if fleet_id else None
+        return _request("GET", "/telematics", params=params) or []
+
+    @staticmethod
+    async def alist_vehicles(fleet_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        params = {"fleet_id": fleet_id} if fleet_id else None
+        return await _arequest("GET", "/telematics", params=params) or []
 
 
 class MaintenanceRepo:
     @staticmethod
     def get_maintenance_history(vehicle_id: str, limit: int = 5) -> Optional[Dict[str, Any]]:
-        return _request("GET", f"/maintenance/{vehicle_id}", params={"limit": limit})
+        return _cached(
+            "maintenance",
+            (vehicle_id, limit),
+            lambda: _request("GET", f"/maintenance/{vehicle_id}", params={"limit": limit}),
+        )
+
+    @staticmethod
+    async def aget_maintenance_history(vehicle_id: str, limit: int = 5) -> Optional[Dict[str, Any]]:
+        return await _acached(
+            "maintenance",
+            (vehicle_id, limit),
+            lambda: _arequest("GET", f"/maintenance/{vehicle_id}", params={"limit": limit}),
+        )
 
 
 class VehicleRepo:
     @staticmethod
     def get_vehicle_details(vehicle_id: str) -> Optional[Dict[str, Any]]:
         # Vehicle metadata can be inferred from the telematics response
-        data = _request("GET", f"/telematics/{vehicle_id}")
+        data = TelematicsRepo.get_latest_telematics(vehicle_id)
+        return VehicleRepo.from_telematics(vehicle_id, data)
+
+    @staticmethod
+    def from_telematics(vehicle_id: str, data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Derives vehicle metadata from a telematics payload already in hand (no request)."""
         if not data:
             return None
         metadata = data.copy()
@@ -67,48 +317,88 @@ class VehicleRepo:
 class SchedulerRepo:
     @staticmethod
     def get_available_slots(center_id: str = "CENTER_001", date: Optional[str] = None) -> Dict[str, Any]:
-        from datetime import datetime
-        params = {"center_id": center_id}
-        # Always provide a date - use today if not specified
-        params["date"] = date or datetime.now().strftime("%Y-%m-%d")
-        return _request("GET", "/scheduler/slots", params=params)
+        params = SchedulerRepo._slot_params(center_id, date)
+        return _cached(
+            "slots", (params["center_id"], params["date"]), lambda: _request("GET", "/scheduler/slots", params=params)
+        )
+
+    @staticmethod
+    async def aget_available_slots(center_id: str = "CENTER_001", date: Optional[str] = None) -> Dict[str, Any]:
+        params = SchedulerRepo._slot_params(center_id, date)
+        return await _acached(
+            "slots", (params["center_id"], params["date"]), lambda: _arequest("GET", "/scheduler/slots", params=params)
+        )
 
     @staticmethod
     def book_appointment(vehicle_id: str, slot_id: str, center_id: str, customer_name: str) -> Dict[str, Any]:
-        payload = {
+        payload = SchedulerRepo._booking_payload(vehicle_id, slot_id, center_id, customer_name)
+        try:
+            return _request("POST", "/scheduler/book", json=payload)
+        finally:
+            SchedulerRepo._invalidate_slots()
+
+    @staticmethod
+    async def abook_appointment(vehicle_id: str, slot_id: str, center_id: str, customer_name: str) -> Dict[str, Any]:
+        payload = SchedulerRepo._booking_payload(vehicle_id, slot_id, center_id, customer_name)
+        try:
+            return await _arequest("POST", "/scheduler/book", json=payload)
+        finally:
+            SchedulerRepo._invalidate_slots()
+
+    @staticmethod
+    def _invalidate_slots() -> None:
+        # A booking (or a rejected one, e.g. slot already taken) means cached availability is out of date.
+        # Slots are keyed by the center they were requested for, which need not match the booked slot's
+        # center_id, so drop them all.
+        _read_caches["slots"].clear()
+
+    @staticmethod
+    def _slot_params(center_id: str, date: Optional[str]) -> Dict[str, str]:
+        # Always provide a date - use today if not specified
+        return {"center_id": center_id, "date": date or datetime.now().strftime("%Y-%m-%d")}
+
+    @staticmethod
+    def _booking_payload(vehicle_id: str, slot_id: str, center_id: str, customer_name: str) -> Dict[str, Any]:
+        return {
             "vehicle_id": vehicle_id,
             "slot_id": slot_id,
             "center_id": center_id,
             "customer_name": customer_name,
         }
-        return _request("POST", "/scheduler/book", json=payload)
 
 
 class NotificationRepo:
     @staticmethod
     def push_notification(vehicle_id: str, message: str, channel: str = "app", metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        payload = {
+        payload = NotificationRepo._payload(vehicle_id, message, channel, metadata)
+        return _request("POST", "/notifications/push", json=payload)
+
+    @staticmethod
+    async def apush_notification(vehicle_id: str, message: str, channel: str = "app", metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        payload = NotificationRepo._payload(vehicle_id, message, channel, metadata)
+        return await _arequest("POST", "/notifications/push", json=payload)
+
+    @staticmethod
+    def _payload(vehicle_id: str, message: str, channel: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
             "vehicle_id": vehicle_id,
             "message": message,
             "channel": channel,
             "metadata": metadata or {},
         }
-        return _request("POST", "/notifications/push", json=payload)
 
 
 class UebaRepo:
     @staticmethod
-    def log_event(agent_name: str, service_name: str, status: str, details: str = "") -> None:
-        if not settings.log_to_backend:
-            return
-        payload = {
+    def log_events(events: List[Dict[str, Any]]) -> None:
+        """Ships a batch of `payload` dicts in one request; raises so the caller can count failures."""
+        _request("POST", "/ueba/events/bulk", json={"events": events})
+
+    @staticmethod
+    def payload(agent_name: str, service_name: str, status: str, details: str = "") -> Dict[str, Any]:
+        return {
             "agent_name": agent_name,
             "service_name": service_name,
             "status": status,
             "details": details,
-        }
-        try:
-            _request("POST", "/ueba/event", json=payload)
-        except Exception as exc:  # noqa: BLE001
-            # Fallback to console log; avoid hard-failing the agent flow
-            print(f"⚠️ UEBA log failed: {exc}")
\ No newline at end of file
+        }
\ No newline at end of file
@@ -0,0 +1,444 @@
+"""
+Streaming telematics ingestion with incremental risk re-evaluation.
+
+Readings arrive as JSON objects, one per line, from a tailed file, a local TCP socket,
+or an in-process queue. Each reading carries a `vehicle_id` and any subset of the
+telematics fields (or a nested "telematics" object). They are merged into each
+vehicle's latest state, kept in memory. Readings whose temperature or oil pressure is
+not a number are dropped and counted as invalid.
+
+A vehicle is rescored with `calculate_risk_score` only when a field the score reads has
+changed. The agent graph is triggered only when the risk level escalates to
+STREAM_TRIGGER_MIN_LEVEL or above, so the LLM chain runs on changes instead of on a
+polling schedule. By default a trigger enqueues the vehicle on the durable flow queue
+(see app/agents/flow_queue.py), which runs the flow on its worker processes and skips
+vehicles that already have a flow queued or running.
+
+    python -m app.data.telematics_stream --file readings.ndjson
+    python -m app.data.telematics_stream --socket 127.0.0.1:7070
+    python -m app.data.telematics_stream --snapshot data_samples/collected_data.json --trigger log
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.domain.risk_rules import LEVELS, calculate_risk_score
+
+# The fields calculate_risk_score reads; changes to any other field don't rescore
+RISK_FIELDS = ("engine_temp_c", "oil_pressure_psi", "active_dtc_codes", "dtc_readable")
+# Compared against thresholds, so they must be numbers ("105" from a CSV-fed producer is fine)
+NUMERIC_FIELDS = ("engine_temp_c", "oil_pressure_psi")
+
+Transition = Dict[str, Any]
+
+
+def _rank(level: Optional[str]) -> int:
+    return LEVELS.index(level) if level in LEVELS else -1
+
+
+@dataclass
+class VehicleState:
+    vehicle_id: str
+    telematics: Dict[str, Any] = field(default_factory=dict)
+    timestamp: Any = None  # the latest reading's own timestamp, if it had one
+    updated_at: float = field(default_factory=time.time)
+    readings: int = 0
+    risk_key: Optional[Tuple] = None  # risk fields as last scored
+    score: Optional[int] = None
+    level: Optional[str] = None
+    reasons: List[str] = field(default_factory=list)
+    rescored: int = 0
+    triggered_level: Optional[str] = None
+    triggered_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "vehicle_id": self.vehicle_id,
+            "risk_score": self.score,
+            "risk_level": self.level,
+            "reasons": self.reasons,
+            "telematics": dict(self.telematics),
+            "readings": self.readings,
+            "rescored": self.rescored,
+            "updated_at": self.updated_at,
+            "triggered_level": self.triggered_level,
+            "triggered_at": self.triggered_at,
+        }
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value if math.isfinite(value) else None
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return None
+
+
+def _coerce(fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """`fields` with the numeric risk fields as numbers, or None if one of them isn't a number."""
+    for name in NUMERIC_FIELDS:
+        if name in fields:
+            number = _numeric(fields[name])
+            if number is None:
+                return None
+            fields[name] = number
+    return fields
+
+
+def _risk_key(telematics: Dict[str, Any]) -> Tuple:
+    return tuple(json.dumps(telematics.get(name), sort_keys=True, default=str) for name in RISK_FIELDS)
+
+
+class TelematicsMonitor:
+    """
+    Latest telematics per vehicle (LRU-bounded by STREAM_MAX_VEHICLES) and its risk level.
+    `ingest` is thread-safe; `on_transition` is called outside the lock.
+    """
+
+    def __init__(
+        self,
+        on_transition: Optional[Callable[[Transition], None]] = None,
+        min_level: Optional[str] = None,
+        cooldown_sec: Optional[float] = None,
+        max_vehicles: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.on_transition = on_transition
+        self.min_level = min_level or settings.stream_trigger_min_level
+        if self.min_level not in LEVELS:
+            raise ValueError(f"min_level must be one of {', '.join(LEVELS)}")
+        self.cooldown_sec = settings.stream_trigger_cooldown_sec if cooldown_sec is None else cooldown_sec
+        self.max_vehicles = max_vehicles or settings.stream_max_vehicles
+        self._lock = threading.Lock()
+        self._vehicles: "OrderedDict[str, VehicleState]" = OrderedDict()
+        self._stats = {"readings": 0, "invalid": 0, "stale": 0, "unchanged": 0, "rescored": 0,
+                       "transitions": 0, "triggered": 0, "suppressed": 0, "trigger_errors": 0}
+
+    def ingest(self, reading: Dict[str, Any]) -> Optional[Transition]:
+        """Merges one reading; returns the transition if it triggered the agent graph."""
+        vehicle_id = reading.get("vehicle_id") if isinstance(reading, dict) else None
+        fields = None
+        if vehicle_id:
+            fields = {key: value for key, value in reading.items() if key not in ("vehicle_id", "telematics", "timestamp")}
+            if isinstance(reading.get("telematics"), dict):
+                fields.update(reading["telematics"])
+            # Coerced before merging, so a bad value never reaches the vehicle's state
+            fields = _coerce(fields)
+        if fields is None:
+            self._count_invalid()
+            return None
+        timestamp = reading.get("timestamp")
+
+        with self._lock:
+            self._stats["readings"] += 1
+            state = self._vehicles.get(vehicle_id)
+            if state is None:
+                state = self._vehicles[vehicle_id] = VehicleState(vehicle_id)
+                while len(self._vehicles) > self.max_vehicles:
+                    self._vehicles.popitem(last=False)
+            else:
+                self._vehicles.move_to_end(vehicle_id)
+            if _older(timestamp, state.timestamp):
+                # Out-of-order delivery: a newer reading was already applied
+                self._stats["stale"] += 1
+                return None
+            state.telematics.update(fields)
+            state.timestamp = timestamp if timestamp is not None else state.timestamp
+            state.updated_at = time.time()
+            state.readings += 1
+
+            key = _risk_key(state.telematics)
+            if key == state.risk_key:
+                self._stats["unchanged"] += 1
+                return None
+            risk = calculate_risk_score(state.telematics)
+            state.risk_key = key
+            state.rescored += 1
+            self._stats["rescored"] += 1
+            previous, state.score, state.level, state.reasons = state.level, risk["score"], risk["level"], risk["reasons"]
+            if state.level == previous:
+                return None
+            self._stats["transitions"] += 1
+            transition = self._escalation(state, previous)
+            if transition is None:
+                return None
+            state.triggered_level, state.triggered_at = state.level, state.updated_at
+            self._stats["triggered"] += 1
+
+        if self.on_transition is not None:
+            try:
+                self.on_transition(transition)
+            except Exception as exc:  # noqa: BLE001
+                with self._lock:
+                    self._stats["trigger_errors"] += 1
+                print(f"⚠️ [Telematics] Could not trigger the agent flow for {vehicle_id}: {exc}")
+        return transition
+
+    def _count_invalid(self) -> None:
+        with self._lock:
+            self._stats["invalid"] += 1
+
+    def _escalation(self, state: VehicleState, previous: Optional[str]) -> Optional[Transition]:
+        """The transition to act on, if the level rose into the trigger range; call with the lock held."""
+        if _rank(state.level) < _rank(self.min_level) or _rank(state.level) <= _rank(previous):
+            return None
+        recently = state.triggered_at is not None and state.updated_at - state.triggered_at < self.cooldown_sec
+        if recently and _rank(state.level) <= _rank(state.triggered_level):
+            # Flapping around a threshold: the flow for this level ran moments ago
+            self._stats["suppressed"] += 1
+            return None
+        return {
+            "vehicle_id": state.vehicle_id,
+            "from_level": previous,
+            "to_level": state.level,
+            "risk_score": state.score,
+            "reasons": list(state.reasons),
+            "at": state.updated_at,
+        }
+
+    def get(self, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._vehicles.get(vehicle_id)
+            return state.summary() if state else None
+
+    def vehicles(self, min_level: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                state.summary() for state in self._vehicles.values()
+                if min_level is None or _rank(state.level) >= _rank(min_level)
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            levels = {level: 0 for level in LEVELS}
+            for state in self._vehicles.values():
+                if state.level in levels:
+                    levels[state.level] += 1
+            return {**self._stats, "vehicles": len(self._vehicles), "levels": levels,
+                    "min_level": self.min_level, "cooldown_sec": self.cooldown_sec}
+
+    def consume(self, readings: "queue.Queue", stop: threading.Event, poll_interval: float = 0.5) -> None:
+        """Ingests from `readings` until `stop` is set and the queue is empty."""
+        while True:
+            try:
+                reading = readings.get(timeout=poll_interval)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            try:
+                self.ingest(reading)
+            except Exception as exc:  # noqa: BLE001
+                # One bad reading must not stop the monitor; the sources would then block on a full queue
+                self._count_invalid()
+                print(f"⚠️ [Telematics] Dropped a reading that could not be ingested: {exc}")
+
+
+def _older(timestamp: Any, latest: Any) -> bool:
+    if timestamp is None or latest is None or type(timestamp) is not type(latest):
+        return False
+    return timestamp < latest
+
+
+# --- Sources: each parses JSON lines and puts the readings on a queue ---
+
+def _parse(line: str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        reading = json.loads(line)
+    except ValueError:
+        print(f"⚠️ [Telematics] Skipping a line that is not JSON: {line[:80]}")
+        return None
+    return reading if isinstance(reading, dict) else None
+
+
+def tail_file(path: str, readings: "queue.Queue", stop: threading.Event,
+              from_start: bool = False, poll_interval: float = 0.5) -> None:
+    """Follows `path` like `tail -F`: waits for it to appear, and reopens it after rotation or truncation."""
+    handle, inode = None, None
+    try:
+        while not stop.is_set():
+            if handle is None:
+                try:
+                    handle = open(path, "r")
+                except FileNotFoundError:
+                    # Created after we started, so all of it is new
+                    from_start = True
+                    stop.wait(poll_interval)
+                    continue
+                inode = os.fstat(handle.fileno()).st_ino
+                if not from_start:
+                    handle.seek(0, os.SEEK_END)
+                # After a rotation, the new file is read from its start
+                from_start = True
+            position = handle.tell()
+            line = handle.readline()
+            if line.endswith("\n"):
+                reading = _parse(line)
+                if reading is not None:
+                    readings.put(reading)
+                continue
+            # Partial line: the writer hasn't finished it; read it again once it has
+            handle.seek(position)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != inode or current.st_size < position:
+                handle.close()
+                handle = None
+                continue
+            stop.wait(poll_interval)
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+class SocketSource:
+    """Local TCP server; producers connect and write one JSON reading per line."""
+
+    def __init__(self, host: str, port: int, readings: "queue.Queue"):
+        outer = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for raw in self.rfile:
+                    reading = _parse(raw.decode("utf-8", errors="replace"))
+                    if reading is not None:
+                        readings.put(reading)
+                    if outer._closing:
+                        return
+
+        self._closing = False
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self) -> "SocketSource":
+        threading.Thread(target=self._server.serve_forever, name="telematics-socket", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._closing = True
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def snapshot_readings(data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Readings from a collected snapshot (see app/data/loaders.py), one per vehicle."""
+    for vehicle_id, vehicle in (data.get("vehicles") or {}).items():
+        yield {"vehicle_id": vehicle_id, "timestamp": data.get("timestamp_utc"), **(vehicle.get("telematics") or {})}
+
+
+# --- Triggers ---
+
+def enqueue_flow(transition: Transition) -> None:
+    """Default trigger: queue the agent flow; a vehicle with a flow already queued or running is skipped."""
+    from app.agents.flow_queue import get_flow_queue
+
+    job, deduplicated = get_flow_queue().enqueue(transition["vehicle_id"])
+    note = "already queued" if deduplicated else "queued"
+    print(f"🚨 [Telematics] {transition['vehicle_id']}: {transition['from_level'] or 'new'} -> "
+          f"{transition['to_level']} ({transition['risk_score']}); flow {note} as job {job.job_id}")
+
+
+def log_transition(transition: Transition) -> None:
+    print(f"🚨 [Telematics] {transition['vehicle_id']}: {transition['from_level'] or 'new'} -> "
+          f"{transition['to_level']} ({transition['risk_score']}): {'; '.join(transition['reasons'])}")
+
+
+TRIGGERS = {"queue": enqueue_flow, "log": log_transition}
+
+
+# --- CLI ---
+
+def parse_args(argv=None) -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Ingest streaming telematics and trigger agent flows on risk changes.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="JSON-lines file to follow")
+    source.add_argument("--socket", metavar="HOST:PORT", help="listen for JSON lines on a local TCP socket")
+    source.add_argument("--snapshot", metavar="PATH", help="ingest a collected snapshot once, then exit")
+    parser.add_argument("--from-start", action="store_true", help="read the file from its start, not its end")
+    parser.add_argument("--trigger", choices=sorted(TRIGGERS), default="queue", help="what a transition does")
+    parser.add_argument("--min-level", choices=LEVELS, default=settings.stream_trigger_min_level)
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="seconds between stats lines (0: off)")
+    return parser.parse_args(argv)
+
+
+def _snapshot(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path) as f:
+        return list(snapshot_readings(json.load(f)))
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    monitor = TelematicsMonitor(on_transition=TRIGGERS[args.trigger], min_level=args.min_level)
+    if args.snapshot:
+        for reading in _snapshot(args.snapshot):
+            monitor.ingest(reading)
+        print(json.dumps(monitor.stats(), indent=2))
+        return 0
+
+    # Bounded: when the monitor falls behind, the sources block instead of buffering without limit
+    readings: "queue.Queue" = queue.Queue(maxsize=get_settings().stream_queue_size)
+    stop = threading.Event()
+    signals: List[int] = []
+    # Only note it here; the loop below sets `stop`
+    signal.signal(signal.SIGINT, lambda signum, frame: signals.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(signum))
+
+    socket_source = None
+    if args.file:
+        threading.Thread(
+            target=tail_file, args=(args.file, readings, stop, args.from_start), name="telematics-tail", daemon=True
+        ).start()
+        print(f"📡 [Telematics] Following {args.file}")
+    else:
+        host, _, port = args.socket.rpartition(":")
+        socket_source = SocketSource(host or "127.0.0.1", int(port), readings).start()
+        print(f"📡 [Telematics] Listening on {':'.join(map(str, socket_source.address))}")
+
+    consumer = threading.Thread(target=monitor.consume, args=(readings, stop), name="telematics-monitor", daemon=True)
+    consumer.start()
+    next_stats = time.monotonic() + args.stats_interval
+    try:
+        while not signals:
+            time.sleep(0.2)
+            if args.stats_interval and time.monotonic() >= next_stats:
+                print(f"📊 [Telematics] {json.dumps(monitor.stats())}")
+                next_stats += args.stats_interval
+    finally:
+        stop.set()
+        if socket_source is not None:
+            socket_source.stop()
+        consumer.join()
+    print(f"🛑 [Telematics] Stopped: {json.dumps(monitor.stats())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
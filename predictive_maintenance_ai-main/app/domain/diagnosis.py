@@ -0,0 +1,67 @@
+# app/domain/diagnosis.py
+
+import json
+import re
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+PRIORITIES = ("Low", "Medium", "High", "Critical")
+
+# Shown to the LLM; keep in step with the Diagnosis model below
+SCHEMA_PROMPT = """Respond with a single JSON object and nothing else:
+{"report": "<1-2 sentences: what is failing and why>",
+ "action": "<the specific repair, under 15 words>",
+ "priority": "Low" | "Medium" | "High" | "Critical",
+ "component": "<failing part, 1-3 words>",
+ "confidence": <0.0-1.0>}"""
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_LEGACY_FIELD = re.compile(r"^\s*(Report|Action|Priority)\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+
+
+class Diagnosis(BaseModel):
+    """Structured diagnosis; downstream prompts use these compact fields instead of the raw completion."""
+
+    report: str = Field(min_length=1)
+    action: str = Field(min_length=1)
+    priority: Literal["Low", "Medium", "High", "Critical"]
+    component: str = "Unknown"
+    confidence: float = Field(default=0.5, ge=0.0, le=1.0)
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _normalize_priority(cls, value):
+        # "CRITICAL", " high " -> "Critical", "High"
+        return value.strip().capitalize() if isinstance(value, str) else value
+
+    @field_validator("report", "action", "component", mode="before")
+    @classmethod
+    def _collapse_whitespace(cls, value):
+        return " ".join(value.split()) if isinstance(value, str) else value
+
+
+def parse_diagnosis(content: str) -> Diagnosis:
+    """
+    Validates an LLM completion against the schema. Tolerates code fences and text around
+    the JSON object; raises ValueError (with the validation errors) otherwise.
+    """
+    match = _JSON_OBJECT.search(content or "")
+    if not match:
+        raise ValueError("no JSON object in the response")
+    try:
+        return Diagnosis.model_validate(json.loads(match.group(0)))
+    except (json.JSONDecodeError, ValidationError) as exc:
+        raise ValueError(str(exc)) from exc
+
+
+def legacy_diagnosis(content: str) -> Optional[Diagnosis]:
+    """Reads the old 'Report: / Action: / Priority:' text format, None if it isn't there."""
+    fields = {name.lower(): value.strip(" []") for name, value in _LEGACY_FIELD.findall(content or "")}
+    if "report" not in fields or "action" not in fields:
+        return None
+    priority = next((p for p in reversed(PRIORITIES) if p.lower() in fields.get("priority", "").lower()), "Medium")
+    try:
+        return Diagnosis(report=fields["report"], action=fields["action"], priority=priority, confidence=0.3)
+    except ValidationError:
+        return None
@@ -0,0 +1,193 @@
+# app/domain/fleet_risk.py
+"""
+Columnar fleet risk scoring: the same rules as `calculate_risk_score`, applied to
+N vehicles in one NumPy pass. Used to pre-screen a fleet so that only vehicles at
+or above a given level enter the LLM agent graph.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.domain.risk_rules import (
+    LEVEL_THRESHOLDS,
+    LEVELS,
+    MAX_SCORE,
+    OIL_CRITICAL_PSI,
+    OIL_LOW_PSI,
+    TEMP_CRITICAL_C,
+    TEMP_HIGH_C,
+    WEIGHT_DTC,
+    WEIGHT_OIL_CRITICAL,
+    WEIGHT_OIL_LOW,
+    WEIGHT_TEMP_CRITICAL,
+    WEIGHT_TEMP_HIGH,
+)
+
+# Reason codes (bit flags), in the order the scalar function appends reasons
+REASON_CRITICAL_TEMP = 1 << 0
+REASON_HIGH_TEMP = 1 << 1
+REASON_CRITICAL_OIL = 1 << 2
+REASON_LOW_OIL = 1 << 3
+REASON_DTC = 1 << 4
+
+_LEVEL_NAMES = np.array(LEVELS)
+_LEVEL_MINIMUMS = np.array(sorted(minimum for _, minimum in LEVEL_THRESHOLDS))
+
+
+@dataclass
+class FleetRiskScores:
+    scores: np.ndarray        # int, 0-100
+    level_codes: np.ndarray   # int index into LEVELS
+    reason_codes: np.ndarray  # uint8 bit flags (REASON_*)
+    engine_temp_c: np.ndarray     # readings as given, used to render reasons
+    oil_pressure_psi: np.ndarray
+    dtc_count: np.ndarray
+    vehicle_ids: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @property
+    def levels(self) -> np.ndarray:
+        return _LEVEL_NAMES[self.level_codes]
+
+    def at_least(self, level: str) -> np.ndarray:
+        """Boolean mask of vehicles whose level is `level` or worse."""
+        return self.level_codes >= LEVELS.index(level)
+
+    def reasons(self, index: int) -> List[str]:
+        """Human-readable reasons for one vehicle, identical to `calculate_risk_score`."""
+        code = int(self.reason_codes[index])
+        temp = _as_python(self.engine_temp_c[index])
+        pressure = _as_python(self.oil_pressure_psi[index])
+        reasons = []
+        if code & REASON_CRITICAL_TEMP:
+            reasons.append(f"Critical Overheating ({temp}°C)")
+        elif code & REASON_HIGH_TEMP:
+            reasons.append(f"High Temperature ({temp}°C)")
+        if code & REASON_CRITICAL_OIL:
+            reasons.append(f"Critical Low Oil Pressure ({pressure} psi)")
+        elif code & REASON_LOW_OIL:
+            reasons.append(f"Low Oil Pressure ({pressure} psi)")
+        if code & REASON_DTC:
+            reasons.append(f"Active Fault Codes Detected: {int(self.dtc_count[index])}")
+        return reasons
+
+    def result(self, index: int) -> Dict[str, Any]:
+        """Same shape as `calculate_risk_score` for one vehicle."""
+        return {
+            "score": int(self.scores[index]),
+            "level": LEVELS[int(self.level_codes[index])],
+            "reasons": self.reasons(index),
+        }
+
+
+def _as_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _fill(values: np.ndarray, default: float) -> np.ndarray:
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), default, values)
+    return values
+
+
+def score_fleet(
+    engine_temp_c: Sequence[float],
+    oil_pressure_psi: Sequence[float],
+    dtc_count: Sequence[int],
+    vehicle_ids: Optional[Sequence[str]] = None,
+) -> FleetRiskScores:
+    """
+    Scores N vehicles at once. Missing readings (NaN) fall back to the same
+    defaults as the scalar function: 0 °C and 100 psi.
+    """
+    temp = _fill(np.asarray(engine_temp_c), 0)
+    pressure = _fill(np.asarray(oil_pressure_psi), 100)
+    return _score(temp, pressure, np.asarray(dtc_count, dtype=np.int64), temp, pressure, vehicle_ids)
+
+
+def _score(
+    temp: np.ndarray,
+    pressure: np.ndarray,
+    dtc: np.ndarray,
+    display_temp: np.ndarray,
+    display_pressure: np.ndarray,
+    vehicle_ids: Optional[Sequence[str]],
+) -> FleetRiskScores:
+    critical_temp = temp > TEMP_CRITICAL_C
+    high_temp = ~critical_temp & (temp > TEMP_HIGH_C)
+    critical_oil = pressure < OIL_CRITICAL_PSI
+    low_oil = ~critical_oil & (pressure < OIL_LOW_PSI)
+    has_dtc = dtc > 0
+
+    scores = (
+        critical_temp * WEIGHT_TEMP_CRITICAL
+        + high_temp * WEIGHT_TEMP_HIGH
+        + critical_oil * WEIGHT_OIL_CRITICAL
+        + low_oil * WEIGHT_OIL_LOW
+        + has_dtc * WEIGHT_DTC
+    )
+    scores = np.minimum(scores, MAX_SCORE).astype(np.int64)
+
+    reason_codes = (
+        critical_temp * REASON_CRITICAL_TEMP
+        | high_temp * REASON_HIGH_TEMP
+        | critical_oil * REASON_CRITICAL_OIL
+        | low_oil * REASON_LOW_OIL
+        | has_dtc * REASON_DTC
+    ).astype(np.uint8)
+
+    return FleetRiskScores(
+        scores=scores,
+        level_codes=np.searchsorted(_LEVEL_MINIMUMS, scores, side="right"),
+        reason_codes=reason_codes,
+        engine_temp_c=display_temp,
+        oil_pressure_psi=display_pressure,
+        dtc_count=dtc,
+        vehicle_ids=None if vehicle_ids is None else np.asarray(vehicle_ids),
+    )
+
+
+def _dtc_len(record: Dict[str, Any]) -> int:
+    codes = record.get("active_dtc_codes", [])
+    if not codes:
+        codes = record.get("dtc_readable", [])
+    return len(codes) if codes else 0
+
+
+def score_records(records: Iterable[Dict[str, Any]]) -> FleetRiskScores:
+    """Scores telematics dicts (same keys as `calculate_risk_score`) in one pass."""
+    records = list(records)
+    raw_temp = [r.get("engine_temp_c", 0) for r in records]
+    raw_pressure = [r.get("oil_pressure_psi", 100) for r in records]
+    # Score on floats, but keep the raw readings so reasons print exactly like the scalar rules
+    temp = _fill(np.array(raw_temp, dtype=np.float64), 0)
+    pressure = _fill(np.array(raw_pressure, dtype=np.float64), 100)
+    return _score(
+        temp,
+        pressure,
+        np.fromiter((_dtc_len(r) for r in records), dtype=np.int64, count=len(records)),
+        np.array(raw_temp, dtype=object),
+        np.array(raw_pressure, dtype=object),
+        [r.get("vehicle_id") for r in records],
+    )
+
+
+def score_frame(frame) -> FleetRiskScores:
+    """
+    Scores a DataFrame with `engine_temp_c`, `oil_pressure_psi` and either a
+    `dtc_count` column or an `active_dtc_codes` list column.
+    """
+    if "dtc_count" in frame:
+        dtc = frame["dtc_count"].to_numpy()
+    else:
+        dtc = np.fromiter((len(c) if c else 0 for c in frame["active_dtc_codes"]), dtype=np.int64, count=len(frame))
+    return score_fleet(
+        frame["engine_temp_c"].to_numpy(),
+        frame["oil_pressure_psi"].to_numpy(),
+        dtc,
+        vehicle_ids=frame["vehicle_id"].to_numpy() if "vehicle_id" in frame else None,
+    )
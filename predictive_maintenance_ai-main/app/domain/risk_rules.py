@@ -1,5 +1,31 @@
 # app/domain/risk_rules.py
 
+# Thresholds and weights (shared with the vectorized scorer in fleet_risk.py)
+TEMP_CRITICAL_C = 110
+TEMP_HIGH_C = 100
+OIL_CRITICAL_PSI = 20
+OIL_LOW_PSI = 30
+
+WEIGHT_TEMP_CRITICAL = 40
+WEIGHT_TEMP_HIGH = 20
+WEIGHT_OIL_CRITICAL = 50
+WEIGHT_OIL_LOW = 25
+WEIGHT_DTC = 30
+
+MAX_SCORE = 100
+
+# Minimum score for each level, highest first
+LEVEL_THRESHOLDS = (("CRITICAL", 75), ("HIGH", 40), ("MEDIUM", 20))
+LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+
+def level_for_score(score: int) -> str:
+    for level, minimum in LEVEL_THRESHOLDS:
+        if score >= minimum:
+            return level
+    return "LOW"
+
+
 def calculate_risk_score(telematics_data: dict) -> dict:
     """
     Analyzes telematics data and returns a risk score (0-100) and level.
@@ -10,21 +36,21 @@ def calculate_risk_score(telematics_data: dict) -> dict:
     # 1. Check Engine Temperature (Key: engine_temp_c)
     # Threshold: > 105C is bad
     temp = telematics_data.get("engine_temp_c", 0)
-    if temp > 110:
-        score += 40
+    if temp > TEMP_CRITICAL_C:
+        score += WEIGHT_TEMP_CRITICAL
         reasons.append(f"Critical Overheating ({temp}°C)")
-    elif temp > 100:
-        score += 20
+    elif temp > TEMP_HIGH_C:
+        score += WEIGHT_TEMP_HIGH
         reasons.append(f"High Temperature ({temp}°C)")
 
     # 2. Check Oil Pressure (Key: oil_pressure_psi)
     # Threshold: < 30 psi is dangerous
     pressure = telematics_data.get("oil_pressure_psi", 100)
-    if pressure < 20:
-        score += 50
+    if pressure < OIL_CRITICAL_PSI:
+        score += WEIGHT_OIL_CRITICAL
         reasons.append(f"Critical Low Oil Pressure ({pressure} psi)")
-    elif pressure < 30:
-        score += 25
+    elif pressure < OIL_LOW_PSI:
+        score += WEIGHT_OIL_LOW
         reasons.append(f"Low Oil Pressure ({pressure} psi)")
 
     # 3. Check DTC Codes (Key: active_dtc_codes)
@@ -34,24 +60,17 @@ def calculate_risk_score(telematics_data: dict) -> dict:
         dtc_codes = telematics_data.get("dtc_readable", [])
 
     if dtc_codes:
-        score += 30
+        score += WEIGHT_DTC
         reasons.append(f"Active Fault Codes Detected: {len(dtc_codes)}")
 
     # Cap score at 100
-    score = min(score, 100)
+    score = min(score, MAX_SCORE)
 
     # Determine Risk Level
-    if score >= 75:
-        level = "CRITICAL"
-    elif score >= 40:
-        level = "HIGH"
-    elif score >= 20:
-        level = "MEDIUM"
-    else:
-        level = "LOW"
+    level = level_for_score(score)
 
     return {
         "score": score,
         "level": level,
         "reasons": reasons
-    }
\ No newline at end of file
+    }
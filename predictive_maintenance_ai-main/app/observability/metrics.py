@@ -0,0 +1,236 @@
+"""Process-wide metrics and the per-flow timing they also feed, shared by every layer.
+
+Histograms and counters render in the Prometheus text format. The flow trace and the
+running node live in context variables, set by the agent graph (see agents/tracing.py),
+so backend, LLM and UEBA calls record their time against the node that made them
+without depending on the agent layer. Calls made outside a flow still feed the
+process-wide histograms, under node="none".
+"""
+
+import bisect
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# Seconds; covers cache hits (~ms) up to slow LLM completions
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Per-node breakdown fields; *_ms are durations, the rest are counts
+TIMED = ("llm_ms", "backend_ms", "ueba_ms")
+COUNTED = ("llm_calls", "backend_calls", "retries", "request_bytes", "response_bytes")
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # label values -> bucket counts + [sum, count]
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            base = ",".join(f'{name}="{value}"' for name, value in zip(self.labels, label_values))
+            prefix = f"{base}," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+    def drain(self) -> Dict[Tuple[str, ...], List[float]]:
+        """Takes the observations so far and starts over (for shipping to another process)."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: Dict[Tuple[str, ...], List[float]]) -> None:
+        with self._lock:
+            for label_values, values in series.items():
+                mine = self._series.get(label_values)
+                if mine is None:
+                    self._series[label_values] = list(values)
+                else:
+                    for index, value in enumerate(values):
+                        mine[index] += value
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            base = ",".join(f'{name}="{v}"' for name, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{base}}} {value:g}" if base else f"{self.name} {value:g}")
+        return lines
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            for label_values, value in values.items():
+                self._values[label_values] = self._values.get(label_values, 0) + value
+
+
+FLOW_SECONDS = Histogram("agent_flow_duration_seconds", "End-to-end agent flow time", ("outcome",))
+NODE_SECONDS = Histogram("agent_node_duration_seconds", "Wall time per graph node", ("node",))
+LLM_SECONDS = Histogram("agent_llm_duration_seconds", "LLM call time (excluding queueing)", ("node",))
+BACKEND_SECONDS = Histogram(
+    "agent_backend_request_duration_seconds", "Backend HTTP time incl. retries", ("node", "method", "route")
+)
+UEBA_SECONDS = Histogram(
+    "agent_ueba_overhead_seconds", "Policy check and audit enqueue time per secured call", ("node",)
+)
+RETRIES = Counter("agent_backend_retries_total", "Backend HTTP retries", ("node",))
+PAYLOAD_BYTES = Counter("agent_backend_payload_bytes_total", "Backend HTTP payload bytes", ("node", "direction"))
+
+METRICS = (FLOW_SECONDS, NODE_SECONDS, LLM_SECONDS, BACKEND_SECONDS, UEBA_SECONDS, RETRIES, PAYLOAD_BYTES)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def drain_metrics() -> Dict[str, Any]:
+    """This process's metrics since the last drain, keyed by metric name; see merge_metrics."""
+    return {metric.name: metric.drain() for metric in METRICS}
+
+
+def merge_metrics(snapshot: Dict[str, Any]) -> None:
+    """Adds metrics drained in another process (fleet pool workers) to this process's."""
+    by_name = {metric.name: metric for metric in METRICS}
+    for name, series in snapshot.items():
+        if name in by_name:
+            by_name[name].merge(series)
+
+
+class FlowTrace:
+    """Timing breakdown of one flow; parallel branches write to it concurrently."""
+
+    def __init__(self, vehicle_id: str, flow_id: Optional[str] = None):
+        self.flow_id = flow_id or uuid.uuid4().hex
+        self.vehicle_id = vehicle_id
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, node: str) -> Dict[str, float]:
+        entry = self._nodes.get(node)
+        if entry is None:
+            entry = self._nodes[node] = {"wall_ms": 0.0, **{f: 0.0 for f in TIMED}, **{f: 0 for f in COUNTED}}
+        return entry
+
+    def add(self, node: str, field: str, amount: float) -> None:
+        with self._lock:
+            self._entry(node)[field] += amount
+
+    def breakdown(self) -> Dict[str, Any]:
+        end = self.finished or time.perf_counter()
+        with self._lock:
+            nodes = {
+                node: {field: round(value, 2) if isinstance(value, float) else value for field, value in entry.items()}
+                for node, entry in self._nodes.items()
+            }
+        totals: Dict[str, float] = {}
+        for entry in nodes.values():
+            for field, value in entry.items():
+                if field != "wall_ms":
+                    totals[field] = round(totals.get(field, 0) + value, 2)
+        return {
+            "flow_id": self.flow_id,
+            "vehicle_id": self.vehicle_id,
+            "total_ms": round((end - self.started) * 1000, 2),
+            "nodes": nodes,
+            "totals": totals,
+        }
+
+
+# Set by the agent graph's flow and node spans (app/agents/tracing.py)
+flow_trace: ContextVar[Optional[FlowTrace]] = ContextVar("agent_flow_trace", default=None)
+running_node: ContextVar[str] = ContextVar("agent_node", default="none")
+
+
+def current_flow() -> Optional[FlowTrace]:
+    return flow_trace.get()
+
+
+def current_node() -> str:
+    return running_node.get()
+
+
+def _add(field: str, amount: float) -> None:
+    trace = flow_trace.get()
+    if trace is not None:
+        trace.add(running_node.get(), field, amount)
+
+
+def record_llm(elapsed: float) -> None:
+    node = running_node.get()
+    LLM_SECONDS.observe(elapsed, node)
+    _add("llm_ms", elapsed * 1000)
+    _add("llm_calls", 1)
+
+
+def record_backend(
+    method: str, path: str, elapsed: float, retries: int = 0, request_bytes: int = 0, response_bytes: int = 0
+) -> None:
+    node = running_node.get()
+    # First path segment only ("/telematics/V-101" -> "/telematics"), so vehicle ids don't become labels
+    route = "/" + path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+    BACKEND_SECONDS.observe(elapsed, node, method, route)
+    if retries:
+        RETRIES.inc(retries, node)
+    PAYLOAD_BYTES.inc(request_bytes, node, "sent")
+    PAYLOAD_BYTES.inc(response_bytes, node, "received")
+    _add("backend_ms", elapsed * 1000)
+    _add("backend_calls", 1)
+    _add("retries", retries)
+    _add("request_bytes", request_bytes)
+    _add("response_bytes", response_bytes)
+
+
+def record_ueba(elapsed: float) -> None:
+    UEBA_SECONDS.observe(elapsed, running_node.get())
+    _add("ueba_ms", elapsed * 1000)
@@ -1,17 +1,30 @@
-from app.ueba.policies import check_permission
-from app.ueba.storage import log_event
+import inspect
+import time
+
+from app.observability.metrics import record_ueba
+from app.ueba.policies import DENIED, evaluate
+from app.ueba.storage import alog_event, log_event
+
+def _blocked(agent_name: str, service_name: str, reason: str) -> PermissionError:
+    if reason == DENIED:
+        return PermissionError(f"Security Alert: {agent_name} is not authorized to use {service_name}")
+    return PermissionError(f"Security Alert: {agent_name} blocked from {service_name} ({reason})")
+
 
 def secure_call(agent_name: str, service_name: str, func, *args, **kwargs):
     """
     The Gatekeeper. 
-    1. Checks if Agent is allowed to use Service.
+    1. Checks if Agent is allowed to use Service (permission, rate limit, risk limit).
     2. Logs the attempt.
     3. Executes function if allowed.
     """
     # 1. Check Policy
-    if check_permission(agent_name, service_name):
+    started = time.perf_counter()
+    reason = evaluate(agent_name, service_name)
+    if reason is None:
         # 2. Log Success
         log_event(agent_name, service_name, "ALLOWED")
+        record_ueba(time.perf_counter() - started)
         
         # 3. Execute the actual function
         try:
@@ -21,5 +34,29 @@ def secure_call(agent_name: str, service_name: str, func, *args, **kwargs):
             raise e
     else:
         # Blocked!
-        log_event(agent_name, service_name, "BLOCKED", "Permission Denied")
-        raise PermissionError(f"Security Alert: {agent_name} is not authorized to use {service_name}")
\ No newline at end of file
+        log_event(agent_name, service_name, "BLOCKED", reason)
+        raise _blocked(agent_name, service_name, reason)
+
+
+async def asecure_call(agent_name: str, service_name: str, func, *args, **kwargs):
+    """
+    Async Gatekeeper: same policy and audit trail as `secure_call`, but awaits `func`.
+    Plain functions (e.g. deriving data already fetched) are accepted too.
+    """
+    started = time.perf_counter()
+    reason = evaluate(agent_name, service_name)
+    if reason is None:
+        await alog_event(agent_name, service_name, "ALLOWED")
+        record_ueba(time.perf_counter() - started)
+
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except Exception as e:
+            await alog_event(agent_name, service_name, "ERROR", str(e))
+            raise e
+    else:
+        await alog_event(agent_name, service_name, "BLOCKED", reason)
+        raise _blocked(agent_name, service_name, reason)
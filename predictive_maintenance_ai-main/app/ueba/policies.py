@@ -1,3 +1,12 @@
+import math
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.domain.risk_rules import LEVELS, level_for_score
+from app.observability.metrics import current_flow
+
 ACCESS_CONTROL_MATRIX = {
     "DataAnalysis": {
         "allowed_services": ["TelematicsRepo", "VehicleRepo", "MaintenanceRepo"],
@@ -25,9 +34,216 @@ ACCESS_CONTROL_MATRIX = {
     },
 }
 
+# Optional per-agent key: "max_calls_per_sec" (defaults to UEBA_RATE_LIMIT_PER_SEC, 0 disables).
+# Rates and suspicion are tracked per agent *per flow*, so a fleet of concurrent flows neither
+# shares one rate budget nor reads as interleaved, novel transitions.
+
+settings = get_settings()
+
+# Suspicion added per event; it decays with UEBA_ANOMALY_HALF_LIFE_SEC and maps onto the
+# LOW/MEDIUM/HIGH/CRITICAL scale, which is checked against each agent's risk_limit.
+WEIGHT_DENIED = 15
+WEIGHT_RATE_LIMITED = 20
+WEIGHT_NOVEL_TRANSITION = 10
+NOVELTY_RATIO = 0.01  # a transition taken in < 1% of the calls from the same point of a flow counts as novel
+MAX_STEP = 16  # calls further into a flow share one position
+
+DENIED = "Permission Denied"
+RATE_LIMITED = "Rate limit exceeded"
+RISK_LIMITED = "Risk limit exceeded"
+
+
+class AgentBehaviour:
+    """
+    O(1) streaming counters for one agent within one flow (or outside any flow): a two-bucket
+    sliding-window rate, how far into the flow it is (step, last service called) and an
+    exponentially decaying suspicion score.
+    Updated without a lock; under the GIL concurrent callers can at worst lose an
+    increment, which is fine for behavioural scoring.
+    """
+
+    __slots__ = (
+        "window_start", "current", "previous", "step", "last_service",
+        "denied", "suspicion", "suspicion_at", "rate_limit", "risk_limit",
+    )
+
+    def __init__(self, now: float, rate_limit: float, risk_limit: int):
+        self.rate_limit = rate_limit
+        self.risk_limit = risk_limit
+        self.window_start = now
+        self.current = 0
+        self.previous = 0
+        self.step = 0
+        self.last_service: Optional[str] = None
+        self.denied = 0
+        self.suspicion = 0.0
+        self.suspicion_at = now
+
+    def rate(self, now: float) -> float:
+        """Calls in the last second, weighting the previous bucket by how much of it still overlaps."""
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            self.previous = self.current if elapsed < 2.0 else 0
+            self.current = 0
+            self.window_start = now - (elapsed % 1.0)
+            elapsed = now - self.window_start
+        return self.previous * (1.0 - elapsed) + self.current
+
+    def score(self, now: float) -> float:
+        if self.suspicion:
+            decay = math.pow(0.5, (now - self.suspicion_at) / settings.ueba_anomaly_half_life_sec)
+            self.suspicion = self.suspicion * decay if self.suspicion * decay >= 0.5 else 0.0
+            self.suspicion_at = now
+        return self.suspicion
+
+    def flag(self, weight: float, now: float) -> None:
+        self.suspicion = self.score(now) + weight
+        self.suspicion_at = now
+
+
+class AgentProfile:
+    """
+    What is normal for an agent, learned across all its flows: how often each service follows
+    each point of a flow (step, last service). Keying on the point rather than the last service
+    alone means a burst of flows in lockstep never sees a later step before an earlier one.
+    """
+
+    __slots__ = ("transitions", "outgoing", "observed", "denied")
+
+    def __init__(self):
+        self.transitions: Dict[Tuple[int, Optional[str], str], int] = {}
+        # Calls from each point; novelty is only judged once that point has a history
+        self.outgoing: Dict[Tuple[int, Optional[str]], int] = {}
+        self.observed = 0  # allowed calls
+        self.denied = 0
+
+
+class PolicyEngine:
+    """
+    ACCESS_CONTROL_MATRIX compiled into set lookups, plus behavioural state: a profile per
+    agent and an AgentBehaviour per (agent, flow). The flow comes from the running flow
+    trace; the oldest flows' state is dropped beyond UEBA_MAX_TRACKED_FLOWS.
+    """
+
+    def __init__(self, matrix: Dict[str, Dict[str, Any]]):
+        self.matrix = matrix
+        self.allowed: FrozenSet[Tuple[str, str]] = frozenset(
+            (agent, service) for agent, policy in matrix.items() for service in policy["allowed_services"]
+        )
+        self.novelty_warmup = settings.ueba_novelty_warmup
+        self.max_flows = settings.ueba_max_tracked_flows
+        self.profiles: Dict[str, AgentProfile] = {}
+        # (agent, flow_id) -> state, oldest first; flow_id None is shared by calls outside a flow
+        self.behaviour: Dict[Tuple[str, Optional[str]], AgentBehaviour] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key: Tuple[str, Optional[str]], now: float) -> AgentBehaviour:
+        policy = self.matrix.get(key[0], {})
+        state = AgentBehaviour(
+            now,
+            rate_limit=policy.get("max_calls_per_sec", settings.ueba_rate_limit_per_sec),
+            risk_limit=LEVELS.index(policy.get("risk_limit", "CRITICAL")),
+        )
+        with self._lock:
+            state = self.behaviour.setdefault(key, state)
+            while len(self.behaviour) > self.max_flows:
+                del self.behaviour[next(iter(self.behaviour))]
+        return state
+
+    def _profile(self, agent_name: str) -> AgentProfile:
+        with self._lock:
+            return self.profiles.setdefault(agent_name, AgentProfile())
+
+    def evaluate(self, agent_name: str, service_name: str, flow_id: Optional[str] = None) -> Optional[str]:
+        """Returns None if the call may proceed, otherwise the reason it was blocked."""
+        now = time.monotonic()
+        key = (agent_name, flow_id)
+        state = self.behaviour.get(key) or self._state(key, now)
+        profile = self.profiles.get(agent_name) or self._profile(agent_name)
+
+        if (agent_name, service_name) not in self.allowed:
+            state.denied += 1
+            profile.denied += 1
+            state.flag(WEIGHT_DENIED, now)
+            return DENIED
+
+        limit = state.rate_limit
+        if limit:
+            elapsed = now - state.window_start
+            rate = state.previous * (1.0 - elapsed) + state.current if elapsed < 1.0 else state.rate(now)
+            if rate >= limit:
+                state.denied += 1
+                profile.denied += 1
+                state.flag(WEIGHT_RATE_LIMITED, now)
+                return RATE_LIMITED
+        state.current += 1
+
+        # Blocked while the flow's anomaly level for this agent is above its risk_limit; this
+        # doesn't add suspicion itself, so the lock-out lifts as the score decays
+        if state.suspicion and LEVELS.index(level_for_score(state.score(now))) > state.risk_limit:
+            state.denied += 1
+            profile.denied += 1
+            return RISK_LIMITED
+
+        # Only the transition counter is touched on the common path; novelty scoring starts after warm-up
+        point = (state.step, state.last_service)
+        transition = (*point, service_name)
+        seen = profile.transitions.get(transition, 0)
+        after = profile.outgoing.get(point, 0)
+        if seen < after * NOVELTY_RATIO and after >= self.novelty_warmup:
+            state.flag(WEIGHT_NOVEL_TRANSITION, now)
+        profile.transitions[transition] = seen + 1
+        profile.outgoing[point] = after + 1
+        profile.observed += 1
+        state.step = min(state.step + 1, MAX_STEP)
+        state.last_service = service_name
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        agents = {}
+        for agent_name, profile in list(self.profiles.items()):
+            agents[agent_name] = {
+                "calls": profile.observed + profile.denied,
+                "denied": profile.denied,
+                "distinct_transitions": len(profile.transitions),
+                "flows": 0,
+                "flagged_flows": 0,
+                "anomaly_score": 0.0,
+            }
+        for (agent_name, _), state in list(self.behaviour.items()):
+            entry = agents.get(agent_name)
+            if entry is None:
+                continue
+            score = state.score(now)
+            entry["flows"] += 1
+            entry["flagged_flows"] += int(score > 0)
+            entry["anomaly_score"] = max(entry["anomaly_score"], round(score, 1))
+        for entry in agents.values():
+            # The most suspicious of the agent's tracked flows
+            entry["anomaly_level"] = level_for_score(entry["anomaly_score"])
+        return agents
+
+
+_engine = PolicyEngine(ACCESS_CONTROL_MATRIX)
+
+
+def reload_policies() -> None:
+    """Recompiles ACCESS_CONTROL_MATRIX after it has been edited; behavioural state is reset."""
+    global _engine
+    _engine = PolicyEngine(ACCESS_CONTROL_MATRIX)
+
+
+def evaluate(agent_name: str, service_name: str) -> Optional[str]:
+    """Evaluates the call against the state of the flow it is made in (see current_flow)."""
+    trace = current_flow()
+    return _engine.evaluate(agent_name, service_name, trace.flow_id if trace is not None else None)
+
 
 def check_permission(agent_name: str, service_name: str) -> bool:
-    policy = ACCESS_CONTROL_MATRIX.get(agent_name)
-    if not policy:
-        return False
-    return service_name in policy["allowed_services"]
\ No newline at end of file
+    """Whether the matrix allows the call at all; a pure lookup that doesn't count as a call."""
+    return (agent_name, service_name) in _engine.allowed
+
+
+def behaviour_stats() -> Dict[str, Any]:
+    return _engine.stats()
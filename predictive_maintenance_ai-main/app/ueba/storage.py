@@ -1,13 +1,158 @@
+"""UEBA audit trail.
+
+`log_event` only records the event in memory and hands it to `AuditPipeline`, a
+bounded queue drained by a background writer that ships events to the backend in
+batches (every `ueba_batch_size` events or `ueba_flush_interval_ms`). Agents never
+wait on an audit round-trip; when the queue is full, events are dropped and counted
+instead.
+"""
+
+import atexit
+import logging
+import threading
 import time
-from typing import Dict, List
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
 
+from app.config.settings import get_settings
 from app.data.repositories import UebaRepo
 
-# Lightweight in-memory buffer for quick inspection
-EVENT_LOG: List[Dict] = []
+logger = logging.getLogger(__name__)
 
+settings = get_settings()
 
-def log_event(agent_name: str, action: str, status: str, details: str = ""):
+# Ring buffer of the latest events for quick inspection
+EVENT_LOG: Deque[Dict] = deque(maxlen=settings.ueba_event_log_size)
+
+
+class AuditPipeline:
+    def __init__(
+        self,
+        sink: Callable[[List[Dict[str, Any]]], None],
+        capacity: int,
+        batch_size: int,
+        flush_interval_ms: float,
+        block_ms: float = 0,
+    ):
+        self._sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.block_timeout = block_ms / 1000
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Queues one event without blocking (unless `block_ms` is set); returns False if dropped."""
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.capacity and self.block_timeout > 0:
+                self.backpressure_waits += 1
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: len(self._queue) < self.capacity, self.block_timeout)
+            if len(self._queue) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._queue.append(event)
+            self.enqueued += 1
+            if self._writer is None:
+                self._start()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _start(self) -> None:
+        self._writer = threading.Thread(target=self._run, name="ueba-audit-writer", daemon=True)
+        self._writer.start()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        count = min(self.batch_size, len(self._queue))
+        batch = [self._queue.popleft() for _ in range(count)]
+        # Wake producers waiting for room
+        self._cond.notify_all()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._queue) >= self.batch_size, self.flush_interval)
+                if self._closed:
+                    return
+                batch = self._take()
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: List[Dict[str, Any]]) -> None:
+        with self._send_lock:
+            try:
+                self._sink(batch)
+                sent, failed = len(batch), 0
+            except Exception as exc:  # noqa: BLE001
+                # Audit must never fail the agent flow; the events stay in EVENT_LOG locally
+                logger.warning("UEBA audit batch of %d events failed: %s", len(batch), exc)
+                sent, failed = 0, len(batch)
+        with self._cond:
+            self.sent += sent
+            self.failed += failed
+            self.batches += 1
+
+    def flush(self) -> None:
+        """Ships everything queued so far from the calling thread."""
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._send(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "capacity": self.capacity,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": self.flush_interval * 1000,
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "backpressure_waits": self.backpressure_waits,
+            }
+
+
+audit_pipeline = AuditPipeline(
+    UebaRepo.log_events,
+    capacity=settings.ueba_buffer_size,
+    batch_size=settings.ueba_batch_size,
+    flush_interval_ms=settings.ueba_flush_interval_ms,
+    block_ms=settings.ueba_block_ms,
+)
+atexit.register(audit_pipeline.close)
+
+
+def _record(agent_name: str, action: str, status: str, details: str) -> None:
     event = {
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         "agent": agent_name,
@@ -17,15 +162,28 @@ def log_event(agent_name: str, action: str, status: str, details: str = ""):
     }
     EVENT_LOG.append(event)
 
-    icon = "🛡️" if status == "ALLOWED" else "⛔"
-    print(f"{icon} [UEBA] {agent_name} -> {action}: {status}")
+    if status == "ALLOWED":
+        logger.debug("[UEBA] %s -> %s: %s", agent_name, action, status)
+    else:
+        logger.warning("[UEBA] %s -> %s: %s %s", agent_name, action, status, details)
+
+
+def log_event(agent_name: str, action: str, status: str, details: str = ""):
+    _record(agent_name, action, status, details)
+
+    # Forwarded to the backend in the background for a durable audit trail
+    if settings.log_to_backend:
+        audit_pipeline.submit(UebaRepo.payload(agent_name, action, status, details))
 
-    # Forward to backend for durable audit trail
-    try:
-        UebaRepo.log_event(agent_name, action, status, details)
-    except Exception as exc:  # noqa: BLE001
-        print(f"⚠️ Failed to persist UEBA event: {exc}")
+
+async def alog_event(agent_name: str, action: str, status: str, details: str = ""):
+    # Enqueueing never blocks on I/O, so the async variant shares the same path
+    log_event(agent_name, action, status, details)
 
 
 def get_recent_events(limit: int = 10):
-    return EVENT_LOG[-limit:]
\ No newline at end of file
+    return list(EVENT_LOG)[-limit:]
+
+
+def audit_stats() -> Dict[str, Any]:
+    return {**audit_pipeline.stats(), "enabled": settings.log_to_backend}
@@ -0,0 +1,473 @@
+"""
+Benchmarks the agent flow against local stand-ins for the LLM and the Node backend.
+
+    python -m benchmarks.bench_flow --output results.json
+    python -m benchmarks.bench_flow --compare results.json --max-regression 0.15
+
+Phases:
+  latency     sequential `run_predictive_flow` calls, percentiles of wall time
+  throughput  `run_predictive_flow_async` at each --concurrency level, flows/s and percentiles
+  memory      tracemalloc peak during one flow, and memory still held after N flows
+  ueba        policy + audit time per flow (from the timing breakdown), and `secure_call`
+              against a direct call in a tight loop
+  fleet       (with --processes) a fleet run on FleetPool at each process count: flows/s,
+              cores used and CPU time per flow
+
+Every phase counts the flows that raised or ended with an error_message under "failed";
+a run with any failed flow exits with status 2, --compare or not, as its numbers don't
+measure the full flow.
+
+The fleet, the LLM replies and the simulated latencies are fixed by the CLI options, so two
+runs with the same options on the same machine measure the same work. Results and the
+options are written as JSON; --compare checks a run against a saved one.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.stubs import FakeBackend, FakeLLM, make_fleet
+
+# Metric path -> which direction is better; only these are checked by --compare
+TRACKED = {
+    "latency.p50_ms": "lower",
+    "latency.p95_ms": "lower",
+    "memory.peak_kb_per_flow": "lower",
+    "memory.retained_kb_per_flow": "lower",
+    "ueba.flow_ms_mean": "lower",
+    "ueba.per_call_us": "lower",
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        # Nearest-rank, so small runs report a latency that actually happened
+        return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p50_ms": round(pick(0.50), 2),
+        "p90_ms": round(pick(0.90), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool):
+    """Silences the nodes' progress prints, which would otherwise dominate the timings."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def configure_environment(args: argparse.Namespace, backend_url: str) -> None:
+    """Must run before anything under `app` is imported: settings are read once at import."""
+    os.environ["BACKEND_API_URL"] = backend_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Caches would turn every flow after the first into a lookup; measure the full path by default
+    os.environ.setdefault("LLM_CACHE_ENABLED", "true" if args.with_caches else "false")
+    os.environ.setdefault("REPO_CACHE_ENABLED", "true" if args.with_caches else "false")
+    # Checkpoints (opt-in via CHECKPOINT_ENABLED) go to a scratch file, not DATA_DIR
+    os.environ.setdefault("CHECKPOINT_SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "checkpoints.sqlite"))
+
+
+# --- Phases ---
+
+def succeeded(run_flow: Callable, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
+    """The flow's final state, or None if it raised or ended with an error_message."""
+    try:
+        state = run_flow(*args, **kwargs)
+    except Exception as exc:  # noqa: BLE001
+        print(f"⚠️ Flow failed: {exc}", file=sys.stderr)
+        return None
+    return None if state.get("error_message") else state
+
+
+async def asucceeded(run_flow_async: Callable, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
+    try:
+        state = await run_flow_async(*args, **kwargs)
+    except Exception as exc:  # noqa: BLE001
+        print(f"⚠️ Flow failed: {exc}", file=sys.stderr)
+        return None
+    return None if state.get("error_message") else state
+
+
+def bench_latency(run_flow: Callable, vehicles: List[str], flows: int) -> Dict[str, Any]:
+    samples = []
+    failed = 0
+    for index in range(flows):
+        started = time.perf_counter()
+        failed += succeeded(run_flow, vehicles[index % len(vehicles)]) is None
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"failed": failed, **percentiles(samples)}
+
+
+async def _run_concurrent(run_flow_async: Callable, vehicles: List[str], flows: int, concurrency: int) -> Dict[str, Any]:
+    slots = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+
+    async def one(vehicle_id: str) -> bool:
+        async with slots:
+            started = time.perf_counter()
+            ok = await asucceeded(run_flow_async, vehicle_id) is not None
+            samples.append((time.perf_counter() - started) * 1000)
+            return ok
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(vehicles[index % len(vehicles)]) for index in range(flows)))
+    elapsed = time.perf_counter() - started
+    return {"flows_per_sec": round(flows / elapsed, 2), "failed": outcomes.count(False), **percentiles(samples)}
+
+
+def bench_throughput(
+    run_flow_async: Callable, vehicles: List[str], flows: int, levels: List[int], warmup: int
+) -> Dict[str, Any]:
+    from app.data.repositories import aclose_async_client
+
+    async def run_all() -> Dict[str, Any]:
+        try:
+            # The async HTTP and LLM clients are per event loop, so they warm up here, not in the sync phase
+            for index in range(warmup):
+                await run_flow_async(vehicles[index % len(vehicles)])
+            return {
+                str(level): await _run_concurrent(run_flow_async, vehicles, max(flows, level), level)
+                for level in levels
+            }
+        finally:
+            await aclose_async_client()
+
+    return asyncio.run(run_all())
+
+
+def bench_memory(run_flow: Callable, vehicles: List[str], flows: int) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        failed = succeeded(run_flow, vehicles[0]) is None
+        _, peak = tracemalloc.get_traced_memory()
+
+        gc.collect()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for index in range(flows):
+            failed += succeeded(run_flow, vehicles[index % len(vehicles)]) is None
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kb_per_flow": round((peak - before) / 1024, 1),
+        # Bounded caches and histories fill up over time, so this should stay near zero
+        "retained_kb_per_flow": round((after - baseline) / 1024 / flows, 2),
+        "flows": flows,
+        "failed": int(failed),
+    }
+
+
+@contextlib.contextmanager
+def unlimited_rate(agent_name: str):
+    """Lifts the agent's rate limit: a tight secure_call loop is far above any real call rate."""
+    from app.ueba import policies
+
+    policy = policies.ACCESS_CONTROL_MATRIX[agent_name]
+    saved = policy.get("max_calls_per_sec")
+    policy["max_calls_per_sec"] = 0
+    policies.reload_policies()
+    try:
+        yield
+    finally:
+        if saved is None:
+            del policy["max_calls_per_sec"]
+        else:
+            policy["max_calls_per_sec"] = saved
+        policies.reload_policies()
+
+
+def bench_ueba(run_flow: Callable, vehicles: List[str], flows: int, calls: int) -> Dict[str, Any]:
+    from app.ueba.middleware import secure_call
+
+    per_flow, shares = [], []
+    failed = 0
+    for index in range(flows):
+        state = succeeded(run_flow, vehicles[index % len(vehicles)], include_timings=True)
+        if state is None:
+            failed += 1
+            continue
+        timings = state["timings"]
+        ueba_ms = timings["totals"].get("ueba_ms", 0.0)
+        per_flow.append(ueba_ms)
+        shares.append(ueba_ms / timings["total_ms"] if timings["total_ms"] else 0.0)
+
+    def noop() -> None:
+        return None
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        noop()
+    direct = time.perf_counter() - started
+    with unlimited_rate("Scheduling"):
+        started = time.perf_counter()
+        for _ in range(calls):
+            secure_call("Scheduling", "SchedulerRepo", noop)
+        secured = time.perf_counter() - started
+
+    return {
+        "flow_ms_mean": round(statistics.fmean(per_flow), 3) if per_flow else None,
+        "flow_share_pct": round(statistics.fmean(shares) * 100, 2) if shares else None,
+        "per_call_us": round((secured - direct) / calls * 1e6, 2),
+        "calls": calls,
+        "failed": failed,
+    }
+
+
+def _fleet_worker_setup(llm_latency_ms: float, llm_tokens: int, quiet_output: bool) -> None:
+    """Runs in each pool worker: spawned processes don't inherit the parent's registered LLM."""
+    from app.agents.llm import register_llm
+
+    register_llm(FakeLLM(latency_ms=llm_latency_ms, reply_tokens=llm_tokens))
+    if quiet_output:
+        sys.stdout = open(os.devnull, "w")
+
+
+def bench_fleet(vehicles: List[str], flows: int, levels: List[int], setup: Callable) -> Dict[str, Any]:
+    from app.agents.fleet_pool import FleetPool
+
+    # A run takes each vehicle once
+    fleet = vehicles[:flows]
+    results = {}
+    for processes in levels:
+        pool = FleetPool(processes=processes, setup=setup)
+        try:
+            # Spawning, imports and client setup happen here, not in the timed run
+            pool.run(vehicles[-processes * 2:])
+            run = pool.run(fleet)
+        finally:
+            pool.shutdown()
+        summary = run.summary()
+        results[str(processes)] = {
+            "flows_per_sec": summary["throughput_per_sec"],
+            "cores_used": summary["cores_used"],
+            "cpu_ms_per_flow": summary["cpu_ms_per_flow"],
+            "failed": summary["failed"],
+            **percentiles([result["duration_ms"] for result in run.results]),
+        }
+    return results
+
+
+# --- Comparison ---
+
+def failed_flows(results: Dict[str, Any]) -> Dict[str, int]:
+    """Phase (or phase.level) -> failed flows, for every entry with failures."""
+    failures = {}
+    for phase, result in results.items():
+        entries = result.items() if "failed" not in result else [(None, result)]
+        for level, entry in entries:
+            if isinstance(entry, dict) and entry.get("failed"):
+                failures[phase if level is None else f"{phase}.{level}"] = entry["failed"]
+    return failures
+
+
+def _lookup(results: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value if isinstance(value, (int, float)) else None
+
+
+def tracked_metrics(results: Dict[str, Any]) -> Dict[str, str]:
+    metrics = dict(TRACKED)
+    for level in results.get("throughput", {}):
+        metrics[f"throughput.{level}.flows_per_sec"] = "higher"
+        metrics[f"throughput.{level}.p95_ms"] = "lower"
+    for level in results.get("fleet", {}):
+        metrics[f"fleet.{level}.flows_per_sec"] = "higher"
+    return metrics
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[Dict[str, Any]]:
+    """One row per metric present in both runs; `regressed` when it got worse by more than the threshold."""
+    rows = []
+    for path, better in tracked_metrics(current["results"]).items():
+        new, old = _lookup(current["results"], path), _lookup(baseline["results"], path)
+        if new is None or old is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = change if better == "lower" else -change
+        rows.append({
+            "metric": path,
+            "baseline": old,
+            "current": new,
+            "change_pct": round(change * 100, 1),
+            "regressed": worse > max_regression,
+        })
+    return rows
+
+
+def _config_differences(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    ignored = {"output", "compare", "max_regression", "verbose"}
+    old = baseline.get("meta", {}).get("config", {})
+    return [
+        f"{name}: {old.get(name)!r} -> {value!r}"
+        for name, value in current["meta"]["config"].items()
+        if name not in ignored and old.get(name) != value
+    ]
+
+
+# --- CLI ---
+
+def _levels(value: str) -> List[int]:
+    return [int(level) for level in value.split(",") if level.strip()]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the predictive maintenance agent flow.")
+    parser.add_argument("--flows", type=int, default=50, help="flows per phase (default 50)")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed flows before measuring")
+    parser.add_argument("--concurrency", type=_levels, default=[1, 4, 16], help="comma-separated levels")
+    parser.add_argument("--fleet-size", type=int, default=200)
+    parser.add_argument("--risky-share", type=float, default=0.6, help="share of vehicles that need repair")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-tokens", type=int, default=40, help="tokens per free-text LLM reply")
+    parser.add_argument("--backend-latency-ms", type=float, default=5.0)
+    parser.add_argument("--memory-flows", type=int, default=20)
+    parser.add_argument("--ueba-calls", type=int, default=5000, help="secure_call loop size")
+    parser.add_argument("--processes", type=_levels, default=[], help="comma-separated FleetPool sizes (fleet phase)")
+    parser.add_argument("--fleet-flows", type=int, default=200, help="vehicles per fleet phase run")
+    parser.add_argument("--with-caches", action="store_true", help="keep the LLM and repository caches on")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON from an earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed fractional slowdown")
+    parser.add_argument("--verbose", action="store_true", help="keep the agents' progress output")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fleet = make_fleet(args.fleet_size, seed=args.seed, risky_share=args.risky_share)
+    backend = FakeBackend(fleet, latency_ms=args.backend_latency_ms).start()
+    configure_environment(args, backend.url)
+
+    from app.agents.checkpoints import checkpoint_backend
+    from app.agents.llm import register_llm
+    from app.agents.master import run_predictive_flow, run_predictive_flow_async
+    from app.config.settings import get_settings
+    from app.ueba.storage import audit_pipeline
+
+    register_llm(FakeLLM(latency_ms=args.llm_latency_ms, reply_tokens=args.llm_tokens))
+    vehicles = list(fleet)
+    settings = get_settings()
+    results: Dict[str, Any] = {}
+
+    try:
+        with quiet(not args.verbose):
+            for index in range(args.warmup):
+                run_predictive_flow(vehicles[index % len(vehicles)])
+            print("⏱️  latency...", file=sys.stderr)
+            results["latency"] = bench_latency(run_predictive_flow, vehicles, args.flows)
+            print("⏱️  throughput...", file=sys.stderr)
+            results["throughput"] = bench_throughput(run_predictive_flow_async, vehicles, args.flows, args.concurrency, args.warmup)
+            print("⏱️  memory...", file=sys.stderr)
+            results["memory"] = bench_memory(run_predictive_flow, vehicles, args.memory_flows)
+            print("⏱️  ueba...", file=sys.stderr)
+            results["ueba"] = bench_ueba(run_predictive_flow, vehicles, args.flows, args.ueba_calls)
+            if args.processes:
+                print("⏱️  fleet...", file=sys.stderr)
+                setup = functools.partial(_fleet_worker_setup, args.llm_latency_ms, args.llm_tokens, not args.verbose)
+                results["fleet"] = bench_fleet(vehicles, args.fleet_flows, args.processes, setup)
+    finally:
+        # Ship the queued audit events while the backend is still up
+        audit_pipeline.close()
+        backend.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": vars(args),
+            "settings": {
+                "llm_max_concurrency": settings.llm_max_concurrency,
+                "fleet_process_concurrency": settings.fleet_process_concurrency,
+                "fleet_chunk_size": settings.fleet_chunk_size,
+                "llm_cache_enabled": settings.llm_cache_enabled,
+                "repo_cache_enabled": settings.repo_cache_enabled,
+                "ueba_enabled": settings.ueba_enabled,
+                "log_to_backend": settings.log_to_backend,
+                "checkpoints": checkpoint_backend(),
+            },
+            "backend_requests": backend.requests,
+            "audit": audit_pipeline.stats(),
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    print(json.dumps(report["results"], indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}", file=sys.stderr)
+
+    failures = failed_flows(report["results"])
+    for phase, count in failures.items():
+        print(f"❌ {phase}: {count} flow(s) failed", file=sys.stderr)
+    status = 2 if failures else 0
+
+    if not args.compare:
+        return status
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    for difference in _config_differences(report, baseline):
+        print(f"⚠️ Options differ from the baseline ({difference}); results may not be comparable", file=sys.stderr)
+    rows = compare(report, baseline, args.max_regression)
+    for row in rows:
+        mark = "❌" if row["regressed"] else "✅"
+        print(f"{mark} {row['metric']}: {row['baseline']} -> {row['current']} ({row['change_pct']:+.1f}%)", file=sys.stderr)
+    regressions = [row for row in rows if row["regressed"]]
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) regressed more than {args.max_regression:.0%}", file=sys.stderr)
+        return status or 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Deterministic local stand-ins for the LLM provider and the Node backend.
+
+The fake LLM sleeps for a fixed latency and answers from the prompt alone, so every run
+makes the same calls and returns the same text. The fake backend is a real HTTP server on
+localhost: the sync (requests) and async (httpx) clients, connection pools, retries and
+UEBA audit writes run exactly as in production, with only the latency made up.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+MODELS = ("HeavyHaul X5", "CityRunner", "LongHauler 9", "TerraMax T3")
+FAULT_CODES = ("P0217", "P0524", "P0128", "P0300", "P0420", "P0562")
+
+
+class FakeLLM(BaseChatModel):
+    """Chat model with a fixed latency and a fixed-length reply; diagnosis prompts get valid JSON."""
+
+    latency_ms: float = 50.0
+    reply_tokens: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content
+        if "JSON object" in prompt:
+            return json.dumps({
+                "report": "Coolant flow is restricted, so the engine runs hot and oil pressure drops.",
+                "action": "Replace water pump and flush coolant",
+                "priority": "High",
+                "component": "Water pump",
+                "confidence": 0.8,
+            })
+        # ~4 characters per token, matching app.agents.prompts.estimate_tokens
+        return " ".join(["word"] * self.reply_tokens)
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        content = self._reply(messages)
+        prompt_tokens = sum(len(message.content) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+
+def make_fleet(size: int, seed: int = 7, risky_share: float = 0.6) -> Dict[str, Dict[str, Any]]:
+    """`size` vehicles; about `risky_share` of them need the full LLM and booking path."""
+    rng = random.Random(seed)
+    fleet = {}
+    for index in range(size):
+        vehicle_id = f"BENCH-{index:05d}"
+        risky = rng.random() < risky_share
+        fleet[vehicle_id] = {
+            "vehicle_id": vehicle_id,
+            "model": MODELS[index % len(MODELS)],
+            "owner": f"Fleet Customer {index % 50}",
+            "engine_temp_c": rng.randint(111, 125) if risky else rng.randint(70, 95),
+            "oil_pressure_psi": rng.randint(15, 28) if risky else rng.randint(35, 60),
+            "active_dtc_codes": rng.sample(FAULT_CODES, 2) if risky else [],
+        }
+    return fleet
+
+
+class FakeBackend:
+    """Serves the routes the repositories call, each after `latency_ms`."""
+
+    _TELEMATICS = re.compile(r"^/telematics/([^/]+)$")
+    _MAINTENANCE = re.compile(r"^/maintenance/([^/]+)$")
+
+    def __init__(self, fleet: Dict[str, Dict[str, Any]], latency_ms: float = 5.0):
+        self.fleet = fleet
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._bookings = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, method: str, path: str, query: Dict[str, List[str]]) -> Any:
+        if method == "GET":
+            match = self._TELEMATICS.match(path)
+            if match:
+                return self.fleet.get(match.group(1))
+            if path == "/telematics":
+                return list(self.fleet.values())
+            if self._MAINTENANCE.match(path):
+                return [{"date": "2025-01-15", "service": "Oil change"}, {"date": "2024-07-02", "service": "Brake pads"}]
+            if path == "/scheduler/slots":
+                center = query.get("center_id", ["CENTER_001"])[0]
+                return {"slots": [{"slot_id": f"{center}-0900", "center_id": center, "time": "09:00"}]}
+        elif method == "POST":
+            if path == "/scheduler/book":
+                with self._lock:
+                    self._bookings += 1
+                    return {"booking": {"booking_id": f"BK-{self._bookings:06d}"}}
+            if path.startswith(("/notifications", "/ueba")):
+                return {"ok": True}
+        return None
+
+    def start(self) -> "FakeBackend":
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the Node backend
+            # Headers and body go out as separate writes; without this, delayed ACKs add ~40ms per call
+            disable_nagle_algorithm = True
+
+            def _handle(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                url = urlparse(self.path)
+                time.sleep(backend.latency_ms / 1000)
+                with backend._lock:
+                    backend.requests += 1
+                data = backend.route(method, url.path, parse_qs(url.query))
+                body = json.dumps({"success": data is not None, "data": data}).encode()
+                self.send_response(200 if data is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-backend", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Manual scripts: they call the real backend and LLM as soon as they are imported
+collect_ignore = ["test_flow.py", "test_key.py", "list_models.py"]
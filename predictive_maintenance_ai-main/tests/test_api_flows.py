@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fail(vehicle_id, include_timings=False, flow_id=None):
+        raise TimeoutError("diagnosis LLM timed out")
+
+    monkeypatch.setattr(main, "run_predictive_flow_async", fail)
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("checkpointer, resumable", [(object(), True), (None, False)])
+def test_failed_flow_advertises_resume_only_when_checkpointed(client, monkeypatch, checkpointer, resumable):
+    monkeypatch.setattr(main, "get_checkpointer", lambda: checkpointer)
+
+    response = client.post("/orchestration/run_flow", json={"vehicle_id": "V-1"})
+
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["error"] == "diagnosis LLM timed out"
+    assert detail["flow_id"]
+    if resumable:
+        assert detail["resume_url"] == f"/orchestration/flows/{detail['flow_id']}/resume"
+    else:
+        assert "resume_url" not in detail
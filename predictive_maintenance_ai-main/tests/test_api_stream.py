@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import main
+
+EVENTS = [
+    {"type": "update", "node": "data_analysis", "data": {"risk_level": "HIGH"}},
+    {"type": "token", "node": "diagnosis", "content": "Oil "},
+    {"type": "token", "node": "diagnosis", "content": "pressure low"},
+    {"type": "update", "node": "diagnosis", "data": {"diagnosis_report": "Oil pressure low"}},
+    {"type": "done", "state": {"vehicle_id": "V-1"}, "timings": {"total_ms": 1.0}},
+]
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def _stream(monkeypatch, fail_after=None):
+    async def stream(vehicle_id, flow_id=None):
+        for i, event in enumerate(EVENTS):
+            if i == fail_after:
+                raise RuntimeError("diagnosis LLM timed out")
+            yield event
+
+    monkeypatch.setattr(main, "stream_predictive_flow", stream)
+
+
+def _sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        assert name.startswith("event: ") and data.startswith("data: ")
+        event = json.loads(data[len("data: "):])
+        assert name[len("event: "):] == event["type"]
+        events.append(event)
+    return events
+
+
+def test_sse_streams_events_in_order_and_ends_with_done(client, monkeypatch):
+    _stream(monkeypatch)
+
+    response = client.get("/orchestration/run_flow/V-1/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _sse_events(response.text) == EVENTS
+
+
+def test_sse_reports_a_failure_as_the_final_event(client, monkeypatch):
+    _stream(monkeypatch, fail_after=2)
+
+    events = _sse_events(client.get("/orchestration/run_flow/V-1/stream").text)
+
+    assert events[:2] == EVENTS[:2]
+    assert events[2:] == [{"type": "error", "detail": "diagnosis LLM timed out"}]
+
+
+def test_websocket_streams_events_in_order_and_ends_with_done(client, monkeypatch):
+    _stream(monkeypatch)
+
+    with client.websocket_connect("/ws/orchestration") as ws:
+        ws.send_json({"vehicle_id": "V-1"})
+        received = [ws.receive_json() for _ in EVENTS]
+
+    assert received == EVENTS
+
+
+def test_websocket_reports_errors_and_keeps_the_socket_open(client, monkeypatch):
+    _stream(monkeypatch, fail_after=1)
+
+    with client.websocket_connect("/ws/orchestration") as ws:
+        ws.send_json({})
+        assert ws.receive_json() == {"type": "error", "detail": "vehicle_id is required"}
+
+        ws.send_json({"vehicle_id": "V-1"})
+        assert ws.receive_json() == EVENTS[0]
+        assert ws.receive_json() == {"type": "error", "detail": "diagnosis LLM timed out"}
+
+        _stream(monkeypatch)
+        ws.send_json({"vehicle_id": "V-2"})
+        assert [ws.receive_json() for _ in EVENTS] == EVENTS
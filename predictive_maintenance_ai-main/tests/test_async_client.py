@@ -0,0 +1,43 @@
+import asyncio
+import gc
+
+from app.data import repositories
+from app.data.repositories import aclose_async_client, get_async_client
+
+
+async def _client():
+    client = get_async_client()
+    assert get_async_client() is client
+    return client
+
+
+def test_client_is_closed_and_released_with_its_loop():
+    clients = [asyncio.run(_client()) for _ in range(3)]
+    gc.collect()
+
+    assert all(client.is_closed for client in clients)
+    assert len(repositories._async_clients) == 0
+
+
+def test_explicit_close_gives_the_loop_a_fresh_client():
+    async def scenario():
+        first = get_async_client()
+        await aclose_async_client()
+        return first, get_async_client()
+
+    first, second = asyncio.run(scenario())
+
+    assert first.is_closed
+    assert second is not first and second.is_closed
+
+
+def test_loops_closed_without_shutdown_are_dropped():
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(_client())
+    loop.close()
+    del loop
+
+    asyncio.run(_client())
+    gc.collect()
+
+    assert len(repositories._async_clients) == 0
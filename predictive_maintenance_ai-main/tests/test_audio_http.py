@@ -0,0 +1,105 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api.audio_http import IMMUTABLE, REVALIDATE, audio_response
+
+AUDIO = bytes(range(256)) * 4  # 1024 bytes
+ETAG = '"abc123"'
+MODIFIED = 1_700_000_000.0
+
+app = FastAPI()
+
+
+@app.get("/clip")
+def clip(request: Request):
+    return audio_response(request, AUDIO, ETAG, last_modified=MODIFIED)
+
+
+@app.get("/immutable")
+def immutable(request: Request):
+    return audio_response(request, AUDIO, ETAG, immutable=True)
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def test_full_response(client):
+    response = client.get("/clip")
+
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == REVALIDATE
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes=-5000", 0, 1023),
+])
+def test_range_returns_206(client, header, start, end):
+    response = client.get("/clip", headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.content == AUDIO[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(AUDIO)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=500-400", "bytes=-0"])
+def test_unsatisfiable_range_returns_416(client, header):
+    response = client.get("/clip", headers={"Range": header})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(AUDIO)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "items=0-9", "bytes=-"])
+def test_unsupported_range_returns_full_body(client, header):
+    response = client.get("/clip", headers={"Range": header})
+
+    assert response.status_code == 200
+    assert response.content == AUDIO
+
+
+def test_stale_if_range_returns_full_body(client):
+    response = client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert response.status_code == 200
+
+    response = client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": ETAG})
+    assert response.status_code == 206
+
+
+@pytest.mark.parametrize("header", [ETAG, f"W/{ETAG}", f'"other", {ETAG}', "*"])
+def test_matching_etag_returns_304(client, header):
+    response = client.get("/clip", headers={"If-None-Match": header})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+
+
+def test_etag_mismatch_wins_over_if_modified_since(client):
+    response = client.get(
+        "/clip", headers={"If-None-Match": '"other"', "If-Modified-Since": "Wed, 01 Jan 2031 00:00:00 GMT"}
+    )
+
+    assert response.status_code == 200
+
+
+def test_if_modified_since(client):
+    assert client.get("/clip", headers={"If-Modified-Since": "Wed, 01 Jan 2031 00:00:00 GMT"}).status_code == 304
+    assert client.get("/clip", headers={"If-Modified-Since": "Wed, 01 Jan 2020 00:00:00 GMT"}).status_code == 200
+    assert client.get("/clip", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+
+def test_immutable_clips(client):
+    response = client.get("/immutable")
+    assert response.headers["cache-control"] == IMMUTABLE
+
+    assert client.get("/immutable", headers={"If-Modified-Since": "Wed, 01 Jan 2020 00:00:00 GMT"}).status_code == 304
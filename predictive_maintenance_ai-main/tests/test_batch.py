@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.agents import batch
+from app.agents.batch import BatchManager
+
+FLEET = [
+    {"vehicle_id": "V-ok", "engine_temp_c": 90, "oil_pressure_psi": 45},
+    {"vehicle_id": "V-warm", "engine_temp_c": 105, "oil_pressure_psi": 45},
+    {"vehicle_id": "V-hot", "engine_temp_c": 120, "oil_pressure_psi": 10},
+    {"vehicle_id": "V-broken"},
+]
+
+
+class FakeFlows:
+    """Stands in for the agent graph and tracks how many flows run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.seen = []
+
+    async def __call__(self, vehicle_id, flow_id=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.seen.append(vehicle_id)
+        try:
+            await asyncio.sleep(0.01)
+            if vehicle_id == "V-broken":
+                raise ConnectionError("telematics backend down")
+            return {"vehicle_id": vehicle_id, "flow_id": flow_id, "risk_level": "LOW"}
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def flows(monkeypatch):
+    flows = FakeFlows()
+    monkeypatch.setattr(batch, "run_predictive_flow_async", flows)
+    monkeypatch.setattr(batch.TelematicsRepo, "list_vehicles", staticmethod(lambda fleet_id=None: FLEET))
+    return flows
+
+
+@pytest.fixture
+def manager():
+    manager = BatchManager(max_workers=2, max_jobs=2, processes=0)
+    yield manager
+    manager.shutdown()
+
+
+def _finish(job):
+    return sorted(list(job.iter_results(timeout=5)), key=lambda result: result["vehicle_id"])
+
+
+def test_runs_every_vehicle_on_a_bounded_pool(flows, manager):
+    ids = [f"V-{n}" for n in range(8)]
+
+    job = manager.submit(ids + ["V-0"])
+    results = _finish(job)
+
+    assert [r["vehicle_id"] for r in results] == sorted(ids)
+    assert all(r["success"] and r["flow_id"] for r in results)
+    assert flows.peak == 2
+    summary = job.summary()
+    assert (summary["status"], summary["total"], summary["succeeded"], summary["failed"]) == ("COMPLETED", 8, 8, 0)
+
+
+def test_failed_flows_are_recorded_with_their_flow_id(flows, manager):
+    job = manager.submit(["V-ok", "V-broken"])
+    broken = _finish(job)[0]
+
+    assert broken["vehicle_id"] == "V-broken"
+    assert not broken["success"]
+    assert broken["error"] == "telematics backend down"
+    assert broken["flow_id"]
+    assert (job.succeeded, job.failed) == (1, 1)
+
+
+def test_whole_fleet_when_no_ids_are_given(flows, manager):
+    job = manager.submit(fleet_id="north")
+
+    assert sorted(r["vehicle_id"] for r in _finish(job)) == sorted(v["vehicle_id"] for v in FLEET)
+
+
+def test_prescreen_skips_low_risk_vehicles(flows, manager):
+    # Vehicles without fleet telematics can't be screened and still run
+    job = manager.submit(["V-ok", "V-warm", "V-hot", "V-unknown"], min_risk_level="MEDIUM")
+
+    assert [r["vehicle_id"] for r in _finish(job)] == ["V-hot", "V-unknown", "V-warm"]
+    assert job.screened_out == 1
+
+
+def test_fully_screened_out_batch_completes_without_running(flows, manager):
+    job = manager.submit(["V-ok"], min_risk_level="CRITICAL")
+
+    assert job.done
+    assert job.summary()["screened_out"] == 1
+    assert flows.seen == []
+
+
+def test_rejects_bad_input(flows, manager, monkeypatch):
+    with pytest.raises(ValueError):
+        manager.submit(["V-ok"], min_risk_level="SEVERE")
+
+    monkeypatch.setattr(batch.TelematicsRepo, "list_vehicles", staticmethod(lambda fleet_id=None: []))
+    with pytest.raises(ValueError):
+        manager.submit(fleet_id="empty")
+
+
+def test_keeps_only_the_latest_finished_jobs(flows, manager):
+    jobs = [manager.submit(["V-ok"]) for _ in range(3)]
+    for job in jobs:
+        _finish(job)
+    latest = manager.submit(["V-ok"])
+    _finish(latest)
+
+    assert manager.get(jobs[0].job_id) is None
+    assert manager.get(jobs[2].job_id) is jobs[2]
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from benchmarks import bench_flow
+
+
+def _results(p50=100.0, flows_per_sec=20.0, failed=0):
+    return {
+        "latency": {"failed": failed, "p50_ms": p50, "p95_ms": 150.0},
+        "throughput": {"4": {"failed": 0, "flows_per_sec": flows_per_sec, "p95_ms": 300.0}},
+        "memory": {"peak_kb_per_flow": 0.0, "retained_kb_per_flow": 2.0},
+    }
+
+
+def _report(**kwargs):
+    return {"meta": {"config": {"flows": 50}}, "results": _results(**kwargs)}
+
+
+def _rows(current, baseline, max_regression=0.15):
+    return {row["metric"]: row for row in bench_flow.compare(current, baseline, max_regression)}
+
+
+def test_compare_flags_slower_latency_beyond_the_threshold():
+    rows = _rows(_report(p50=120.0), _report(p50=100.0))
+
+    assert rows["latency.p50_ms"]["change_pct"] == 20.0
+    assert rows["latency.p50_ms"]["regressed"]
+    assert not rows["latency.p95_ms"]["regressed"]
+
+
+def test_compare_flags_lower_throughput_but_not_higher():
+    assert _rows(_report(flows_per_sec=16.0), _report())["throughput.4.flows_per_sec"]["regressed"]
+    assert not _rows(_report(flows_per_sec=40.0), _report())["throughput.4.flows_per_sec"]["regressed"]
+    # Faster latency is an improvement, however large
+    assert not _rows(_report(p50=10.0), _report())["latency.p50_ms"]["regressed"]
+
+
+def test_compare_allows_changes_up_to_the_threshold():
+    rows = _rows(_report(p50=115.0, flows_per_sec=17.0), _report())
+
+    assert not rows["latency.p50_ms"]["regressed"]
+    assert not rows["throughput.4.flows_per_sec"]["regressed"]
+
+
+def test_compare_skips_metrics_missing_from_either_run_or_zero_in_the_baseline():
+    baseline = _report()
+    del baseline["results"]["throughput"]
+
+    rows = _rows(_report(), baseline)
+
+    assert "throughput.4.flows_per_sec" not in rows
+    assert "memory.peak_kb_per_flow" not in rows
+    assert "ueba.flow_ms_mean" not in rows
+    assert "memory.retained_kb_per_flow" in rows
+
+
+def test_failed_flows_reports_phases_and_levels():
+    results = _results(failed=2)
+    results["throughput"]["16"] = {"failed": 1, "flows_per_sec": 5.0}
+
+    assert bench_flow.failed_flows(results) == {"latency": 2, "throughput.16": 1}
+    assert bench_flow.failed_flows(_results()) == {}
+
+
+@pytest.fixture
+def bench(monkeypatch, tmp_path):
+    """Runs main() on a canned report instead of benchmarking, with a saved baseline to compare to."""
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(_report()))
+
+    def main(report, *extra):
+        monkeypatch.setattr(bench_flow, "run", lambda args: report)
+        return bench_flow.main(["--compare", str(baseline), *extra])
+
+    return main
+
+
+def test_exit_status_is_0_without_regressions(bench):
+    assert bench(_report(p50=105.0)) == 0
+
+
+def test_exit_status_is_1_on_regression(bench):
+    assert bench(_report(p50=150.0)) == 1
+    assert bench(_report(p50=150.0), "--max-regression", "0.6") == 0
+
+
+def test_exit_status_is_2_on_failed_flows_with_or_without_regressions(bench, monkeypatch):
+    assert bench(_report(failed=1)) == 2
+    assert bench(_report(p50=150.0, failed=1)) == 2
+
+    monkeypatch.setattr(bench_flow, "run", lambda args: _report(failed=1))
+    assert bench_flow.main([]) == 2
+
+
+def test_results_are_written_before_comparing(bench, tmp_path):
+    output = tmp_path / "current.json"
+
+    assert bench(_report(p50=150.0), "--output", str(output)) == 1
+    assert json.loads(output.read_text())["results"]["latency"]["p50_ms"] == 150.0
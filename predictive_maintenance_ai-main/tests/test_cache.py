@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+from app.data.cache import ReadThroughCache
+
+
+class Loader:
+    def __init__(self, *values, fail_after=None):
+        self.values = list(values)
+        self.calls = 0
+        self.fail_after = fail_after
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.release.wait(2)
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise ConnectionError("backend down")
+        return self.values[min(self.calls, len(self.values)) - 1]
+
+    async def aload(self):
+        await asyncio.sleep(0)
+        return self()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_fresh_entries_are_served_without_reloading():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=60)
+    loader = Loader({"id": "V-1"})
+
+    assert cache.get_or_load("V-1", loader) == {"id": "V-1"}
+    assert cache.get_or_load("V-1", loader) == {"id": "V-1"}
+    assert loader.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_values_are_copied_in_and_out():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=60)
+    payload = {"id": "V-1", "alerts": []}
+
+    loaded = cache.get_or_load("V-1", lambda: payload)
+    loaded["alerts"].append("tampered")
+    payload["alerts"].append("tampered")
+
+    assert cache.get_or_load("V-1", Loader(None)) == {"id": "V-1", "alerts": []}
+
+
+def test_none_is_not_cached():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=60)
+    loader = Loader(None, {"id": "V-1"})
+
+    assert cache.get_or_load("V-1", loader) is None
+    assert cache.get_or_load("V-1", loader) == {"id": "V-1"}
+    assert loader.calls == 2
+
+
+def test_stale_entries_are_served_while_one_refresh_runs():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=0, stale_ttl=60)
+    loader = Loader("v1", "v2")
+    cache.get_or_load("V-1", loader)
+
+    loader.release.clear()  # hold the refresh so every read below sees it in flight
+    assert [cache.get_or_load("V-1", loader) for _ in range(5)] == ["v1"] * 5
+    loader.release.set()
+    _wait_for(lambda: cache.stats()["refreshes"] == 1)
+
+    assert loader.calls == 2
+    assert cache.get_or_load("V-1", loader) == "v2"
+    stats = cache.stats()
+    assert stats["stale_hits"] == 6
+    assert stats["refresh_errors"] == 0
+
+
+def test_failed_refresh_keeps_serving_the_stale_entry():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=0, stale_ttl=60)
+    loader = Loader("v1", fail_after=1)
+    cache.get_or_load("V-1", loader)
+
+    assert cache.get_or_load("V-1", loader) == "v1"
+    _wait_for(lambda: cache.stats()["refresh_errors"] == 1)
+    assert cache.get_or_load("V-1", loader) == "v1"
+
+
+def test_entries_past_the_stale_window_are_reloaded_inline():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=0, stale_ttl=0)
+    loader = Loader("v1", "v2")
+
+    assert cache.get_or_load("V-1", loader) == "v1"
+    assert cache.get_or_load("V-1", loader) == "v2"
+    assert cache.stats()["stale_hits"] == 0
+
+
+def test_async_stale_while_revalidate():
+    cache = ReadThroughCache("vehicles", maxsize=10, ttl=0, stale_ttl=60)
+    loader = Loader("v1", "v2")
+
+    async def scenario():
+        first = await cache.aget_or_load("V-1", loader.aload)
+        stale = await asyncio.gather(*(cache.aget_or_load("V-1", loader.aload) for _ in range(5)))
+        await asyncio.gather(*cache._tasks)
+        return first, stale, await cache.aget_or_load("V-1", loader.aload)
+
+    first, stale, refreshed = asyncio.run(scenario())
+
+    assert (first, stale, refreshed) == ("v1", ["v1"] * 5, "v2")
+    assert loader.calls == 2
+    assert cache.stats()["refreshes"] == 1
@@ -0,0 +1,125 @@
+import time
+from typing import Optional, TypedDict
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+
+from app.agents.checkpoints import FlowLedger, _resume_from, flow_config, resume_point
+
+
+class State(TypedDict, total=False):
+    vehicle_id: str
+    steps: list
+    error_message: Optional[str]
+
+
+def _graph(failures=None, checkpointer=True):
+    """fetch -> analyse -> book; `failures` maps a node to "raise" or "error"."""
+    failures = failures or {}
+
+    def node(name):
+        def run(state):
+            if failures.get(name) == "raise":
+                raise TimeoutError(f"{name} timed out")
+            update = {"steps": state.get("steps", []) + [name]}
+            if failures.get(name) == "error":
+                update["error_message"] = f"{name} failed"
+            return update
+        return run
+
+    builder = StateGraph(State)
+    for name in ("fetch", "analyse", "book"):
+        builder.add_node(name, node(name))
+    builder.set_entry_point("fetch")
+    builder.add_edge("fetch", "analyse")
+    builder.add_edge("analyse", "book")
+    builder.add_edge("book", END)
+    return builder.compile(checkpointer=InMemorySaver() if checkpointer else None)
+
+
+def _run(graph, flow_id="flow-1"):
+    try:
+        graph.invoke({"vehicle_id": "V-1", "steps": []}, flow_config(flow_id))
+    except TimeoutError:
+        pass
+
+
+def test_raised_flow_resumes_at_the_failed_node():
+    graph = _graph({"analyse": "raise"})
+    _run(graph)
+
+    start = resume_point(graph, "flow-1")
+
+    assert start.next == ("analyse",)
+    assert start.values["steps"] == ["fetch"]
+
+
+def test_flow_finished_with_an_error_resumes_before_the_error():
+    graph = _graph({"analyse": "error"})
+    _run(graph)
+
+    start = resume_point(graph, "flow-1")
+
+    assert start.next == ("analyse",)
+    assert start.values.get("error_message") is None
+
+    # Resuming from that snapshot re-runs only the failed step and what follows it
+    assert graph.invoke(None, start.config)["steps"] == ["fetch", "analyse", "book"]
+
+
+def test_completed_flow_has_nothing_to_redo():
+    graph = _graph()
+    _run(graph)
+
+    assert resume_point(graph, "flow-1") is None
+
+
+def test_unknown_flows_raise_key_error():
+    graph = _graph()
+    _run(graph)
+
+    with pytest.raises(KeyError):
+        resume_point(graph, "flow-2")
+    with pytest.raises(KeyError):
+        resume_point(_graph(checkpointer=False), "flow-1")
+
+
+class Snapshot:
+    def __init__(self, next=(), error=None):
+        self.next = next
+        self.values = {"error_message": error}
+
+
+def test_resume_from_falls_back_to_the_first_snapshot():
+    # The error was there from the start: every snapshot carries it
+    snapshots = [Snapshot(error="bad vin"), Snapshot(("book",), "bad vin"), Snapshot(("fetch",), "bad vin")]
+
+    assert _resume_from(snapshots) is snapshots[-1]
+
+
+def test_ledger_records_bookings_and_idle_flows(tmp_path):
+    ledger = FlowLedger(str(tmp_path / "nested" / "checkpoints.sqlite"))
+
+    ledger.record("flow-1", "V-1", {"booking_id": "B-1"})
+    ledger.touch("flow-2", "V-2")
+    cutoff = time.time() + 1
+
+    assert ledger.get("flow-1") == {"booking_id": "B-1"}
+    assert sorted(ledger.idle_since(cutoff)) == ["flow-1", "flow-2"]
+    assert ledger.idle_since(cutoff - 60) == []
+
+    ledger.forget("flow-1")
+    assert ledger.get("flow-1") is None
+    assert ledger.idle_since(cutoff) == ["flow-2"]
+
+
+def test_memory_ledger_forgets_runs_and_bookings():
+    ledger = FlowLedger()
+
+    ledger.record("flow-1", "V-1", {"booking_id": "B-1"})
+    ledger.touch("flow-1", "V-1")
+    ledger.forget("flow-1")
+
+    assert ledger.get("flow-1") is None
+    assert ledger.idle_since(time.time() + 1) == []
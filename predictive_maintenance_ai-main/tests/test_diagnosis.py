@@ -0,0 +1,53 @@
+import pytest
+
+from app.domain.diagnosis import legacy_diagnosis, parse_diagnosis
+
+
+def test_parse_diagnosis_tolerates_fences_and_normalizes():
+    content = """Here is the diagnosis:
+```json
+{"report": "Coolant   pump failing;\\n engine overheats.", "action": "Replace the coolant pump",
+ "priority": " CRITICAL ", "component": "Coolant pump", "confidence": 0.9}
+```"""
+    diagnosis = parse_diagnosis(content)
+
+    assert diagnosis.report == "Coolant pump failing; engine overheats."
+    assert diagnosis.priority == "Critical"
+    assert diagnosis.component == "Coolant pump"
+    assert diagnosis.confidence == 0.9
+
+
+def test_parse_diagnosis_fills_defaults():
+    diagnosis = parse_diagnosis('{"report": "Low oil pressure", "action": "Check the oil pump", "priority": "high"}')
+
+    assert diagnosis.priority == "High"
+    assert diagnosis.component == "Unknown"
+    assert diagnosis.confidence == 0.5
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "Report: no JSON here",
+    '{"report": "x", "action": "y"',
+    '{"report": "x", "action": "y", "priority": "Urgent"}',
+    '{"report": "", "action": "y", "priority": "Low"}',
+    '{"report": "x", "action": "y", "priority": "Low", "confidence": 2}',
+])
+def test_parse_diagnosis_rejects_invalid(content):
+    with pytest.raises(ValueError):
+        parse_diagnosis(content)
+
+
+def test_legacy_diagnosis_reads_text_format():
+    diagnosis = legacy_diagnosis("Report: [Engine running hot]\nAction: Flush the radiator\nPriority: HIGH priority")
+
+    assert diagnosis.report == "Engine running hot"
+    assert diagnosis.action == "Flush the radiator"
+    assert diagnosis.priority == "High"
+    assert diagnosis.confidence == 0.3
+
+
+def test_legacy_diagnosis_defaults_priority_and_rejects_partial_text():
+    assert legacy_diagnosis("Report: Worn brakes\nAction: Replace pads").priority == "Medium"
+    assert legacy_diagnosis("Report: Worn brakes") is None
+    assert legacy_diagnosis("") is None
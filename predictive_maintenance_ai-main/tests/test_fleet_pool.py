@@ -0,0 +1,75 @@
+from app.agents.fleet_pool import FleetPool, FleetRun
+
+
+def _result(vehicle_id, success=True):
+    return {"vehicle_id": vehicle_id, "success": success}
+
+
+def test_run_completes_once_every_vehicle_reported():
+    seen = []
+    run = FleetRun(run_id="run-1", vehicle_ids=["V-1", "V-2", "V-3"], on_result=seen.append)
+    run._started(101, ["V-1", "V-2"])
+    run._started(102, ["V-3"])
+
+    run._record(101, _result("V-1"), cpu_sec=0.2)
+    run._record(102, _result("V-3", success=False), cpu_sec=0.1)
+    assert not run.done
+
+    run._record(101, _result("V-2"), cpu_sec=0.2)
+    assert run.wait(0)
+
+    assert [r["vehicle_id"] for r in seen] == ["V-1", "V-3", "V-2"]
+    summary = run.summary()
+    assert (summary["completed"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    assert summary["processes"] == 2
+    assert summary["workers"]["101"] == {"flows": 2, "failed": 0, "cpu_sec": 0.4}
+    assert summary["cpu_sec"] == 0.5
+
+
+def test_dead_worker_fails_only_its_outstanding_flows():
+    run = FleetRun(run_id="run-1", vehicle_ids=["V-1", "V-2", "V-3"])
+    run._started(101, ["V-1", "V-2"])
+    run._started(102, ["V-3"])
+    run._record(101, _result("V-1"))
+
+    run._lost(101, "Worker process exited with code -9")
+    # A late result from the dead worker doesn't count twice
+    run._record(101, _result("V-2"))
+
+    lost = [r for r in run.results if not r["success"]]
+    assert [r["vehicle_id"] for r in lost] == ["V-2"]
+    assert lost[0]["error"] == "Worker process exited with code -9"
+    assert not run.done
+
+    run._record(102, _result("V-3"))
+    assert run.done
+    assert len(run.results) == 3
+
+
+def test_results_from_unassigned_workers_are_ignored():
+    run = FleetRun(run_id="run-1", vehicle_ids=["V-1"])
+    run._started(101, ["V-1"])
+
+    run._record(102, _result("V-1"))
+
+    assert run.results == []
+
+
+def test_empty_submission_finishes_without_workers():
+    pool = FleetPool(processes=1)
+    pool.start = lambda: pool  # no worker processes for this test
+
+    run = pool.submit([])
+
+    assert run.done
+    assert run.summary()["total"] == 0
+
+
+def test_vehicles_are_queued_in_chunks_without_duplicates():
+    pool = FleetPool(processes=1, chunk_size=2)
+    pool.start = lambda: pool
+
+    run = pool.submit(["V-1", "V-2", "V-1", "V-3"], include_state=True)
+
+    assert run.vehicle_ids == ["V-1", "V-2", "V-3"]
+    assert list(pool._pending) == [(run.run_id, ["V-1", "V-2"], True), (run.run_id, ["V-3"], True)]
@@ -0,0 +1,52 @@
+import itertools
+
+import numpy as np
+
+from app.domain.fleet_risk import score_fleet, score_records
+from app.domain.risk_rules import calculate_risk_score
+
+
+def _records():
+    temps = [None, 0, 90, 100, 101, 110, 111, 125.5]
+    pressures = [None, 100, 30, 29, 20, 19, 5.5]
+    dtcs = [None, [], ["P0300"], ["P0300", "P0171"]]
+    for index, (temp, pressure, dtc) in enumerate(itertools.product(temps, pressures, dtcs)):
+        record = {"vehicle_id": f"V-{index}"}
+        if temp is not None:
+            record["engine_temp_c"] = temp
+        if pressure is not None:
+            record["oil_pressure_psi"] = pressure
+        if dtc is not None:
+            record["active_dtc_codes"] = dtc
+        yield record
+    # Only the enriched key
+    yield {"vehicle_id": "V-dtc", "dtc_readable": ["P0420 - Catalyst"]}
+
+
+def test_score_records_matches_scalar_rules():
+    records = list(_records())
+    scores = score_records(records)
+
+    assert len(scores) == len(records)
+    for index, record in enumerate(records):
+        assert scores.result(index) == calculate_risk_score(record), record
+
+
+def test_at_least_masks_by_level():
+    scores = score_records([
+        {"engine_temp_c": 90},
+        {"engine_temp_c": 105},
+        {"oil_pressure_psi": 10},
+        {"engine_temp_c": 120, "oil_pressure_psi": 10, "active_dtc_codes": ["P0300"]},
+    ])
+
+    assert list(scores.levels) == ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    assert list(scores.at_least("HIGH")) == [False, False, True, True]
+    assert scores.scores[3] == 100
+
+
+def test_score_fleet_fills_missing_readings():
+    scores = score_fleet([np.nan, 115.0], [np.nan, 25.0], [0, 1], vehicle_ids=["A", "B"])
+
+    assert list(scores.scores) == [0, 95]
+    assert list(scores.vehicle_ids) == ["A", "B"]
@@ -0,0 +1,144 @@
+import time
+
+import pytest
+
+from app.agents import flow_queue
+from app.agents.flow_queue import FlowQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = FlowQueue(str(tmp_path / "queue.sqlite"))
+    queue.visibility_timeout = 0.2
+    queue.backoff = 0.1
+    queue.backoff_max = 0.15
+    yield queue
+    queue.close()
+
+
+def test_enqueue_deduplicates_active_jobs_per_vehicle(queue):
+    first, deduplicated = queue.enqueue("V-1")
+    assert not deduplicated
+
+    again, deduplicated = queue.enqueue("V-1")
+    assert deduplicated
+    assert again.job_id == first.job_id
+
+    other, deduplicated = queue.enqueue("V-2")
+    assert not deduplicated
+    assert queue.pending() == 2
+
+
+def test_finished_vehicle_can_be_enqueued_again(queue):
+    job, _ = queue.enqueue("V-1")
+    claimed = queue.claim("w1")
+    assert queue.complete(claimed, "w1", {"success": True})
+
+    new, deduplicated = queue.enqueue("V-1")
+    assert not deduplicated
+    assert new.job_id != job.job_id
+    assert queue.get(job.job_id).status == "COMPLETED"
+    assert queue.get(job.job_id).result == {"success": True}
+
+
+def test_claim_leases_each_job_once(queue):
+    queue.enqueue("V-1")
+    queue.enqueue("V-2")
+
+    first, second = queue.claim("w1"), queue.claim("w2")
+    assert {first.vehicle_id, second.vehicle_id} == {"V-1", "V-2"}
+    assert first.status == "RUNNING" and first.attempts == 1 and first.worker == "w1"
+    assert queue.claim("w3") is None
+
+
+def test_lapsed_lease_is_reclaimed(queue):
+    job, _ = queue.enqueue("V-1")
+    queue.claim("w1")
+    time.sleep(0.25)
+
+    reclaimed = queue.claim("w2")
+    assert reclaimed.job_id == job.job_id
+    assert reclaimed.attempts == 2
+    # The first worker lost the job: it can neither renew nor complete it
+    assert not queue.extend(job, "w1")
+    assert not queue.complete(reclaimed, "w1", {})
+    assert queue.complete(reclaimed, "w2", {})
+
+
+def test_extend_keeps_the_lease(queue):
+    queue.enqueue("V-1")
+    job = queue.claim("w1")
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.extend(job, "w1")
+    assert queue.claim("w2") is None
+
+
+def test_lapse_on_last_attempt_fails_the_job(queue):
+    job, _ = queue.enqueue("V-1", max_attempts=1)
+    queue.claim("w1")
+    time.sleep(0.25)
+
+    assert queue.claim("w2") is None
+    failed = queue.get(job.job_id)
+    assert failed.status == "FAILED"
+    assert "stopped responding" in failed.error
+    assert queue._finished == 1
+
+
+def test_only_the_lease_holder_finishes_a_job(queue):
+    job, _ = queue.enqueue("V-1", max_attempts=1)
+    claimed = queue.claim("w1")
+    time.sleep(0.25)
+    queue.claim("w2")  # fails the lapsed job
+
+    assert not queue.complete(claimed, "w1", {})
+    assert not queue.fail(claimed, "w1", "too late")
+    assert queue._finished == 1
+
+
+def test_history_is_pruned_as_jobs_finish(queue, monkeypatch):
+    monkeypatch.setattr(flow_queue, "PRUNE_EVERY", 2)
+    queue.history = 1
+    for vehicle_id in ("V-1", "V-2"):
+        queue.enqueue(vehicle_id, max_attempts=1)
+        queue.claim("w1")
+    time.sleep(0.25)
+
+    assert queue.claim("w2") is None  # both lapsed on their last attempt
+    assert len(queue.recent()) == 1
+
+
+def test_failures_back_off_then_fail_for_good(queue):
+    job, _ = queue.enqueue("V-1", max_attempts=3)
+
+    claimed = queue.claim("w1")
+    assert queue.fail(claimed, "w1", "LLM timeout")
+    retry = queue.get(job.job_id)
+    assert retry.status == "QUEUED" and retry.error == "LLM timeout"
+    assert retry.available_at - time.time() == pytest.approx(0.1, abs=0.05)
+    assert queue.claim("w1") is None  # still backing off
+
+    time.sleep(0.12)
+    claimed = queue.claim("w1")
+    assert claimed.attempts == 2
+    queue.fail(claimed, "w1", "LLM timeout")
+    # 0.1 * 2 = 0.2, capped at backoff_max
+    assert queue.get(job.job_id).available_at - time.time() == pytest.approx(0.15, abs=0.05)
+
+    time.sleep(0.17)
+    claimed = queue.claim("w1")
+    assert claimed.attempts == 3
+    queue.fail(claimed, "w1", "LLM timeout")
+    assert queue.get(job.job_id).status == "FAILED"
+    assert queue.pending() == 0
+
+
+def test_stats_and_recent(queue):
+    queue.enqueue("V-1")
+    queue.enqueue("V-2")
+    queue.claim("w1")
+
+    stats = queue.stats()
+    assert (stats["queued"], stats["running"], stats["busy_workers"]) == (1, 1, 1)
+    assert [job.vehicle_id for job in queue.recent(vehicle_id="V-2")] == ["V-2"]
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agents import llm
+from app.agents.llm import ainvoke_llm, get_llm, invoke_llm, llm_stats, register_llm
+
+
+class StandIn:
+    """Answers instantly (or after `delay`) and tracks how many calls overlap."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def _leave(self):
+        with self._lock:
+            self.running -= 1
+
+    def invoke(self, messages):
+        self._enter()
+        self._leave()
+        return AIMessage(content=f"echo: {messages[-1].content}")
+
+    async def ainvoke(self, messages):
+        self._enter()
+        try:
+            await asyncio.sleep(self.delay)
+            return AIMessage(content=f"echo: {messages[-1].content}")
+        finally:
+            self._leave()
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(llm.get_settings(), "llm_max_concurrency", 2)
+    monkeypatch.setattr(llm, "_stats", {})
+    llm.clear_llm_registry()
+    llm._async_slots.clear()
+    yield
+    llm.clear_llm_registry()
+
+
+MESSAGES = [HumanMessage(content="diagnose P0217")]
+
+
+def test_registered_llm_is_used_sync_and_async():
+    stand_in = StandIn()
+    register_llm(stand_in)
+
+    assert get_llm() is stand_in
+    assert invoke_llm(MESSAGES, node="diagnosis").content == "echo: diagnose P0217"
+    assert asyncio.run(ainvoke_llm(MESSAGES, node="diagnosis")).content == "echo: diagnose P0217"
+
+    assert stand_in.calls == 2
+    stats = llm_stats()
+    assert stats["nodes"]["diagnosis"]["calls"] == 2
+    assert stats["pooled_clients"] == 0  # nothing was built
+
+
+def test_registration_is_per_provider_and_model():
+    default, other = StandIn(), StandIn()
+    register_llm(default)
+    register_llm(other, provider="openai", model="gpt-4o-mini")
+
+    assert get_llm() is default
+    assert get_llm(provider="openai", model="gpt-4o-mini") is other
+    invoke_llm(MESSAGES, provider="openai", model="gpt-4o-mini")
+    assert (default.calls, other.calls) == (0, 1)
+
+
+def test_async_concurrency_is_capped_per_event_loop():
+    stand_in = StandIn(delay=0.02)
+    register_llm(stand_in)
+
+    async def burst():
+        await asyncio.gather(*(ainvoke_llm(MESSAGES) for _ in range(6)))
+        return llm._async_semaphore()
+
+    # Two loops at once, each with its own semaphore: 2 + 2 calls in flight
+    semaphores = []
+    threads = [threading.Thread(target=lambda: semaphores.append(asyncio.run(burst()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stand_in.calls == 12
+    assert stand_in.peak == 4
+    assert semaphores[0] is not semaphores[1]
+    # A later loop gets a fresh semaphore instead of one bound to a finished loop
+    assert asyncio.run(burst()) not in semaphores
+
+
+def test_semaphore_is_shared_within_a_loop():
+    stand_in = StandIn(delay=0.02)
+    register_llm(stand_in)
+
+    async def scenario():
+        await asyncio.gather(*(ainvoke_llm(MESSAGES, node=f"node-{n}") for n in range(6)))
+        return llm._async_semaphore() is llm._async_semaphore()
+
+    assert asyncio.run(scenario())
+    assert stand_in.peak == 2
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+from app.agents.master import _node
+from app.agents.tracing import flow_span
+from app.observability.metrics import current_node
+
+
+def _pair(calls):
+    def sync_node(state):
+        calls.append(("sync", current_node(), threading.get_ident()))
+        return {"risk_level": "LOW"}
+
+    async def async_node(state):
+        calls.append(("async", current_node(), threading.get_ident()))
+        await asyncio.sleep(0)
+        return {"risk_level": "HIGH"}
+
+    return _node("data_analysis", sync_node, async_node)
+
+
+def test_invoke_runs_the_sync_node():
+    calls = []
+
+    assert _pair(calls).invoke({"vehicle_id": "V-1"}) == {"risk_level": "LOW"}
+    assert [call[:2] for call in calls] == [("sync", "data_analysis")]
+
+
+def test_ainvoke_runs_the_async_node_on_the_loop():
+    calls = []
+
+    async def scenario():
+        return await _pair(calls).ainvoke({"vehicle_id": "V-1"}), threading.get_ident()
+
+    result, loop_thread = asyncio.run(scenario())
+
+    assert result == {"risk_level": "HIGH"}
+    assert calls == [("async", "data_analysis", loop_thread)]
+
+
+def test_node_time_is_attributed_to_the_flow():
+    node = _pair([])
+
+    async def scenario():
+        with flow_span("V-1", "flow-1") as trace:
+            await node.ainvoke({"vehicle_id": "V-1"})
+            node.invoke({"vehicle_id": "V-1"})
+        return trace
+
+    breakdown = asyncio.run(scenario()).breakdown()
+
+    assert "data_analysis" in breakdown["nodes"]
+    assert current_node() == "none"
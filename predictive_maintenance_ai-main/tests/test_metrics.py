@@ -0,0 +1,115 @@
+import pickle
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import main
+from app.observability import metrics
+from app.observability.metrics import Counter, Histogram
+
+
+@pytest.fixture
+def isolated():
+    """Sets the process-wide metrics aside for the test and puts them back afterwards."""
+    saved = metrics.drain_metrics()
+    yield
+    metrics.drain_metrics()
+    metrics.merge_metrics(saved)
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("op_seconds", "Operation time", ("node",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "diagnosis")
+    histogram.observe(0.1, "analysis")
+
+    assert histogram.render() == [
+        "# HELP op_seconds Operation time",
+        "# TYPE op_seconds histogram",
+        'op_seconds_bucket{node="analysis",le="0.1"} 1',
+        'op_seconds_bucket{node="analysis",le="1.0"} 1',
+        'op_seconds_bucket{node="analysis",le="+Inf"} 1',
+        'op_seconds_sum{node="analysis"} 0.100000',
+        'op_seconds_count{node="analysis"} 1',
+        'op_seconds_bucket{node="diagnosis",le="0.1"} 1',
+        'op_seconds_bucket{node="diagnosis",le="1.0"} 3',
+        'op_seconds_bucket{node="diagnosis",le="+Inf"} 4',
+        'op_seconds_sum{node="diagnosis"} 4.050000',
+        'op_seconds_count{node="diagnosis"} 4',
+    ]
+
+
+def test_unlabelled_metrics_render_without_braces():
+    histogram = Histogram("flow_seconds", "Flow time", (), buckets=(1.0,))
+    histogram.observe(0.5)
+    counter = Counter("flows_total", "Flows", ())
+    counter.inc(2)
+
+    assert histogram.render()[2:] == [
+        'flow_seconds_bucket{le="1.0"} 1',
+        'flow_seconds_bucket{le="+Inf"} 1',
+        "flow_seconds_sum 0.500000",
+        "flow_seconds_count 1",
+    ]
+    assert counter.render()[2:] == ["flows_total 2"]
+
+
+def test_counter_renders_one_line_per_label_set():
+    counter = Counter("bytes_total", "Payload bytes", ("node", "direction"))
+    counter.inc(100, "analysis", "sent")
+    counter.inc(250, "analysis", "sent")
+    counter.inc(1.5, "analysis", "received")
+
+    assert counter.render() == [
+        "# HELP bytes_total Payload bytes",
+        "# TYPE bytes_total counter",
+        'bytes_total{node="analysis",direction="received"} 1.5',
+        'bytes_total{node="analysis",direction="sent"} 350',
+    ]
+
+
+def test_drained_series_merge_into_existing_ones():
+    worker = Histogram("op_seconds", "Operation time", ("node",), buckets=(0.1, 1.0))
+    parent = Histogram("op_seconds", "Operation time", ("node",), buckets=(0.1, 1.0))
+    worker.observe(0.05, "diagnosis")
+    worker.observe(2.0, "booking")
+    parent.observe(0.5, "diagnosis")
+    worker_counter = Counter("retries_total", "Retries", ("node",))
+    parent_counter = Counter("retries_total", "Retries", ("node",))
+    worker_counter.inc(2, "diagnosis")
+    parent_counter.inc(1, "diagnosis")
+
+    parent.merge(pickle.loads(pickle.dumps(worker.drain())))
+    parent_counter.merge(pickle.loads(pickle.dumps(worker_counter.drain())))
+
+    assert parent.drain() == {("diagnosis",): [1, 1, 0.55, 2], ("booking",): [0, 0, 2.0, 1]}
+    assert parent_counter.drain() == {("diagnosis",): 3}
+    assert worker.drain() == {} and worker_counter.drain() == {}
+
+
+def test_merge_metrics_adds_a_worker_snapshot_to_the_process_metrics(isolated):
+    metrics.FLOW_SECONDS.observe(1.2, "ok")
+    metrics.RETRIES.inc(1, "diagnosis")
+    snapshot = metrics.drain_metrics()
+    metrics.FLOW_SECONDS.observe(0.3, "ok")
+
+    metrics.merge_metrics({**snapshot, "agent_unknown_total": {("x",): 1}})
+
+    text = metrics.render_metrics()
+    assert 'agent_flow_duration_seconds_count{outcome="ok"} 2' in text
+    assert 'agent_flow_duration_seconds_sum{outcome="ok"} 1.500000' in text
+    assert 'agent_backend_retries_total{node="diagnosis"} 1' in text
+    assert "agent_unknown_total" not in text
+
+
+def test_metrics_endpoint_serves_the_exposition_format(isolated):
+    metrics.NODE_SECONDS.observe(0.02, "data_analysis")
+
+    response = TestClient(main.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    for metric in metrics.METRICS:
+        assert f"# TYPE {metric.name} {type(metric).__name__.lower()}" in lines
+    assert 'agent_node_duration_seconds_bucket{node="data_analysis",le="0.025"} 1' in lines
@@ -0,0 +1,67 @@
+import pytest
+
+from app.agents import prompts
+from app.agents.prompts import TRUNCATION_MARK, PromptTemplate, estimate_tokens, normalize, summarize
+
+
+@pytest.fixture(autouse=True)
+def no_overrides(monkeypatch):
+    monkeypatch.setattr(prompts, "_overrides", {})
+
+
+def test_normalize_strips_indentation_and_blank_runs():
+    assert normalize("\n    Line one   \n\n\n\n    Line two\n") == "Line one\n\nLine two"
+
+
+def test_summarize_keeps_whole_sentences():
+    text = "First sentence here. Second sentence is a bit longer. Third one never fits."
+
+    assert summarize(text, 100) == text
+    assert summarize(text, 12) == "First sentence here." + TRUNCATION_MARK
+
+
+def test_summarize_keeps_whole_list_items():
+    items = ["Critical Overheating (118°C)", "Low Oil Pressure (25 psi)", "Active Fault Codes Detected: 3"]
+
+    assert summarize(items, 16) == "Critical Overheating (118°C)\nLow Oil Pressure (25 psi)" + TRUNCATION_MARK
+
+
+def test_summarize_cuts_a_single_long_item_at_a_word():
+    result = summarize("word " * 100, 5)
+
+    assert result.endswith(TRUNCATION_MARK)
+    assert not result[: -len(TRUNCATION_MARK)].endswith(" ")
+    assert len(result) <= 5 * 4
+
+
+def test_render_applies_field_limits():
+    template = PromptTemplate("test", "Issues:\n{issues}", budget=1000, limits={"issues": 20})
+
+    prompt = template.render(issues=["issue number %d with details" % index for index in range(20)])
+
+    assert prompt.endswith(TRUNCATION_MARK)
+    assert estimate_tokens(prompt) <= 30
+
+
+def test_render_trims_capped_fields_to_the_budget():
+    template = PromptTemplate("test", "Context {context}\nFailure: {failure}", budget=60, limits={"failure": 200})
+    failure = " ".join(f"Sentence {index} describing the failure." for index in range(40))
+
+    prompt = template.render(context="fixed", failure=failure)
+
+    assert estimate_tokens(prompt) <= 60
+    assert prompt.startswith("Context fixed\nFailure: Sentence 0")
+
+
+def test_render_leaves_uncapped_fields_alone_when_over_budget(capsys):
+    template = PromptTemplate("test", "{free}", budget=5)
+
+    assert template.render(free="x" * 100) == "x" * 100
+    assert "over its budget" in capsys.readouterr().out
+
+
+def test_budget_override_wins(monkeypatch):
+    monkeypatch.setattr(prompts, "_overrides", {"test": 30})
+    template = PromptTemplate("test", "{failure}", budget=1000, limits={"failure": 500})
+
+    assert estimate_tokens(template.render(failure="A short sentence. " * 100)) <= 30
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.data import repositories
+from app.data.repositories import _arequest, _request
+
+
+class Backend:
+    """Stands in for the HTTP layer; every request waits until `release` is set."""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.release = threading.Event()
+
+    def _answer(self, method, path, kwargs):
+        self.calls.append((method, path, kwargs.get("params")))
+        if self.error is not None:
+            raise self.error
+        return {"vehicle_id": "V-1", "alerts": []}
+
+    def send(self, method, path, **kwargs):
+        self.release.wait(2)
+        return self._answer(method, path, kwargs)
+
+    async def asend(self, method, path, **kwargs):
+        while not self.release.is_set():
+            await asyncio.sleep(0.001)
+        return self._answer(method, path, kwargs)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(repositories, "_send", backend.send)
+    monkeypatch.setattr(repositories, "_asend", backend.asend)
+    return backend
+
+
+async def _gather(count, path="/telematics/V-1", **kwargs):
+    return await asyncio.gather(*(_arequest("GET", path, **kwargs) for _ in range(count)), return_exceptions=True)
+
+
+def test_concurrent_identical_gets_reach_the_backend_once(backend):
+    async def scenario():
+        waiters = asyncio.ensure_future(_gather(5))
+        await asyncio.sleep(0.01)
+        backend.release.set()
+        return await waiters
+
+    results = asyncio.run(scenario())
+
+    assert len(backend.calls) == 1
+    assert all(result == {"vehicle_id": "V-1", "alerts": []} for result in results)
+    # Every caller gets its own copy
+    results[0]["alerts"].append("tampered")
+    assert results[1]["alerts"] == []
+    assert repositories._ainflight == {}
+
+
+def test_different_params_and_writes_are_not_coalesced(backend):
+    backend.release.set()
+
+    async def scenario():
+        await asyncio.gather(
+            _arequest("GET", "/scheduler/slots", params={"date": "2025-01-01"}),
+            _arequest("GET", "/scheduler/slots", params={"date": "2025-01-02"}),
+            _arequest("POST", "/scheduler/book", json={"slot": "A"}),
+            _arequest("POST", "/scheduler/book", json={"slot": "A"}),
+        )
+
+    asyncio.run(scenario())
+
+    assert len(backend.calls) == 4
+
+
+def test_an_error_reaches_every_waiter(backend):
+    backend.error = ConnectionError("backend down")
+    backend.release.set()
+
+    results = asyncio.run(_gather(3))
+
+    assert len(backend.calls) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert repositories._ainflight == {}
+
+
+@pytest.mark.parametrize("cancelled", [0, 1])
+def test_a_cancelled_waiter_does_not_cancel_the_shared_fetch(backend, cancelled):
+    async def scenario():
+        waiters = [asyncio.ensure_future(_arequest("GET", "/telematics/V-1")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters[cancelled].cancel()  # the leader, then a follower
+        backend.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert isinstance(results[cancelled], asyncio.CancelledError)
+    others = [result for index, result in enumerate(results) if index != cancelled]
+    assert others == [{"vehicle_id": "V-1", "alerts": []}] * 2
+    assert len(backend.calls) == 1
+
+
+def _threads(count):
+    results = [None] * count
+
+    def call(index):
+        try:
+            results[index] = _request("GET", "/telematics/V-1")
+        except Exception as exc:  # noqa: BLE001
+            results[index] = exc
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _land_after_takeoff(backend):
+    """Releases the response once the threads have had time to join the flight."""
+    while not repositories._inflight:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    backend.release.set()
+
+
+def test_sync_gets_coalesce_across_threads(backend):
+    threads, results = _threads(4)
+    _land_after_takeoff(backend)
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.calls) == 1
+    assert results == [{"vehicle_id": "V-1", "alerts": []}] * 4
+    assert len({id(result) for result in results}) == 4
+
+
+def test_sync_error_reaches_every_waiter(backend):
+    backend.error = ConnectionError("backend down")
+    threads, results = _threads(3)
+    _land_after_takeoff(backend)
+    for thread in threads:
+        thread.join()
+
+    assert len(backend.calls) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
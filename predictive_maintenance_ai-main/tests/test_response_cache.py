@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.agents import response_cache
+from app.agents.response_cache import ResponseCache, SQLiteTier, acached_call, cached_call, fault_key
+from app.data.cache import TTLCache
+
+
+def _state(**overrides):
+    state = {
+        "vehicle_metadata": {"model": "Sedan X", "owner": "A. Driver"},
+        "risk_level": "HIGH",
+        "detected_issues": ["Critical Overheating (118°C)", "Low Oil Pressure (12 psi)"],
+        "telematics_data": {"active_dtc_codes": ["P0217", "p0520"], "engine_temp_c": 118},
+    }
+    state.update(overrides)
+    return state
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    # Every test starts from empty in-memory caches
+    monkeypatch.setattr(response_cache, "_caches", {})
+    monkeypatch.setattr(response_cache, "_disk", None)
+    monkeypatch.setattr(response_cache.get_settings(), "llm_cache_sqlite_path", "")
+
+
+def test_fault_key_ignores_readings_order_and_case():
+    same_fault = _state(
+        vehicle_metadata={"model": "Sedan X", "owner": "B. Driver"},
+        detected_issues=["Low Oil Pressure (9 psi)", "Critical Overheating (121°C)"],
+        telematics_data={"active_dtc_codes": ["P0520 ", "P0217"], "engine_temp_c": 121},
+    )
+
+    assert fault_key(same_fault) == fault_key(_state())
+
+
+@pytest.mark.parametrize("change", [
+    {"vehicle_metadata": {"model": "Truck Y"}},
+    {"risk_level": "CRITICAL"},
+    {"detected_issues": ["Critical Overheating (118°C)"]},
+    {"telematics_data": {"active_dtc_codes": ["P0217"]}},
+])
+def test_fault_key_separates_different_faults(change):
+    assert fault_key(_state(**change)) != fault_key(_state())
+
+
+def test_fault_key_extra_parts_version_the_key():
+    assert fault_key(_state(), "capa-v1") != fault_key(_state(), "capa-v2")
+    assert fault_key(_state(telematics_data={"dtc_readable": "p0217"})) == fault_key(
+        _state(telematics_data={"active_dtc_codes": ["P0217"]})
+    )
+
+
+def test_cached_call_shares_answers_and_skips_none():
+    calls = []
+
+    def produce(answer):
+        def run():
+            calls.append(answer)
+            return answer
+        return run
+
+    assert cached_call("diagnosis", "k1", produce("overheating")) == "overheating"
+    assert cached_call("diagnosis", "k1", produce("other")) == "overheating"
+    assert cached_call("diagnosis", "k2", produce(None)) is None
+    assert cached_call("diagnosis", "k2", produce("retry")) == "retry"
+    assert calls == ["overheating", None, "retry"]
+
+
+def test_cached_call_is_bypassed_when_disabled(monkeypatch):
+    monkeypatch.setattr(response_cache.get_settings(), "llm_cache_enabled", False)
+
+    assert cached_call("diagnosis", "k1", lambda: "a") == "a"
+    assert cached_call("diagnosis", "k1", lambda: "b") == "b"
+
+
+def test_disk_tier_survives_a_new_memory_cache(tmp_path):
+    disk = SQLiteTier(str(tmp_path / "cache" / "llm.sqlite"), ttl=60)
+    ResponseCache("capa", TTLCache(10, 60), disk).set("k1", "replace the thermostat")
+
+    restarted = ResponseCache("capa", TTLCache(10, 60), disk)
+    assert restarted.get("k1") == "replace the thermostat"
+    assert restarted.get("k1") == "replace the thermostat"
+    assert restarted.stats()["disk_hits"] == 1
+    # Namespaces don't share entries
+    assert ResponseCache("diagnosis", TTLCache(10, 60), disk).get("k1") is None
+
+
+def test_expired_disk_entries_are_misses(tmp_path):
+    disk = SQLiteTier(str(tmp_path / "llm.sqlite"), ttl=0)
+    disk.set("capa", "k1", "stale")
+
+    assert disk.get("capa", "k1") is None
+
+
+def test_acached_call_uses_custom_backends_off_the_loop():
+    class Backend:
+        def __init__(self):
+            self.data = {}
+            self.threads = set()
+
+        def get(self, key):
+            self.threads.add(threading.get_ident())
+            return self.data.get(key)
+
+        def set(self, key, value):
+            self.threads.add(threading.get_ident())
+            self.data[key] = value
+
+        def stats(self):
+            return {"size": len(self.data)}
+
+    backend = Backend()
+    response_cache.register_response_cache("capa", backend)
+
+    async def produce():
+        return "replace the thermostat"
+
+    async def scenario():
+        first = await acached_call("capa", "k1", produce)
+        second = await acached_call("capa", "k1", produce)
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(scenario())
+
+    assert first == second == "replace the thermostat"
+    assert backend.data == {"k1": "replace the thermostat"}
+    assert loop_thread not in backend.threads
+    assert response_cache.response_cache_stats() == {"capa": {"size": 1}}
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.agents import llm
+from app.agents.master import run_predictive_flow, run_predictive_flow_async
+from app.data.repositories import MaintenanceRepo, TelematicsRepo
+from app.ueba import storage
+
+HEALTHY = {"engine_temp_c": 90, "oil_pressure_psi": 45, "model": "Sedan X"}
+
+
+class NoLLM:
+    """Fails the test if any node reaches the LLM."""
+
+    def invoke(self, messages):
+        raise AssertionError("the LLM must not be called")
+
+    async def ainvoke(self, messages):
+        raise AssertionError("the LLM must not be called")
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fleet = {"V-ok": HEALTHY}
+    reads = []
+
+    def telematics(vehicle_id):
+        reads.append(vehicle_id)
+        return dict(fleet[vehicle_id]) if vehicle_id in fleet else None
+
+    async def atelematics(vehicle_id):
+        return telematics(vehicle_id)
+
+    async def ahistory(vehicle_id):
+        return []
+
+    monkeypatch.setattr(TelematicsRepo, "get_latest_telematics", staticmethod(telematics))
+    monkeypatch.setattr(TelematicsRepo, "aget_latest_telematics", staticmethod(atelematics))
+    monkeypatch.setattr(MaintenanceRepo, "get_maintenance_history", staticmethod(lambda vehicle_id: []))
+    monkeypatch.setattr(MaintenanceRepo, "aget_maintenance_history", staticmethod(ahistory))
+    monkeypatch.setattr(storage.settings, "log_to_backend", False)
+    llm.register_llm(NoLLM())
+    yield reads
+    llm.clear_llm_registry()
+
+
+def _run(mode, vehicle_id):
+    if mode == "sync":
+        return run_predictive_flow(vehicle_id, include_timings=True)
+    return asyncio.run(run_predictive_flow_async(vehicle_id, include_timings=True))
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_low_risk_vehicle_ends_after_analysis(backend, mode):
+    state = _run(mode, "V-ok")
+
+    assert list(state["timings"]["nodes"]) == ["data_analysis"]
+    assert state["risk_level"] == "LOW"
+    assert state["diagnosis_report"] == "Vehicle is healthy. No issues detected."
+    assert not state.get("error_message")
+    assert "booking_id" not in state
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_failed_analysis_ends_after_analysis(backend, mode):
+    state = _run(mode, "V-missing")
+
+    assert list(state["timings"]["nodes"]) == ["data_analysis"]
+    assert state["error_message"] == "Vehicle V-missing not found."
+    assert "diagnosis_report" not in state
+    assert backend == ["V-missing"]
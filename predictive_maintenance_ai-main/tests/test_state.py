@@ -0,0 +1,46 @@
+from langgraph.graph import END
+
+from app.agents.master import agent_app, route_after_analysis, route_after_diagnosis
+from app.agents.state import merge_errors, merge_token_usage
+
+
+def test_merge_errors_keeps_each_distinct_error():
+    assert merge_errors(None, "scheduler down") == "scheduler down"
+    assert merge_errors("scheduler down", None) == "scheduler down"
+    assert merge_errors("scheduler down", "scheduler down") == "scheduler down"
+    assert merge_errors("scheduler down", "CAPA timed out") == "scheduler down; CAPA timed out"
+
+
+def test_merge_token_usage_sums_per_node():
+    left = {"diagnosis": {"calls": 1, "prompt_tokens": 100}}
+    right = {"diagnosis": {"calls": 1, "completion_tokens": 20}, "manufacturing": {"calls": 1}}
+
+    merged = merge_token_usage(left, right)
+
+    assert merged == {
+        "diagnosis": {"calls": 2, "prompt_tokens": 100, "completion_tokens": 20},
+        "manufacturing": {"calls": 1},
+    }
+    assert left == {"diagnosis": {"calls": 1, "prompt_tokens": 100}}
+    assert merge_token_usage(None, None) == {}
+
+
+def test_healthy_or_errored_vehicles_skip_diagnosis():
+    assert route_after_analysis({"risk_level": "LOW"}) == END
+    assert route_after_analysis({"risk_level": "HIGH", "error_message": "no telematics"}) == END
+    assert route_after_analysis({"risk_level": "MEDIUM"}) == "diagnosis"
+
+
+def test_diagnosis_fans_out_into_both_branches():
+    assert route_after_diagnosis({"risk_level": "HIGH"}) == ["customer_engagement", "manufacturing"]
+    assert route_after_diagnosis({"error_message": "LLM timed out"}) == END
+
+
+def test_join_waits_for_both_branches():
+    edges = {(edge.source, edge.target) for edge in agent_app.get_graph().edges}
+
+    assert {("diagnosis", "customer_engagement"), ("diagnosis", "manufacturing")} <= edges
+    assert {("customer_engagement", "scheduling"), ("scheduling", "feedback")} <= edges
+    assert {("feedback", "join"), ("manufacturing", "join"), ("join", END)} <= edges
+    # Manufacturing does not wait for the customer branch
+    assert not any(target == "manufacturing" and source != "diagnosis" for source, target in edges)
@@ -0,0 +1,176 @@
+import queue
+import threading
+
+import pytest
+
+from app.data.telematics_stream import TelematicsMonitor
+
+NORMAL = {"engine_temp_c": 90, "oil_pressure_psi": 45}
+WARM = {"engine_temp_c": 105}       # MEDIUM
+HOT = {"engine_temp_c": 115}        # HIGH
+FAILING = {"engine_temp_c": 115, "oil_pressure_psi": 10}  # CRITICAL
+
+
+def _monitor(**kwargs):
+    triggered = []
+    monitor = TelematicsMonitor(on_transition=triggered.append, max_vehicles=kwargs.pop("max_vehicles", 100),
+                                **{"min_level": "MEDIUM", "cooldown_sec": 300, **kwargs})
+    return monitor, triggered
+
+
+def _read(monitor, vehicle_id="V-1", **fields):
+    return monitor.ingest({"vehicle_id": vehicle_id, **fields})
+
+
+def test_only_escalations_trigger():
+    monitor, triggered = _monitor()
+
+    assert _read(monitor, **NORMAL) is None
+    assert _read(monitor, **WARM)["to_level"] == "MEDIUM"
+    assert _read(monitor, **HOT)["from_level"] == "MEDIUM"
+    assert _read(monitor, **WARM) is None       # de-escalation
+    assert _read(monitor, **FAILING)["to_level"] == "CRITICAL"
+
+    assert [t["to_level"] for t in triggered] == ["MEDIUM", "HIGH", "CRITICAL"]
+    assert monitor.get("V-1")["risk_level"] == "CRITICAL"
+    assert monitor.stats()["triggered"] == 3
+
+
+def test_levels_below_the_minimum_never_trigger():
+    monitor, triggered = _monitor(min_level="HIGH")
+
+    _read(monitor, **NORMAL)
+    _read(monitor, **WARM)
+    assert triggered == []
+    _read(monitor, **HOT)
+    assert [t["to_level"] for t in triggered] == ["HIGH"]
+
+
+def test_unchanged_risk_fields_are_not_rescored():
+    monitor, _ = _monitor()
+
+    _read(monitor, **NORMAL)
+    _read(monitor, speed_kph=80)
+    _read(monitor, engine_temp_c=90, odometer_km=1000)
+
+    stats = monitor.stats()
+    assert stats["rescored"] == 1
+    assert stats["unchanged"] == 2
+    assert monitor.get("V-1")["telematics"]["odometer_km"] == 1000
+
+
+def test_flapping_within_the_cooldown_is_suppressed():
+    monitor, triggered = _monitor()
+
+    _read(monitor, **WARM)
+    _read(monitor, **NORMAL)
+    _read(monitor, **WARM)      # same level again, moments later
+    _read(monitor, **HOT)       # a higher level still triggers
+
+    assert [t["to_level"] for t in triggered] == ["MEDIUM", "HIGH"]
+    assert monitor.stats()["suppressed"] == 1
+
+
+def test_no_cooldown_triggers_every_escalation():
+    monitor, triggered = _monitor(cooldown_sec=0)
+
+    for _ in range(3):
+        _read(monitor, **WARM)
+        _read(monitor, **NORMAL)
+
+    assert len(triggered) == 3
+
+
+def test_nested_telematics_and_stale_readings():
+    monitor, triggered = _monitor()
+
+    monitor.ingest({"vehicle_id": "V-1", "timestamp": 20, "telematics": HOT})
+    monitor.ingest({"vehicle_id": "V-1", "timestamp": 10, "telematics": NORMAL})
+
+    assert monitor.get("V-1")["risk_level"] == "HIGH"
+    assert monitor.stats()["stale"] == 1
+    assert len(triggered) == 1
+
+
+def test_invalid_readings_are_counted():
+    monitor, _ = _monitor()
+
+    assert monitor.ingest({"engine_temp_c": 120}) is None
+    assert monitor.ingest("not a dict") is None
+    assert monitor.stats()["invalid"] == 2
+
+
+def test_numeric_strings_are_coerced():
+    monitor, triggered = _monitor()
+
+    assert _read(monitor, engine_temp_c="115", oil_pressure_psi=" 45 ")["to_level"] == "HIGH"
+    assert monitor.get("V-1")["telematics"]["engine_temp_c"] == 115.0
+
+
+@pytest.mark.parametrize("bad", [
+    {"engine_temp_c": None},
+    {"engine_temp_c": "hot"},
+    {"oil_pressure_psi": [45]},
+    {"oil_pressure_psi": True},
+    {"engine_temp_c": "nan"},
+    {"telematics": {"engine_temp_c": None}},
+])
+def test_unusable_risk_fields_drop_the_reading(bad):
+    monitor, _ = _monitor()
+    _read(monitor, **HOT)
+
+    assert _read(monitor, **bad) is None
+    assert monitor.stats()["invalid"] == 1
+    # The vehicle's state is untouched, so its next reading still scores
+    assert monitor.get("V-1")["telematics"]["engine_temp_c"] == 115
+    assert _read(monitor, **FAILING)["to_level"] == "CRITICAL"
+
+
+def test_consume_survives_readings_that_fail_to_ingest(monkeypatch):
+    monitor, triggered = _monitor()
+    original = monitor.ingest
+
+    def ingest(reading):
+        if reading.get("explode"):
+            raise RuntimeError("scoring bug")
+        return original(reading)
+
+    monkeypatch.setattr(monitor, "ingest", ingest)
+    readings, stop = queue.Queue(), threading.Event()
+    for reading in ({"vehicle_id": "V-1", "explode": True}, {"vehicle_id": "V-1", "engine_temp_c": None},
+                    {"vehicle_id": "V-1", **HOT}):
+        readings.put(reading)
+    stop.set()
+
+    monitor.consume(readings, stop, poll_interval=0.01)
+
+    assert monitor.stats()["invalid"] == 2
+    assert [t["to_level"] for t in triggered] == ["HIGH"]
+
+
+def test_trigger_errors_do_not_stop_ingestion(capsys):
+    def fail(transition):
+        raise RuntimeError("queue down")
+
+    monitor = TelematicsMonitor(on_transition=fail, min_level="MEDIUM", cooldown_sec=0, max_vehicles=10)
+
+    assert _read(monitor, **HOT)["to_level"] == "HIGH"
+    assert monitor.stats()["trigger_errors"] == 1
+    assert "queue down" in capsys.readouterr().out
+
+
+def test_vehicles_are_bounded_least_recently_updated_first():
+    monitor, _ = _monitor(max_vehicles=2)
+
+    _read(monitor, "V-1", **NORMAL)
+    _read(monitor, "V-2", **NORMAL)
+    _read(monitor, "V-1", **WARM)
+    _read(monitor, "V-3", **NORMAL)
+
+    assert sorted(v["vehicle_id"] for v in monitor.vehicles()) == ["V-1", "V-3"]
+    assert [v["vehicle_id"] for v in monitor.vehicles(min_level="MEDIUM")] == ["V-1"]
+
+
+def test_rejects_unknown_min_level():
+    with pytest.raises(ValueError):
+        TelematicsMonitor(min_level="SEVERE")
@@ -0,0 +1,101 @@
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.tts_engines import EngineRouter, EspeakEngine, TTSEngine, build_router
+
+
+class FakeEngine(TTSEngine):
+    def __init__(self, name, fail=None, available=True):
+        self.name = name
+        self.fail = fail
+        self.available = available
+        self.calls = []
+
+    def synthesize(self, text, language, slow):
+        self.calls.append(language)
+        if self.fail:
+            raise self.fail
+        return f"{self.name}:{language}".encode()
+
+    def is_available(self):
+        return self.available
+
+
+def _router(primary=None, backup=None, **kwargs):
+    engines = {"gtts": primary or FakeEngine("gtts"), "espeak": backup or FakeEngine("espeak")}
+    return EngineRouter(engines, **{"default": "gtts", "fallback": "espeak", **kwargs})
+
+
+def test_engine_is_chosen_per_language():
+    router = _router(by_language={"hi": "espeak"})
+
+    assert router.synthesize("hello", "en", False)[1] == b"gtts:en"
+    assert router.synthesize("namaste", "hi", False)[1] == b"espeak:hi"
+    assert router.engines["gtts"].calls == ["en"]
+    assert router.engines["espeak"].calls == ["hi"]
+
+
+def test_unavailable_engine_routes_to_fallback():
+    router = _router(primary=FakeEngine("gtts", available=False))
+
+    engine, audio = router.synthesize("hello", "en", False)
+
+    assert engine.name == "espeak" and audio == b"espeak:en"
+    assert router.candidates("en") == [router.engines["espeak"]]
+
+
+def test_primary_failure_falls_back_and_is_counted():
+    router = _router(primary=FakeEngine("gtts", fail=ConnectionError("gTTS unreachable")))
+
+    engine, audio = router.synthesize("hello", "en", False)
+
+    assert engine.name == "espeak" and audio == b"espeak:en"
+    stats = router.stats()
+    assert stats["gtts"]["calls"] == 1 and stats["gtts"]["errors"] == 1 and stats["gtts"]["fallbacks"] == 1
+    assert stats["espeak"]["calls"] == 1 and stats["espeak"]["errors"] == 0
+
+
+def test_primary_timeout_falls_back(tmp_path):
+    hang = tmp_path / "espeak-ng"
+    hang.write_text("#!/bin/sh\nsleep 5\n")
+    hang.chmod(0o755)
+    slow = EspeakEngine(binary=str(hang), timeout=0.2)
+    router = EngineRouter({"espeak": slow, "gtts": FakeEngine("gtts")}, default="espeak", fallback="gtts")
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        slow.synthesize("hello", "en", False)
+    engine, audio = router.synthesize("hello", "en", False)
+
+    assert engine.name == "gtts" and audio == b"gtts:en"
+    assert router.stats()["espeak"]["fallbacks"] == 1
+
+
+def test_failure_without_fallback_raises():
+    router = _router(primary=FakeEngine("gtts", fail=ConnectionError("gTTS unreachable")), fallback=None)
+
+    with pytest.raises(ConnectionError):
+        router.synthesize("hello", "en", False)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"default": "polly"},
+        {"fallback": "espeak-ng"},
+        {"by_language": {"en": "gtts", "hi": "festival"}},
+    ],
+)
+def test_unknown_engine_names_are_rejected(kwargs):
+    with pytest.raises(ValueError, match="Unknown TTS engine"):
+        _router(**kwargs)
+
+
+def test_build_router_rejects_unknown_engine_from_settings():
+    settings = SimpleNamespace(
+        tts_timeout_sec=5.0, tts_engine="gtts", tts_engine_by_language="hi=festival", tts_fallback_engine=""
+    )
+
+    with pytest.raises(ValueError, match="festival"):
+        build_router(settings)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.api.tts_jobs import PRIORITIES, QueueFullError, TTSJobQueue
+
+
+class FakeService:
+    """Records synthesis order; `gate` holds every synthesis until it is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.spoken = []
+
+    def cache_key(self, text, language, slow):
+        return f"{language}|{int(slow)}|{text}"
+
+    def text_to_speech(self, text, language="en", slow=False, filename=None):
+        self.started.set()
+        self.gate.wait(2)
+        self.spoken.append(text)
+        if text == "fail":
+            return {"success": False, "error": "engine unavailable"}
+        if text == "raise":
+            raise RuntimeError("engine crashed")
+        return {"success": True, "filename": filename or f"{text}.mp3"}
+
+
+@pytest.fixture
+def service():
+    return FakeService()
+
+
+@pytest.fixture
+def queue(service):
+    queue = TTSJobQueue(service, workers=1, max_pending=3, history=10)
+    yield queue
+    service.gate.set()
+    queue.close()
+
+
+def _blocked(queue, service):
+    """Occupies the single worker so later submissions stay queued."""
+    job = queue.submit("first")
+    assert service.started.wait(2)
+    return job
+
+
+def test_identical_requests_share_one_job(queue, service):
+    first = queue.submit("Your brakes need service")
+    second = queue.submit("Your brakes need service")
+    other = queue.submit("Your brakes need service", slow=True)
+
+    service.gate.set()
+    assert first.future.result(2) is first
+
+    assert second is first
+    assert other is not first
+    assert first.coalesced == 1
+    assert first.status == "COMPLETED"
+    other.future.result(2)
+    assert service.spoken.count("Your brakes need service") == 2
+    assert queue.stats()["coalesced"] == 1
+
+
+def test_live_jobs_run_before_batch_jobs(queue, service):
+    _blocked(queue, service)
+    batch = queue.submit("batch", priority="batch")
+    live = queue.submit("live")
+
+    service.gate.set()
+    batch.future.result(2)
+
+    assert service.spoken == ["first", "live", "batch"]
+    assert live.finished_at <= batch.started_at
+
+
+def test_a_live_request_promotes_a_queued_batch_job(queue, service):
+    _blocked(queue, service)
+    queue.submit("later", priority="batch")
+    promoted = queue.submit("promoted", priority="batch")
+    assert queue.submit("promoted", priority="live") is promoted
+    assert promoted.priority == PRIORITIES["live"]
+
+    service.gate.set()
+    queue.submit("later", priority="batch").future.result(2)
+    promoted.future.result(2)
+
+    assert service.spoken == ["first", "promoted", "later"]
+
+
+def test_pending_jobs_are_capped(queue, service):
+    _blocked(queue, service)
+    queue.submit("a")
+    queue.submit("b")
+
+    with pytest.raises(QueueFullError):
+        queue.submit("c")
+    assert queue.submit("a").coalesced == 1  # joining a pending job is always allowed
+    assert queue.stats()["rejected"] == 1
+
+
+def test_failed_jobs_report_the_error(queue, service):
+    service.gate.set()
+
+    failed = queue.submit("fail")
+    crashed = queue.submit("raise")
+
+    assert failed.future.result(2).status == "FAILED"
+    assert failed.error == "engine unavailable"
+    assert crashed.future.result(2).status == "FAILED"
+    assert crashed.error == "engine crashed"
+    assert queue.get(crashed.job_id) is crashed
+
+
+def test_wait_does_not_block_the_event_loop(queue, service):
+    job = queue.submit("async")
+
+    async def scenario():
+        waiter = asyncio.ensure_future(job.wait(2))
+        await asyncio.sleep(0.01)
+        ticked = not waiter.done()
+        service.gate.set()
+        return ticked, await waiter
+
+    ticked, finished = asyncio.run(scenario())
+
+    assert ticked
+    assert finished.summary()["status"] == "COMPLETED"
+
+
+def test_wait_times_out(queue, service):
+    job = queue.submit("slow")
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(job.wait(0.01))
+
+
+def test_rejects_unknown_priority(queue):
+    with pytest.raises(ValueError):
+        queue.submit("hello", priority="urgent")
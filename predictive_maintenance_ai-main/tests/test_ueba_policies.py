@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.agents.tracing import flow_span
+from app.ueba import policies
+from app.ueba.policies import DENIED, RATE_LIMITED, RISK_LIMITED, PolicyEngine
+
+# The calls one flow makes, by agent, in order
+FLOW_CALLS = [
+    ("DataAnalysis", "TelematicsRepo"),
+    ("DataAnalysis", "MaintenanceRepo"),
+    ("DataAnalysis", "VehicleRepo"),
+    ("CustomerEngagement", "LLM_Inference"),
+    ("CustomerEngagement", "NotificationRepo"),
+    ("Scheduling", "SchedulerRepo"),
+    ("Scheduling", "SchedulerRepo"),
+    ("Scheduling", "NotificationRepo"),
+    ("Feedback", "NotificationRepo"),
+]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = PolicyEngine(policies.ACCESS_CONTROL_MATRIX)
+    # Score novelty from the first calls on, so interleaving would show up
+    engine.novelty_warmup = 10
+    monkeypatch.setattr(policies, "_engine", engine)
+    return engine
+
+
+def test_rate_limit_applies_per_flow():
+    engine = PolicyEngine({"Scheduling": {"allowed_services": ["SchedulerRepo"], "max_calls_per_sec": 5}})
+
+    assert [engine.evaluate("Scheduling", "SchedulerRepo", "flow-1") for _ in range(5)] == [None] * 5
+    assert engine.evaluate("Scheduling", "SchedulerRepo", "flow-1") == RATE_LIMITED
+    assert engine.evaluate("Scheduling", "SchedulerRepo", "flow-2") is None
+
+
+def test_zero_rate_limit_disables_it():
+    engine = PolicyEngine({"Scheduling": {"allowed_services": ["SchedulerRepo"], "max_calls_per_sec": 0}})
+
+    assert all(engine.evaluate("Scheduling", "SchedulerRepo", "flow-1") is None for _ in range(1000))
+
+
+def test_risk_limit_blocks_only_the_suspicious_flow():
+    engine = PolicyEngine(policies.ACCESS_CONTROL_MATRIX)
+
+    # Two denials put DataAnalysis (risk_limit LOW) at MEDIUM in this flow
+    assert engine.evaluate("DataAnalysis", "LLM_Inference", "flow-1") == DENIED
+    assert engine.evaluate("DataAnalysis", "LLM_Inference", "flow-1") == DENIED
+    assert engine.evaluate("DataAnalysis", "TelematicsRepo", "flow-1") == RISK_LIMITED
+    assert engine.evaluate("DataAnalysis", "TelematicsRepo", "flow-2") is None
+
+    stats = engine.stats()["DataAnalysis"]
+    assert stats["denied"] == 3
+    assert stats["flagged_flows"] == 1
+    assert stats["anomaly_level"] == "MEDIUM"
+
+
+def test_tracked_flows_are_bounded(engine):
+    engine.max_flows = 50
+    for index in range(200):
+        engine.evaluate("DataAnalysis", "TelematicsRepo", f"flow-{index}")
+
+    assert len(engine.behaviour) == 50
+    assert engine.stats()["DataAnalysis"]["calls"] == 200
+
+
+def test_concurrent_clean_flows_raise_no_suspicion(engine):
+    flows = 200
+
+    async def one(index: int) -> list:
+        with flow_span(f"V-{index}", f"flow-{index}"):
+            reasons = []
+            for agent_name, service_name in FLOW_CALLS:
+                reasons.append(policies.evaluate(agent_name, service_name))
+                # Let the other flows' calls land in between
+                await asyncio.sleep(0)
+            return reasons
+
+    async def run_all() -> list:
+        return await asyncio.gather(*(one(index) for index in range(flows)))
+
+    reasons = [reason for flow in asyncio.run(run_all()) for reason in flow]
+
+    assert reasons == [None] * (flows * len(FLOW_CALLS))
+    for agent_name, stats in engine.stats().items():
+        assert stats["denied"] == 0, agent_name
+        assert stats["anomaly_score"] == 0.0, agent_name
+        assert stats["flagged_flows"] == 0, agent_name
+
+
+def test_rare_transition_is_flagged(engine):
+    for index in range(50):
+        engine.evaluate("Scheduling", "SchedulerRepo", f"flow-{index}")
+        engine.evaluate("Scheduling", "NotificationRepo", f"flow-{index}")
+
+    # Notification first, where every other flow started with the scheduler
+    assert engine.evaluate("Scheduling", "NotificationRepo", "odd-flow") is None
+    assert engine.stats()["Scheduling"]["flagged_flows"] == 1
+
+
+def test_check_permission_is_a_pure_lookup(engine):
+    for _ in range(500):
+        assert policies.check_permission("Scheduling", "SchedulerRepo")
+    assert not policies.check_permission("Feedback", "SchedulerRepo")
+    assert not policies.check_permission("Unknown", "SchedulerRepo")
+
+    assert engine.behaviour == {}
+    assert engine.evaluate("Scheduling", "SchedulerRepo", "flow-1") is None
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from app.ueba.storage import AuditPipeline
+
+
+class Sink:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.ready = threading.Event()
+
+    def __call__(self, batch):
+        if self.fail:
+            raise ConnectionError("backend down")
+        self.batches.append(list(batch))
+        self.ready.set()
+
+
+def _event(n):
+    return {"agent": "DataAnalysis", "action": "VehicleRepo", "status": "ALLOWED", "details": str(n)}
+
+
+def _pipeline(sink, **kwargs):
+    # A long flush interval keeps the writer idle unless a full batch is queued
+    options = {"capacity": 100, "batch_size": 100, "flush_interval_ms": 60_000, **kwargs}
+    return AuditPipeline(sink, **options)
+
+
+def test_drops_and_counts_events_when_full():
+    pipeline = _pipeline(Sink(), capacity=3)
+
+    accepted = [pipeline.submit(_event(n)) for n in range(5)]
+
+    assert accepted == [True, True, True, False, False]
+    stats = pipeline.stats()
+    assert (stats["queued"], stats["enqueued"], stats["dropped"]) == (3, 3, 2)
+    pipeline.close()
+
+
+def test_flush_ships_everything_in_batches():
+    sink = Sink()
+    pipeline = _pipeline(sink, batch_size=4, flush_interval_ms=60_000)
+    pipeline._writer = object()  # keep the background writer out of this test
+
+    for n in range(10):
+        pipeline.submit(_event(n))
+    pipeline.flush()
+
+    assert [len(batch) for batch in sink.batches] == [4, 4, 2]
+    assert [event["details"] for batch in sink.batches for event in batch] == [str(n) for n in range(10)]
+    stats = pipeline.stats()
+    assert (stats["queued"], stats["sent"], stats["batches"]) == (0, 10, 3)
+
+
+def test_writer_ships_a_full_batch_without_flush():
+    sink = Sink()
+    pipeline = _pipeline(sink, batch_size=2)
+
+    pipeline.submit(_event(1))
+    pipeline.submit(_event(2))
+
+    assert sink.ready.wait(2)
+    assert sink.batches == [[_event(1), _event(2)]]
+    pipeline.close()
+
+
+def test_writer_ships_a_partial_batch_after_the_interval():
+    sink = Sink()
+    pipeline = _pipeline(sink, flush_interval_ms=50)
+
+    pipeline.submit(_event(1))
+
+    assert sink.ready.wait(2)
+    assert sink.batches == [[_event(1)]]
+    pipeline.close()
+
+
+def test_failed_batches_are_counted_not_raised():
+    pipeline = _pipeline(Sink(fail=True))
+
+    pipeline.submit(_event(1))
+    pipeline.submit(_event(2))
+    pipeline.flush()
+
+    stats = pipeline.stats()
+    assert (stats["sent"], stats["failed"], stats["queued"]) == (0, 2, 0)
+    pipeline.close()
+
+
+def test_close_flushes_and_then_drops():
+    sink = Sink()
+    pipeline = _pipeline(sink)
+
+    pipeline.submit(_event(1))
+    pipeline.close()
+
+    assert sink.batches == [[_event(1)]]
+    assert pipeline.submit(_event(2)) is False
+    assert pipeline.stats()["dropped"] == 1
+
+
+def test_block_ms_waits_for_room_before_dropping():
+    pipeline = _pipeline(Sink(), capacity=1, block_ms=50)
+    pipeline._writer = object()
+
+    pipeline.submit(_event(1))
+    started = time.perf_counter()
+    assert pipeline.submit(_event(2)) is False
+    assert time.perf_counter() - started >= 0.04
+
+    threading.Timer(0.05, pipeline.flush).start()
+    pipeline.block_timeout = 2
+    assert pipeline.submit(_event(3)) is True
+
+    stats = pipeline.stats()
+    assert (stats["backpressure_waits"], stats["dropped"]) == (2, 1)
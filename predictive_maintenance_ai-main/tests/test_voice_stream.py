@@ -0,0 +1,93 @@
+import struct
+
+from app.api.voice_stream import AudioJoiner, SentenceSegmenter
+
+
+def _feed_all(segmenter: SentenceSegmenter, tokens) -> list:
+    sentences = []
+    for token in tokens:
+        sentences.extend(segmenter.feed(token))
+    rest = segmenter.flush()
+    return sentences + ([rest] if rest else [])
+
+
+def test_sentences_are_cut_as_tokens_arrive():
+    segmenter = SentenceSegmenter()
+    text = "Hello John, your truck needs attention. The coolant pump is failing! Can we book you in? Thanks."
+    tokens = [text[index:index + 3] for index in range(0, len(text), 3)]
+
+    assert _feed_all(segmenter, tokens) == [
+        "Hello John, your truck needs attention.",
+        "The coolant pump is failing!",
+        "Can we book you in? Thanks.",
+    ]
+
+
+def test_sentence_is_returned_once_complete():
+    segmenter = SentenceSegmenter()
+
+    assert segmenter.feed("Your service is booked for Monday.") == []
+    assert segmenter.feed(" See") == ["Your service is booked for Monday."]
+    assert segmenter.flush() == "See"
+    assert segmenter.flush() is None
+
+
+def test_decimals_are_not_sentence_ends():
+    segmenter = SentenceSegmenter(min_chars=5)
+
+    assert _feed_all(segmenter, ["Oil pressure is 3.5 psi", " right now. Engine ok."]) == [
+        "Oil pressure is 3.5 psi right now.",
+        "Engine ok.",
+    ]
+
+
+def test_short_fragments_merge_with_the_next_sentence():
+    segmenter = SentenceSegmenter(min_chars=20)
+
+    assert _feed_all(segmenter, ["Hi. Ok. Your truck is ready for pickup. Bye"]) == [
+        "Hi. Ok. Your truck is ready for pickup.",
+        "Bye",
+    ]
+
+
+def test_line_breaks_end_sentences():
+    segmenter = SentenceSegmenter(min_chars=5)
+
+    assert _feed_all(segmenter, ["Design Flaw: seal\n\nEngineering Fix: sensor"]) == [
+        "Design Flaw: seal",
+        "Engineering Fix: sensor",
+    ]
+
+
+def test_long_runs_are_cut_at_a_space():
+    segmenter = SentenceSegmenter(max_chars=30)
+    sentences = _feed_all(segmenter, ["word " * 20])
+
+    assert all(len(sentence) <= 30 for sentence in sentences)
+    assert " ".join(sentences).split() == ["word"] * 20
+
+
+def _wav(samples: bytes) -> bytes:
+    fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+    return (
+        b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(samples)) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"data" + struct.pack("<I", len(samples)) + samples
+    )
+
+
+def test_wav_chunks_join_into_one_stream():
+    joiner = AudioJoiner("audio/wav")
+    first, second = joiner.add(_wav(b"\x01\x02")), joiner.add(_wav(b"\x03\x04"))
+
+    assert first[:4] == b"RIFF" and first.endswith(b"\x01\x02")
+    assert struct.unpack_from("<I", first, 4)[0] == 0xFFFFFFFF
+    assert second == b"\x03\x04"
+    assert joiner.add(b"ID3 mp3 frame") is None
+
+
+def test_mp3_chunks_pass_through():
+    joiner = AudioJoiner("audio/mpeg")
+
+    assert joiner.add(b"ID3 mp3 frame") == b"ID3 mp3 frame"
+    assert joiner.add(_wav(b"\x01\x02")) is None
@@ -0,0 +1,140 @@
+import os
+
+from app.api.tts_engines import EngineRouter, TTSEngine
+from app.api.voice_tts import AudioCache, VoiceTTSService, audio_cache_key, cache_key_from_filename
+
+
+def _key(n):
+    return audio_cache_key(f"clip {n}", "en", False)
+
+
+def test_cache_key_ignores_whitespace_but_not_voice():
+    assert audio_cache_key("Your  vehicle\nneeds service", "en", False) == audio_cache_key(
+        "Your vehicle needs service", "en", False
+    )
+    assert audio_cache_key("hello", "en", False) != audio_cache_key("hello", "en", True)
+    assert audio_cache_key("hello", "en", False) != audio_cache_key("hello", "hi", False)
+    assert audio_cache_key("hello", "en", False, "gtts") != audio_cache_key("hello", "en", False, "piper")
+
+
+def test_only_content_addressed_names_have_keys():
+    key = _key(1)
+
+    assert cache_key_from_filename(f"tts_{key}.mp3") == key
+    assert cache_key_from_filename(f"tts_{key}.wav") == key
+    assert cache_key_from_filename("greeting.mp3") is None
+    assert cache_key_from_filename(f"tts_{key}.mp3.tmp") is None
+
+
+def test_store_and_lookup(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=1000)
+
+    path = cache.store(_key(1), b"abc", "wav")
+
+    assert path.name == f"tts_{_key(1)}.wav"
+    assert path.read_bytes() == b"abc"
+    assert cache.lookup(_key(1)) == path
+    assert cache.lookup(_key(2)) is None
+    assert cache.lookup_first([_key(2), _key(1)]) == (_key(1), path)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (1, 3, 2, 1)
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_evicts_least_recently_used_over_the_byte_budget(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=25)
+    paths = [cache.store(_key(n), b"x" * 10) for n in range(2)]
+
+    cache.lookup(_key(0))  # clip 0 is now the most recently used
+    paths.append(cache.store(_key(2), b"x" * 10))
+
+    assert cache.lookup(_key(1)) is None
+    assert not paths[1].exists()
+    assert paths[0].exists() and paths[2].exists()
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 20
+
+
+def test_a_single_clip_over_budget_is_kept(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=5)
+
+    path = cache.store(_key(1), b"x" * 10)
+
+    assert path.exists()
+    assert cache.lookup(_key(1)) == path
+
+
+def test_rewriting_a_clip_replaces_its_size(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=100)
+
+    cache.store(_key(1), b"x" * 10)
+    cache.store(_key(1), b"x" * 4)
+
+    assert cache.stats()["bytes"] == 4
+    assert cache.stats()["entries"] == 1
+
+
+def test_index_is_rebuilt_from_disk_oldest_first(tmp_path):
+    first = AudioCache(tmp_path, max_bytes=100)
+    for n in range(3):
+        path = first.store(_key(n), b"x" * 10)
+        os.utime(path, (1000 + n, 1000 + n))
+    (tmp_path / "greeting.mp3").write_bytes(b"custom")
+
+    reloaded = AudioCache(tmp_path, max_bytes=25)
+    assert reloaded.stats()["entries"] == 3
+    assert reloaded.created(_key(0)) == 1000
+
+    reloaded.store(_key(3), b"x" * 10)
+
+    assert reloaded.lookup(_key(0)) is None
+    assert reloaded.lookup(_key(1)) is None
+    assert reloaded.lookup(_key(2)) is not None
+    assert (tmp_path / "greeting.mp3").exists()
+
+
+class FakeEngine(TTSEngine):
+    def __init__(self, name, extension="mp3", fail=False):
+        self.name = name
+        self.extension = extension
+        self.fail = fail
+        self.calls = 0
+
+    def synthesize(self, text, language, slow):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return f"{self.name}:{text}".encode()
+
+
+def _service(tmp_path, primary_fails=False):
+    service = VoiceTTSService(output_dir=str(tmp_path))
+    primary, backup = FakeEngine("gtts", fail=primary_fails), FakeEngine("espeak", "wav")
+    service.engines = EngineRouter({"gtts": primary, "espeak": backup}, default="gtts", fallback="espeak")
+    return service, primary, backup
+
+
+def test_each_request_counts_as_one_hit_or_miss(tmp_path):
+    service, primary, backup = _service(tmp_path, primary_fails=True)
+
+    service.synthesize_clip("Your car is ready")            # miss; rendered by the fallback
+    service.memory.clear()
+    key, audio, media_type = service.synthesize_clip("Your car is ready")  # stored under the second key
+
+    assert (audio, media_type) == (b"espeak:Your car is ready", "audio/wav")
+    assert key == audio_cache_key("Your car is ready", "en", False, "espeak")
+    assert backup.calls == 1
+    stats = service.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_streamed_clips_are_served_from_memory(tmp_path):
+    service, primary, _ = _service(tmp_path)
+
+    first = service.synthesize_clip("Hello", persist=False)
+    again = service.synthesize_clip("Hello", persist=False)
+
+    assert again == first
+    assert primary.calls == 1
+    assert service.cache.stats()["entries"] == 0
+    assert service.audio_bytes(first[0]) == b"gtts:Hello"